@@ -0,0 +1,203 @@
+# ann_index.py - 대규모 갤러리용 근사 최근접 이웃(HNSW) 인덱스
+import os
+import threading
+import numpy as np
+
+from config import (
+    GALLERY_SEARCH_MODE, HNSW_INDEX_PATH, HNSW_M, HNSW_EF_CONSTRUCTION, HNSW_EF_SEARCH,
+    HNSW_MIN_GALLERY_SIZE, HNSW_SAVE_EVERY
+)
+
+# hnswlib는 선택 의존성 (없으면 정확 검색만 사용)
+try:
+    import hnswlib
+except ImportError:
+    hnswlib = None
+
+
+class AnnIndex:
+    """
+    encoding_id를 라벨로 사용하는 hnswlib HNSW 인덱스 (내적 = 정규화 벡터의 코사인 유사도)
+
+    삭제는 mark_deleted로 처리하고 새 벡터가 그 자리를 재사용한다.
+    인덱스 파일과 함께 포함된 encoding_id 목록(.ids.npy)을 저장해 두고,
+    적재 시 갤러리의 encoding_id와 다르면 버리고 다시 만든다.
+    """
+
+    def __init__(self, path, M=16, ef_construction=200, ef_search=100, min_size=1000, save_every=100):
+        self.path = path
+        self.ids_path = f"{path}.ids.npy"
+        self.M = M
+        self.ef_construction = ef_construction
+        self.ef_search = ef_search
+        self.min_size = min_size
+        self.save_every = save_every
+        self.lock = threading.Lock()
+        self._reset()
+
+        # 지표
+        self.queries = 0
+        self.builds = 0
+        self.loads = 0
+
+    def _reset(self):
+        self.index = None
+        self.dim = 0
+        self.labels = set()  # 인덱스에 살아 있는 encoding_id
+        self.dirty = 0  # 마지막 저장 이후 변경 수
+
+    def _create(self, dim, capacity):
+        index = hnswlib.Index(space='ip', dim=dim)
+        index.init_index(max_elements=max(16, capacity), ef_construction=self.ef_construction,
+                         M=self.M, allow_replace_deleted=True)
+        index.set_ef(self.ef_search)
+        return index
+
+    def _try_load(self, encoding_ids, dim):
+        """저장된 인덱스가 현재 갤러리와 같은 encoding_id 집합이면 적재"""
+        if not (os.path.exists(self.path) and os.path.exists(self.ids_path)):
+            return False
+        try:
+            saved_ids = np.load(self.ids_path)
+            if len(saved_ids) != len(encoding_ids) or set(saved_ids.tolist()) != set(encoding_ids):
+                return False
+            index = hnswlib.Index(space='ip', dim=dim)
+            index.load_index(self.path, max_elements=max(16, len(encoding_ids) * 2), allow_replace_deleted=True)
+            index.set_ef(self.ef_search)
+        except Exception as e:
+            print(f"HNSW 인덱스 적재 실패, 다시 생성합니다: {str(e)}")
+            return False
+
+        self.index = index
+        self.dim = dim
+        self.labels = set(encoding_ids)
+        self.loads += 1
+        return True
+
+    def build(self, encoding_ids, vectors):
+        """
+        갤러리 전체(정규화된 (N, dim) 행렬)로 인덱스 구성
+
+        저장된 인덱스가 그대로 쓸 수 있으면 적재만 하고, 아니면 새로 만들어 저장한다.
+        """
+        encoding_ids = [int(encoding_id) for encoding_id in encoding_ids]
+        with self.lock:
+            self._reset()
+            if not encoding_ids:
+                return
+            dim = vectors.shape[1]
+            if self._try_load(encoding_ids, dim):
+                print(f"HNSW 인덱스 적재 완료: {len(self.labels)}개")
+                return
+
+            self.index = self._create(dim, len(encoding_ids) * 2)
+            self.index.add_items(vectors, np.asarray(encoding_ids, dtype=np.int64))
+            self.dim = dim
+            self.labels = set(encoding_ids)
+            self.builds += 1
+            self._save()
+            print(f"HNSW 인덱스 생성 완료: {len(self.labels)}개")
+
+    def add(self, encoding_id, vector):
+        """벡터 한 개 추가 (같은 encoding_id가 있으면 교체)"""
+        encoding_id = int(encoding_id)
+        with self.lock:
+            if self.index is None:
+                self.index = self._create(len(vector), 16)
+                self.dim = len(vector)
+            replace_deleted = False
+            if encoding_id not in self.labels:
+                try:
+                    # 삭제 표시된 같은 encoding_id가 남아 있으면 되살려서 갱신
+                    self.index.unmark_deleted(encoding_id)
+                except RuntimeError:
+                    # 새 벡터는 삭제 표시된 자리를 재사용하고, 빈 자리가 없으면 용량 확장
+                    replace_deleted = True
+                    if self._deleted_count() == 0 and self.index.get_current_count() >= self.index.get_max_elements():
+                        self.index.resize_index(self.index.get_max_elements() * 2)
+
+            self.index.add_items(vector.reshape(1, -1), np.asarray([encoding_id], dtype=np.int64),
+                                 replace_deleted=replace_deleted)
+            self.labels.add(encoding_id)
+            self._mark_dirty()
+
+    def remove(self, encoding_id):
+        """벡터 한 개 삭제 표시"""
+        encoding_id = int(encoding_id)
+        with self.lock:
+            if encoding_id not in self.labels:
+                return
+            self.index.mark_deleted(encoding_id)
+            self.labels.discard(encoding_id)
+            self._mark_dirty()
+
+    def _deleted_count(self):
+        return self.index.get_current_count() - len(self.labels) if self.index is not None else 0
+
+    def query(self, probe, k):
+        """정규화된 프로브와 가까운 encoding_id를 최대 k개 반환"""
+        with self.lock:
+            k = min(k, len(self.labels))
+            if self.index is None or k <= 0:
+                return []
+            # ef가 k보다 작으면 hnswlib가 k개를 못 찾을 수 있음
+            self.index.set_ef(max(self.ef_search, k))
+            labels, _ = self.index.knn_query(probe.reshape(1, -1), k=k)
+            self.queries += 1
+            return [int(label) for label in labels[0]]
+
+    def usable(self, gallery_size):
+        """갤러리가 충분히 클 때만 근사 검색 사용 (작으면 정확 검색이 더 빠르고 정확)"""
+        return self.index is not None and gallery_size >= self.min_size
+
+    def _mark_dirty(self):
+        self.dirty += 1
+        if self.dirty >= self.save_every:
+            self._save()
+
+    def _save(self):
+        if self.index is None:
+            return
+        tmp_path = f"{self.path}.tmp"
+        self.index.save_index(tmp_path)
+        np.save(f"{self.ids_path}.tmp.npy", np.asarray(sorted(self.labels), dtype=np.int64))
+        os.replace(tmp_path, self.path)
+        os.replace(f"{self.ids_path}.tmp.npy", self.ids_path)
+        self.dirty = 0
+
+    def save(self):
+        """변경 사항이 있으면 디스크에 저장 (서버 종료 시)"""
+        with self.lock:
+            if self.dirty:
+                self._save()
+
+    def metrics(self):
+        with self.lock:
+            return {
+                "size": len(self.labels),
+                "deleted": self._deleted_count(),
+                "capacity": self.index.get_max_elements() if self.index is not None else 0,
+                "ef_search": self.ef_search,
+                "min_gallery_size": self.min_size,
+                "queries": self.queries,
+                "builds": self.builds,
+                "loads": self.loads,
+                "unsaved_changes": self.dirty
+            }
+
+
+def create_ann_index():
+    """GALLERY_SEARCH_MODE 설정에 따라 근사 인덱스 생성 (정확 검색이면 None)"""
+    if GALLERY_SEARCH_MODE != "hnsw":
+        return None
+    if hnswlib is None:
+        print("hnswlib가 설치되어 있지 않아 정확 검색을 사용합니다. (pip install hnswlib)")
+        return None
+    return AnnIndex(
+        HNSW_INDEX_PATH,
+        M=HNSW_M,
+        ef_construction=HNSW_EF_CONSTRUCTION,
+        ef_search=HNSW_EF_SEARCH,
+        min_size=HNSW_MIN_GALLERY_SIZE,
+        save_every=HNSW_SAVE_EVERY
+    )
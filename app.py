@@ -1,34 +1,63 @@
 # app.py
 import os
-from fastapi import FastAPI, HTTPException, Body
-from fastapi.responses import FileResponse
+from fastapi import FastAPI, HTTPException, Body, Request, WebSocket
+from fastapi.responses import FileResponse, JSONResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
 import uvicorn
 from typing import Dict, Any
 import json
 import math
+import base64
 import ssl
+import threading
+import datetime
 
 # 자체 모듈 임포트
-from config import DATA_DIR
+from config import DATA_DIR, WARMUP_ON_STARTUP, ATTENDANCE_PAGE_SIZE, ATTENDANCE_MAX_PAGE_SIZE, ATTENDANCE_EXPORT_CHUNK_SIZE
 from utils import (
     init_csv_files, 
     get_attendance_records_with_employee_info, 
+    get_attendance_page,
+    get_attendance_statistics,
+    iter_attendance_records,
     update_attendance_record, 
     get_employee_info, 
     get_all_employees, 
     get_face_encodings_by_employee, 
     update_employee_info, 
-    get_employee_faces_with_base64
+    get_employee_faces_with_base64,
+    get_face_gallery,
+    sanitize_json_values
 )
+from attendance_log import attendance_log
+from attendance_rollups import attendance_rollups
+from attendance_partitions import attendance_partitions
+from attendance_export import EXPORT_FORMATS, parquet_available, stream_export
+from inference_executor import inference_executor
+from embedding_batcher import embedding_batcher
+from face_mesh_pool import face_mesh_pool
+from thumbnails import thumbnail_cache
+from face_gallery import gallery_cache
+from kiosk_stream import KioskStreamSession, kiosk_stream_stats
+from face_tracker import face_trackers
+from face_predetector import face_predetector
+from stage_timings import detection_timings
+from probe_cache import probe_cache
+from image_writer import image_writer
+from gallery_curation import gallery_curator
 from face_utils import (
     process_face_image, 
     get_all_faces, 
+    get_face_image_path,
     delete_face_data, 
     detect_face, 
     compare_face,
-    register_attendance
+    identify_face,
+    parse_min_face_ratio,
+    register_attendance,
+    warm_up_models,
+    warmup_state
 )
 
 # FastAPI 앱 생성
@@ -52,42 +81,56 @@ print(f"데이터 디렉토리 경로: {os.path.abspath(DATA_DIR)}")
 # 서버 시작 시 CSV 파일 초기화
 init_csv_files()
 
-def sanitize_json_values(data):
-    """JSON 직렬화 전에 안전한 값으로 변환"""
-    import numpy as np
-    import pandas as pd
+# 서버 시작 시 얼굴 갤러리 캐시 적재 (이후 저장/삭제/수정 시 캐시가 함께 갱신됨)
+get_face_gallery()
+
+@app.on_event("startup")
+def start_model_warmup():
+    """서버 시작 시 백그라운드에서 모델 사전 적재 및 워밍업"""
+    if WARMUP_ON_STARTUP:
+        threading.Thread(target=warm_up_models, name="model-warmup", daemon=True).start()
+    else:
+        warmup_state["ready"] = True
+
+@app.on_event("shutdown")
+def close_attendance_log():
+    """서버 종료 시 남은 출퇴근 기록 fsync, 근사 인덱스 저장, 남은 얼굴 이미지 저장 및 추론 실행기/FaceMesh 풀 정리"""
+    attendance_log.close()
+    if gallery_cache.index is not None:
+        gallery_cache.index.save()
+    inference_executor.shutdown()
+    image_writer.shutdown()
+    face_mesh_pool.close_all()
+
+async def read_image_upload(request: Request):
+    """
+    바이너리 이미지 요청 읽기 (본문이 JPEG 등 원본 바이트이거나 multipart/form-data의 image 필드)
+    나머지 값은 쿼리 파라미터와 multipart 필드에서 읽어 (이미지 바이트, 필드 dict)로 반환
+    """
+    fields = dict(request.query_params)
+    content_type = request.headers.get("content-type", "")
     
-    if isinstance(data, dict):
-        return {k: sanitize_json_values(v) for k, v in data.items()}
-    elif isinstance(data, list):
-        return [sanitize_json_values(item) for item in data]
-    elif isinstance(data, np.integer):
-        return int(data)
-    elif isinstance(data, np.floating):
-        if np.isnan(data):
-            return None
-        elif np.isinf(data):
-            return str(data)
-        return float(data)
-    elif isinstance(data, np.ndarray):
-        return data.tolist()
-    elif isinstance(data, float):
-        import math
-        if math.isnan(data):
-            return None
-        elif math.isinf(data):
-            return str(data)
-        return data
-    elif pd.isna(data):
-        return None
-    elif isinstance(data, (int, bool, str, type(None))):
-        return data
+    if content_type.startswith("multipart/form-data"):
+        form = await request.form()
+        upload = form.get("image")
+        image_bytes = await upload.read() if hasattr(upload, "read") else None
+        fields.update({key: value for key, value in form.items() if key != "image"})
     else:
-        # 기타 타입은 문자열로 변환
-        try:
-            return str(data)
-        except:
-            return None
+        image_bytes = await request.body()
+    
+    return image_bytes or None, fields
+
+def encode_cursor(key):
+    """(날짜, 시간, record_id) 키를 URL에 쓸 수 있는 불투명 커서 문자열로"""
+    return base64.urlsafe_b64encode(json.dumps(list(key)).encode('utf-8')).decode('ascii').rstrip('=')
+
+def decode_cursor(cursor):
+    """encode_cursor()의 역변환 (형식이 잘못되면 400)"""
+    try:
+        date_str, time_str, record_id = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        return str(date_str), str(time_str), int(record_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="잘못된 cursor 값입니다.")
 
 @app.get("/check_inout")
 async def check_inout_page():
@@ -138,7 +181,7 @@ async def capture_face(data: Dict[str, Any] = Body(...)):
             raise HTTPException(status_code=400, detail="이름과 이미지 데이터가 필요합니다.")
             
         # 이미지 처리 및 얼굴 벡터 추출
-        result = process_face_image(name, image_data, metadata)
+        result = await inference_executor.run(process_face_image, name, image_data, metadata)
         return result
         
     except HTTPException:
@@ -149,6 +192,19 @@ async def capture_face(data: Dict[str, Any] = Body(...)):
         print(f"요청 처리 중 오류: {str(e)}\n{traceback_str}")
         raise HTTPException(status_code=500, detail=f"요청 처리 중 오류: {str(e)}")
 
+@app.post("/api/capture-face/raw")
+async def capture_face_raw(request: Request):
+    """
+    capture-face의 바이너리 업로드 버전 (JPEG 본문 또는 multipart image 필드)
+    name, metadata(JSON 문자열)는 쿼리 파라미터 또는 multipart 필드로 전달
+    """
+    image_bytes, fields = await read_image_upload(request)
+    try:
+        metadata = json.loads(fields["metadata"]) if fields.get("metadata") else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail="metadata는 JSON 문자열이어야 합니다.")
+    return await capture_face({"name": fields.get("name"), "image": image_bytes, "metadata": metadata})
+
 @app.get("/api/faces")
 async def get_faces():
     """저장된 모든 얼굴 데이터 목록 반환"""
@@ -161,6 +217,60 @@ async def get_faces():
         print(f"얼굴 데이터 조회 중 오류: {str(e)}\n{traceback_str}")
         raise HTTPException(status_code=500, detail=f"얼굴 데이터 조회 중 오류: {str(e)}")
 
+@app.get("/api/gallery/status")
+async def get_gallery_status():
+    """얼굴 갤러리 캐시 상태 (등록 얼굴 수, 버전, 검색 방식, 직원별 한도 정리 현황) 반환"""
+    gallery = get_face_gallery()
+    return {
+        "success": True,
+        "size": len(gallery),
+        "employees": len(set(gallery.employee_ids[:len(gallery)].tolist())),
+        "version": gallery.version,
+        "search_mode": (
+            "hnsw" if gallery.index is not None and gallery.index.usable(len(gallery))
+            else "prototype" if gallery.prototypes is not None and gallery.prototypes.usable(len(gallery))
+            else "exact"
+        ),
+        "index": gallery.index.metrics() if gallery.index is not None else None,
+        "prototypes": gallery.prototypes.metrics() if gallery.prototypes is not None else None,
+        "curation": gallery_curator.metrics()
+    }
+
+@app.get("/api/ready")
+async def get_readiness():
+    """모델 워밍업 완료 여부 반환 (완료 전에는 503)"""
+    return JSONResponse(
+        status_code=200 if warmup_state["ready"] else 503,
+        content={"success": warmup_state["ready"], **warmup_state}
+    )
+
+@app.get("/api/metrics/inference")
+async def get_inference_metrics():
+    """추론 실행기 대기열 깊이 및 처리 지표 반환"""
+    return {
+        "success": True,
+        "metrics": inference_executor.metrics(),
+        "embedding_batches": embedding_batcher.metrics(),
+        "face_mesh_pool": face_mesh_pool.metrics(),
+        "thumbnails": thumbnail_cache.metrics(),
+        "kiosk_stream": kiosk_stream_stats.metrics(),
+        "face_tracking": face_trackers.metrics(),
+        "predetector": face_predetector.metrics(),
+        "detection_stages": detection_timings.metrics(),
+        "probe_cache": probe_cache.metrics(),
+        "image_writer": image_writer.metrics(),
+        "attendance_rollups": attendance_rollups.metrics(),
+        "attendance_partitions": attendance_partitions.metrics()
+    }
+
+@app.get("/api/faces/{face_id}/image")
+async def get_face_image(face_id: int):
+    """얼굴 원본 이미지 반환 (목록/비교 결과에는 썸네일만 포함됨)"""
+    image_path = get_face_image_path(face_id)
+    if image_path is None:
+        raise HTTPException(status_code=404, detail="해당 ID의 얼굴 이미지를 찾을 수 없습니다.")
+    return FileResponse(image_path, media_type="image/jpeg")
+
 @app.delete("/api/faces/{face_id}")
 async def delete_face(face_id: int):
     """특정 얼굴 데이터 삭제"""
@@ -184,7 +294,7 @@ async def detect_face_api(data: Dict[str, Any] = Body(...)):
         if not image_data:
             raise HTTPException(status_code=400, detail="이미지 데이터가 필요합니다.")
         
-        result = detect_face(image_data)
+        result = await inference_executor.run(detect_face, image_data, data.get("session_id"))
         return result
     except HTTPException:
         raise
@@ -194,6 +304,12 @@ async def detect_face_api(data: Dict[str, Any] = Body(...)):
         print(f"얼굴 감지 중 오류: {str(e)}\n{traceback_str}")
         raise HTTPException(status_code=500, detail=f"얼굴 감지 중 오류: {str(e)}")
 
+@app.post("/api/detect-face/raw")
+async def detect_face_raw_api(request: Request):
+    """detect-face의 바이너리 업로드 버전 (JPEG 본문 또는 multipart image 필드)"""
+    image_bytes, fields = await read_image_upload(request)
+    return await detect_face_api({"image": image_bytes, "session_id": fields.get("session_id")})
+
 @app.post("/api/compare-face")
 async def compare_face_api(data: Dict[str, Any] = Body(...)):
     """캡처된 얼굴과 등록된 얼굴들 비교"""
@@ -203,7 +319,7 @@ async def compare_face_api(data: Dict[str, Any] = Body(...)):
         if not image_data:
             raise HTTPException(status_code=400, detail="이미지 데이터가 필요합니다.")
         
-        result = compare_face(image_data)
+        result = await inference_executor.run(compare_face, image_data, data.get("face_area"), data.get("landmarks"))
         sanitized_result = sanitize_json_values(result)
         return sanitized_result
     except HTTPException:
@@ -214,6 +330,69 @@ async def compare_face_api(data: Dict[str, Any] = Body(...)):
         print(f"얼굴 비교 중 오류: {str(e)}\n{traceback_str}")
         raise HTTPException(status_code=500, detail=f"얼굴 비교 중 오류: {str(e)}")
 
+@app.post("/api/compare-face/raw")
+async def compare_face_raw_api(request: Request):
+    """
+    compare-face의 바이너리 업로드 버전 (JPEG 본문 또는 multipart image 필드)
+    face_area, landmarks는 JSON 문자열로 쿼리 파라미터 또는 multipart 필드에 전달
+    """
+    image_bytes, fields = await read_image_upload(request)
+    try:
+        face_area = json.loads(fields["face_area"]) if fields.get("face_area") else None
+        landmarks = json.loads(fields["landmarks"]) if fields.get("landmarks") else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail="face_area/landmarks는 JSON 형식이어야 합니다.")
+    return await compare_face_api({"image": image_bytes, "face_area": face_area, "landmarks": landmarks})
+
+@app.post("/api/identify-face")
+async def identify_face_api(data: Dict[str, Any] = Body(...)):
+    """전체 프레임에서 얼굴 감지와 비교를 한 번에 처리 (detect-face + compare-face)"""
+    try:
+        image_data = data.get("image")
+        
+        if not image_data:
+            raise HTTPException(status_code=400, detail="이미지 데이터가 필요합니다.")
+        
+        try:
+            min_face_ratio = parse_min_face_ratio(data.get("min_face_ratio"))
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        
+        result = await inference_executor.run(identify_face, image_data, min_face_ratio, False, data.get("session_id"))
+        sanitized_result = sanitize_json_values(result)
+        return sanitized_result
+    except HTTPException:
+        raise
+    except Exception as e:
+        import traceback
+        traceback_str = traceback.format_exc()
+        print(f"얼굴 인식 중 오류: {str(e)}\n{traceback_str}")
+        raise HTTPException(status_code=500, detail=f"얼굴 인식 중 오류: {str(e)}")
+
+@app.post("/api/identify-face/raw")
+async def identify_face_raw_api(request: Request):
+    """identify-face의 바이너리 업로드 버전 (min_face_ratio는 쿼리 파라미터 또는 multipart 필드)"""
+    image_bytes, fields = await read_image_upload(request)
+    return await identify_face_api({
+        "image": image_bytes,
+        "min_face_ratio": fields.get("min_face_ratio", 0.0),
+        "session_id": fields.get("session_id")
+    })
+
+@app.websocket("/ws/kiosk")
+async def kiosk_stream_ws(websocket: WebSocket):
+    """
+    키오스크 프레임 스트리밍 (바이너리 JPEG 프레임 수신, 감지/인식 결과 전송)
+    처리 중에 들어온 프레임은 가장 최근 것만 남기고 버림
+    """
+    try:
+        min_face_ratio = parse_min_face_ratio(websocket.query_params.get("min_face_ratio"))
+    except ValueError as e:
+        # 1008: 정책 위반 (잘못된 연결 파라미터)
+        await websocket.close(code=1008, reason=str(e))
+        return
+    await KioskStreamSession(websocket, min_face_ratio).run()
+
 @app.post("/api/register-attendance")
 async def register_attendance_api(data: Dict[str, Any] = Body(...)):
     """출퇴근 기록 등록 API"""
@@ -225,7 +404,7 @@ async def register_attendance_api(data: Dict[str, Any] = Body(...)):
         if not name:
             raise HTTPException(status_code=400, detail="이름이 필요합니다.")
         
-        result = register_attendance(name, image_data, attendance_type)
+        result = await inference_executor.run(register_attendance, name, image_data, attendance_type, data.get("probe_token"))
         
         if result['success']:
             return result
@@ -239,6 +418,20 @@ async def register_attendance_api(data: Dict[str, Any] = Body(...)):
         print(f"출퇴근 기록 등록 중 오류: {str(e)}\n{traceback_str}")
         raise HTTPException(status_code=500, detail=f"출퇴근 기록 등록 중 오류: {str(e)}")
 
+@app.post("/api/register-attendance/raw")
+async def register_attendance_raw_api(request: Request):
+    """
+    register-attendance의 바이너리 업로드 버전 (이미지는 선택)
+    name, type, probe_token은 쿼리 파라미터 또는 multipart 필드로 전달
+    """
+    image_bytes, fields = await read_image_upload(request)
+    return await register_attendance_api({
+        "name": fields.get("name"),
+        "image": image_bytes,
+        "type": fields.get("type", "checkin"),
+        "probe_token": fields.get("probe_token")
+    })
+
 @app.get("/api/attendance")
 async def get_attendance_api(
     name: str = None,
@@ -247,9 +440,16 @@ async def get_attendance_api(
     employeeId: str = None,
     start_date: str = None,
     end_date: str = None,
-    tag: str = None
+    tag: str = None,
+    limit: int = None,
+    cursor: str = None,
+    include_total: bool = False
 ):
-    """출퇴근 기록 조회 API"""
+    """
+    출퇴근 기록 조회 API
+    limit 또는 cursor를 주면 최신순 키셋 페이지네이션 (응답의 next_cursor로 다음 페이지 조회,
+    전체 건수는 include_total=true일 때만 계산). 둘 다 없으면 조건에 맞는 전체 기록 반환.
+    """
     try:
         # 필터 구성
         filters = {
@@ -266,6 +466,22 @@ async def get_attendance_api(
         if all(value is None for value in filters.values()):
             filters = None
         
+        if limit is not None or cursor is not None:
+            limit = ATTENDANCE_PAGE_SIZE if limit is None else limit
+            if not 1 <= limit <= ATTENDANCE_MAX_PAGE_SIZE:
+                raise HTTPException(status_code=400, detail=f"limit은 1 ~ {ATTENDANCE_MAX_PAGE_SIZE} 사이여야 합니다.")
+            before = decode_cursor(cursor) if cursor else None
+            
+            page = get_attendance_page(filters, limit, before, include_total)
+            return sanitize_json_values({
+                "success": True,
+                "records": page["records"],
+                "count": len(page["records"]),
+                "total": page["total"],
+                "has_more": page["next_key"] is not None,
+                "next_cursor": encode_cursor(page["next_key"]) if page["next_key"] is not None else None
+            })
+        
         # 출퇴근 기록 조회
         records = get_attendance_records_with_employee_info(filters)
         
@@ -294,12 +510,56 @@ async def get_attendance_api(
             "records": safe_records,
             "total": len(safe_records)
         }
+    except HTTPException:
+        raise
     except Exception as e:
         import traceback
         traceback_str = traceback.format_exc()
         print(f"출퇴근 기록 조회 중 오류: {str(e)}\n{traceback_str}")
         raise HTTPException(status_code=500, detail=f"출퇴근 기록 조회 중 오류: {str(e)}")
 
+@app.get("/api/attendance/export")
+async def export_attendance_api(
+    format: str = "csv",
+    name: str = None,
+    department: str = None,
+    position: str = None,
+    employeeId: str = None,
+    start_date: str = None,
+    end_date: str = None,
+    tag: str = None
+):
+    """
+    출퇴근 기록 내보내기 API (format: csv | ndjson | parquet)
+    /api/attendance와 같은 필터로 조회한 기록을 청크 단위로 읽어 바로 전송하므로
+    기록 수와 관계없이 서버 메모리 사용이 일정하다.
+    """
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"지원하지 않는 형식입니다. 유효한 값: {', '.join(EXPORT_FORMATS)}")
+    if format == "parquet" and not parquet_available():
+        raise HTTPException(status_code=501, detail="Parquet 내보내기에는 pyarrow 설치가 필요합니다.")
+    
+    filters = {
+        'name': name,
+        'department': department,
+        'position': position,
+        'employeeId': employeeId,
+        'start_date': start_date,
+        'end_date': end_date,
+        'tag': tag
+    }
+    if all(value is None for value in filters.values()):
+        filters = None
+    
+    media_type, extension = EXPORT_FORMATS[format]
+    file_name = f"attendance_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.{extension}"
+    chunks = iter_attendance_records(filters, ATTENDANCE_EXPORT_CHUNK_SIZE)
+    return StreamingResponse(
+        stream_export(format, chunks),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{file_name}"'}
+    )
+
 @app.put("/api/attendance/{record_id}")
 async def update_attendance_api(record_id: int, data: Dict[str, Any] = Body(...)):
     """출퇴근 기록 태그 수정 API (record_id 기반)"""
@@ -329,6 +589,40 @@ async def update_attendance_api(record_id: int, data: Dict[str, Any] = Body(...)
         print(f"출퇴근 기록 수정 중 오류: {str(e)}\n{traceback_str}")
         raise HTTPException(status_code=500, detail=f"출퇴근 기록 수정 중 오류: {str(e)}")
 
+@app.get("/api/statistics/{kind}")
+async def get_statistics_api(
+    kind: str,
+    start_date: str = None,
+    end_date: str = None,
+    name: str = None,
+    department: str = None
+):
+    """
+    출퇴근 통계 API (kind: daily | personal | department)
+    원본 기록 대신 서버에서 미리 집계한 일일 집계 테이블로 계산한 결과만 반환
+    """
+    try:
+        if kind not in ("daily", "personal", "department"):
+            raise HTTPException(status_code=400, detail="통계 종류는 daily, personal, department 중 하나여야 합니다.")
+        if kind == "personal" and not name:
+            raise HTTPException(status_code=400, detail="개인별 통계는 이름이 필요합니다.")
+        
+        filters = {
+            'start_date': start_date,
+            'end_date': end_date,
+            'name': name,
+            'department': department
+        }
+        result = get_attendance_statistics(kind, filters)
+        return sanitize_json_values(dict(result, success=True, type=kind))
+    except HTTPException:
+        raise
+    except Exception as e:
+        import traceback
+        traceback_str = traceback.format_exc()
+        print(f"출퇴근 통계 조회 중 오류: {str(e)}\n{traceback_str}")
+        raise HTTPException(status_code=500, detail=f"출퇴근 통계 조회 중 오류: {str(e)}")
+
 @app.get("/api/employees")
 async def get_all_employees_api(
     name: str = None,
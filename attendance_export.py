@@ -0,0 +1,136 @@
+# attendance_export.py - 출퇴근 기록 스트리밍 내보내기 (CSV / NDJSON / Parquet)
+import io
+import csv
+import json
+
+# pyarrow는 선택 의존성 (없으면 Parquet 내보내기만 사용할 수 없음)
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+EXPORT_COLUMNS = ['record_id', 'employee_id', 'name', 'department', 'position', 'employeeId', 'date', 'time', 'tag']
+
+# CSV 내보내기 (출퇴근 기록 화면의 CSV 버튼) 열: (헤더, 기록 키) - 기존 화면에서 만들던 파일과 같은 구성
+CSV_COLUMNS = [
+    ('이름', 'name'),
+    ('부서', 'department'),
+    ('직급', 'position'),
+    ('사번', 'employeeId'),
+    ('날짜', 'date'),
+    ('시간', 'time'),
+    ('태그', 'tag')
+]
+
+# 형식 -> (Content-Type, 파일 확장자)
+EXPORT_FORMATS = {
+    "csv": ("text/csv; charset=utf-8", "csv"),
+    "ndjson": ("application/x-ndjson", "ndjson"),
+    "parquet": ("application/vnd.apache.parquet", "parquet")
+}
+
+
+def parquet_available():
+    return pq is not None
+
+
+def _text(value):
+    return '' if value is None else str(value)
+
+
+def _csv_value(record, key):
+    if key == 'tag':
+        return record.get('tag') or '미지정'
+    return _text(record.get(key))
+
+
+def stream_csv(chunks):
+    """
+    기록 청크를 CSV 바이트로 (헤더: 이름,부서,직급,사번,날짜,시간,태그 / 빈 태그는 '미지정')
+    엑셀에서 한글이 깨지지 않도록 UTF-8 BOM으로 시작
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator='\n')
+    writer.writerow([header for header, _ in CSV_COLUMNS])
+    yield ('\ufeff' + buffer.getvalue()).encode('utf-8')
+
+    for records in chunks:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows([_csv_value(record, key) for _, key in CSV_COLUMNS] for record in records)
+        yield buffer.getvalue().encode('utf-8')
+
+
+def stream_ndjson(chunks):
+    """기록 청크를 한 줄에 기록 하나인 JSON으로"""
+    for records in chunks:
+        yield ''.join(
+            json.dumps({column: record.get(column) for column in EXPORT_COLUMNS}, ensure_ascii=False) + '\n'
+            for record in records
+        ).encode('utf-8')
+
+
+class _ChunkSink(io.RawIOBase):
+    """ParquetWriter가 쓴 바이트를 모아 두었다가 청크마다 꺼내 가는 출력 스트림"""
+
+    def __init__(self):
+        self.parts = []
+        self.position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        data = bytes(data)
+        self.parts.append(data)
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def drain(self):
+        data = b''.join(self.parts)
+        self.parts = []
+        return data
+
+
+def _parquet_schema():
+    return pa.schema([
+        ('record_id', pa.int64()),
+        ('employee_id', pa.int64())
+    ] + [(column, pa.string()) for column in EXPORT_COLUMNS[2:]])
+
+
+def stream_parquet(chunks):
+    """기록 청크를 Parquet로 (청크 하나가 row group 하나, 쓰는 즉시 전송)"""
+    schema = _parquet_schema()
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(sink, schema, compression='snappy')
+    try:
+        for records in chunks:
+            columns = {
+                column: [int(record[column]) for record in records] if column in ('record_id', 'employee_id')
+                else [_text(record.get(column)) for record in records]
+                for column in EXPORT_COLUMNS
+            }
+            writer.write_table(pa.Table.from_pydict(columns, schema=schema))
+            data = sink.drain()
+            if data:
+                yield data
+    finally:
+        writer.close()
+    yield sink.drain()
+
+
+def stream_export(export_format, chunks):
+    """형식에 맞는 바이트 스트림 제너레이터"""
+    if export_format == "csv":
+        return stream_csv(chunks)
+    if export_format == "ndjson":
+        return stream_ndjson(chunks)
+    if export_format == "parquet":
+        return stream_parquet(chunks)
+    raise ValueError(f"지원하지 않는 내보내기 형식: {export_format}")
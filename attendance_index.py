@@ -0,0 +1,347 @@
+# attendance_index.py - 출퇴근 기록 조회용 메모리 인덱스 (CSV 저장소)
+import threading
+import numpy as np
+import pandas as pd
+
+from attendance_partitions import attendance_partitions, month_of
+
+EMPLOYEE_FILTER_COLUMNS = ('name', 'department', 'position', 'employeeId')
+
+
+def parse_filter_date(value, label):
+    """필터 날짜 문자열을 datetime64[D]로 (파싱 실패 시 None, 필터 무시)"""
+    try:
+        return np.datetime64(pd.to_datetime(value).date(), 'D')
+    except Exception as e:
+        print(f"{label} 파싱 오류: {e}")
+        return None
+
+
+def _text(value):
+    """누락된 값(None, NaN)은 빈 문자열로"""
+    return '' if value is None or pd.isna(value) else value
+
+
+def match_employee_ids(employees, filters):
+    """
+    이름/부서/직급/사번 필터(대소문자 무시 부분 일치)에 맞는 employee_id 집합
+    직원 필터가 없으면 None
+    """
+    active = [(column, str(filters[column]).lower()) for column in EMPLOYEE_FILTER_COLUMNS if filters.get(column)]
+    if not active:
+        return None
+    return {
+        int(employee['employee_id']) for employee in employees
+        if all(needle in str(_text(employee.get(column))).lower() for column, needle in active)
+    }
+
+
+def _make_rows(columns, positions, employee_map):
+    record_ids, employee_ids, date_strs, times, tags = columns
+    results = []
+    for position in positions:
+        employee = employee_map.get(int(employee_ids[position]), {})
+        results.append({
+            'record_id': int(record_ids[position]),
+            'employee_id': int(employee_ids[position]),
+            'name': _text(employee.get('name')),
+            'department': _text(employee.get('department')),
+            'position': _text(employee.get('position')),
+            'employeeId': _text(employee.get('employeeId')),
+            'date': date_strs[position],
+            'time': times[position],
+            'tag': tags[position]
+        })
+    return results
+
+
+def _parse_dates(date_strs):
+    return pd.to_datetime(pd.Series(date_strs, dtype=object), format='%Y-%m-%d', errors='coerce').to_numpy(dtype='datetime64[D]')
+
+
+def _sort_key(date, time, record_id):
+    """배열 정렬 순서와 같은 비교 키 (날짜를 읽지 못한 기록은 맨 뒤)"""
+    return (np.isnat(date), date if not np.isnat(date) else np.datetime64(0, 'D'), str(time), int(record_id))
+
+
+class AttendanceIndex:
+    """
+    출퇴근 기록 월별 파티션을 필요한 월만 읽어 열 단위 배열로 보관하는 조회 엔진
+
+    - 날짜는 datetime64[D]로 한 번만 변환하고, 기록은 (날짜, 시간, record_id) 순으로 정렬해 둠
+      -> 기간 필터는 searchsorted로 범위만 잘라냄
+    - 기간 조회는 기간과 겹치는 월의 파티션만 읽어 합치고(이미 읽은 월은 다시 읽지 않음),
+      기간이 없는 조회만 전체 파티션을 읽음
+    - employee_id별 기록 위치 인덱스 -> 직원 필터는 직원 집합을 먼저 구한 뒤 그 직원들의 기록만 모음
+    - 새 기록은 추가 목록에 모았다가 다음 조회 때 배열 끝에 붙이고(앞에 정렬되는 기록이 있을 때만 전체 재정렬),
+      태그 수정은 record_id 위치를 찾아 반영
+    이 프로세스의 기록/수정만 반영되므로 파티션을 외부에서 고치면 invalidate()를 호출해야 한다.
+    """
+
+    def __init__(self, partitions):
+        self.partitions = partitions
+        self.lock = threading.RLock()
+        self.loaded = False
+        self.loaded_months = set()
+        self.pending = []  # 아직 배열에 합치지 않은 새 기록
+
+        # 지표
+        self.loads = 0
+        self.queries = 0
+
+    def invalidate(self):
+        with self.lock:
+            self.loaded = False
+            self.loaded_months = set()
+            self.pending = []
+
+    def _set_columns(self, record_ids, employee_ids, date_strs, times, tags):
+        """기록 전체를 (날짜, 시간, record_id) 순으로 정렬해 배열과 위치 인덱스를 다시 만듦"""
+        dates = _parse_dates(date_strs)
+        order = np.lexsort((record_ids, times.astype(str), dates))
+        columns = (record_ids[order], employee_ids[order], dates[order], date_strs[order], times[order], tags[order])
+
+        # 뒤에 붙일 기록을 위해 여유 용량을 두고 보관
+        self.size = len(order)
+        capacity = max(1024, self.size + self.size // 2)
+        self.buffers = []
+        for column in columns:
+            buffer = np.empty(capacity, dtype=column.dtype)
+            buffer[:self.size] = column
+            self.buffers.append(buffer)
+        self._set_views()
+        self.positions = {int(record_id): position for position, record_id in enumerate(self.record_ids)}
+
+        # employee_id -> 정렬된 기록 위치 배열
+        by_employee = np.argsort(self.employee_ids, kind='stable')
+        employee_ids, starts = np.unique(self.employee_ids[by_employee], return_index=True)
+        self.by_employee = {
+            int(employee_id): positions
+            for employee_id, positions in zip(employee_ids, np.split(by_employee, starts[1:]))
+        }
+
+    def _set_views(self):
+        self.record_ids, self.employee_ids, self.dates, self.date_strs, self.times, self.tags = (
+            buffer[:self.size] for buffer in self.buffers
+        )
+
+    def _append_sorted(self, record_ids, employee_ids, date_strs, times, tags):
+        """
+        새 기록이 모두 현재 마지막 기록 뒤에 정렬되면 배열 끝에 붙이고 위치 인덱스만 늘림
+        (앞에 끼어드는 기록이 있으면 False, 전체 재정렬 필요)
+        """
+        dates = _parse_dates(date_strs)
+        order = np.lexsort((record_ids, times.astype(str), dates))
+        columns = (record_ids[order], employee_ids[order], dates[order], date_strs[order], times[order], tags[order])
+        if self.size and _sort_key(self.dates[-1], self.times[-1], self.record_ids[-1]) > _sort_key(
+                columns[2][0], columns[4][0], columns[0][0]):
+            return False
+
+        start, end = self.size, self.size + len(order)
+        if end > len(self.buffers[0]):
+            capacity = max(1024, end * 2)
+            self.buffers = [np.concatenate([buffer[:start], np.empty(capacity - start, dtype=buffer.dtype)])
+                            for buffer in self.buffers]
+        for buffer, column in zip(self.buffers, columns):
+            buffer[start:end] = column
+        self.size = end
+        self._set_views()
+
+        for offset, (record_id, employee_id) in enumerate(zip(columns[0], columns[1])):
+            position = start + offset
+            self.positions[int(record_id)] = position
+            positions = self.by_employee.get(int(employee_id))
+            self.by_employee[int(employee_id)] = (
+                np.array([position]) if positions is None else np.append(positions, position)
+            )
+        return True
+
+    def _ensure_ready(self, months=None):
+        """
+        months(None이면 전체) 중 아직 읽지 않은 월의 파티션을 읽고, 추가된 기록이 있으면 배열에 합침
+        (lock을 잡은 상태에서 호출)
+        """
+        if not self.loaded:
+            empty = np.zeros(0, dtype=object)
+            self._set_columns(np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64), empty, empty, empty)
+            self.loaded = True
+
+        needed = self.partitions.months() if months is None else months
+        missing = [month for month in needed if month not in self.loaded_months]
+        df = self.partitions.read(missing) if missing else None
+        if missing:
+            self.loaded_months.update(missing)
+            self.loads += 1
+
+        # 파티션을 읽는 사이 추가된 기록이 파일과 추가 목록에 모두 있을 수 있으므로 record_id로 중복 제거
+        pending = self.pending
+        self.pending = []
+        if df is not None:
+            seen = set(df['record_id'].astype(np.int64).tolist())
+            pending = [row for row in pending if int(row['record_id']) not in seen]
+        pending = [row for row in pending if int(row['record_id']) not in self.positions]
+        if (df is None or df.empty) and not pending:
+            return
+
+        if df is None or df.empty:
+            new = (
+                np.array([row['record_id'] for row in pending], dtype=np.int64),
+                np.array([row['employee_id'] for row in pending], dtype=np.int64),
+                np.array([row['date'] for row in pending], dtype=object),
+                np.array([row['time'] for row in pending], dtype=object),
+                np.array([row['tag'] for row in pending], dtype=object)
+            )
+            # 새 기록만 추가된 경우(보통 현재 시각의 기록)는 정렬 없이 끝에 붙임
+            if self._append_sorted(*new):
+                return
+            self._set_columns(*(np.concatenate(column) for column in zip(self._arrays(), new)))
+            return
+
+        parts = [(self.record_ids, self.employee_ids, self.date_strs, self.times, self.tags)]
+        if df is not None and not df.empty:
+            parts.append((
+                df['record_id'].to_numpy(dtype=np.int64),
+                df['employee_id'].to_numpy(dtype=np.int64),
+                df['date'].to_numpy(dtype=object),
+                df['time'].to_numpy(dtype=object),
+                df['tag'].to_numpy(dtype=object)
+            ))
+        if pending:
+            parts.append((
+                np.array([row['record_id'] for row in pending], dtype=np.int64),
+                np.array([row['employee_id'] for row in pending], dtype=np.int64),
+                np.array([row['date'] for row in pending], dtype=object),
+                np.array([row['time'] for row in pending], dtype=object),
+                np.array([row['tag'] for row in pending], dtype=object)
+            ))
+        self._set_columns(*(np.concatenate(column) for column in zip(*parts)))
+
+    def append(self, row):
+        """새 기록 반영 (그 월을 아직 읽지 않았으면 읽을 때 파티션에서 읽으므로 무시)"""
+        with self.lock:
+            if self.loaded and month_of(row.get('date')) in self.loaded_months:
+                self.pending.append(row)
+
+    def update_tag(self, record_id, tag):
+        with self.lock:
+            if not self.loaded:
+                return
+            self._ensure_ready([])
+            position = self.positions.get(int(record_id))
+            if position is not None:
+                self.tags[position] = tag
+
+    def _key_position(self, key):
+        """정렬된 배열에서 (날짜, 시간, record_id) 키보다 앞선 기록의 수 (lock을 잡은 상태에서 호출)"""
+        date_str, time_str, record_id = key
+        position = self.positions.get(int(record_id))
+        if position is not None and self.date_strs[position] == date_str and self.times[position] == time_str:
+            return position
+
+        # 기록이 없으면 날짜 -> 시간 -> record_id 순으로 이진 탐색
+        date = pd.to_datetime(date_str, format='%Y-%m-%d', errors='coerce')
+        date = np.datetime64('NaT') if pd.isna(date) else np.datetime64(date.date(), 'D')
+        lo = int(np.searchsorted(self.dates, date, side='left'))
+        hi = len(self.dates) if np.isnat(date) else int(np.searchsorted(self.dates, date, side='right'))
+        times = self.times[lo:hi].astype(str)
+        hi = lo + int(np.searchsorted(times, time_str, side='right'))
+        lo = lo + int(np.searchsorted(times, time_str, side='left'))
+        return lo + int(np.searchsorted(self.record_ids[lo:hi], int(record_id), side='left'))
+
+    def select(self, filters=None, employees=None, before=None):
+        """
+        필터에 맞는 기록 위치를 최신순((날짜, 시간, record_id) 내림차순)으로 반환
+        employees: 직원 필터가 있을 때 사용할 직원 목록 (get_all_employees() 형식)
+        before: (날짜, 시간, record_id) 키 - 이 키보다 이전 기록만 (키셋 페이지네이션)
+        """
+        filters = filters or {}
+        start = parse_filter_date(filters['start_date'], "시작일") if filters.get('start_date') else None
+        end = parse_filter_date(filters['end_date'], "종료일") if filters.get('end_date') else None
+        with self.lock:
+            # 0. 파티션: 기간과 겹치는 월만 읽음 (기간이 없으면 전체)
+            if start is None and end is None:
+                self._ensure_ready()
+            else:
+                self._ensure_ready(self.partitions.months(
+                    str(start)[:7] if start is not None else None,
+                    str(end)[:7] if end is not None else None
+                ))
+            self.queries += 1
+
+            # 1. 기간: 정렬된 날짜 배열에서 범위만 잘라냄
+            lo, hi = 0, len(self.dates)
+            if start is not None:
+                lo = int(np.searchsorted(self.dates, start, side='left'))
+            if end is not None:
+                hi = int(np.searchsorted(self.dates, end, side='right'))
+            if filters.get('start_date') or filters.get('end_date'):
+                # 날짜를 읽지 못한 기록(NaT, 배열 끝에 정렬됨)은 기간 조회에서 제외
+                hi = min(hi, int(np.searchsorted(self.dates, np.datetime64('NaT'), side='left')))
+            if before is not None:
+                hi = min(hi, self._key_position(before))
+
+            # 2. 직원: 직원 집합을 먼저 구하고 그 직원들의 기록 위치만 모음
+            employee_ids = match_employee_ids(employees or [], filters)
+            if employee_ids is None:
+                positions = np.arange(lo, max(lo, hi))
+            else:
+                groups = [self.by_employee[employee_id] for employee_id in employee_ids if employee_id in self.by_employee]
+                positions = np.sort(np.concatenate(groups)) if groups else np.zeros(0, dtype=np.int64)
+                positions = positions[(positions >= lo) & (positions < hi)]
+
+            # 3. 태그
+            tag = filters.get('tag')
+            if tag:
+                positions = positions[self.tags[positions] == ('' if tag == 'empty' else tag)]
+
+            return positions[::-1]
+
+    def columns(self, months=None):
+        """집계용 기록 (months(None이면 전체) 월의 employee_id, date, time, tag 열 DataFrame)"""
+        with self.lock:
+            self._ensure_ready(months)
+            df = pd.DataFrame({
+                'employee_id': self.employee_ids,
+                'date': self.date_strs,
+                'time': self.times,
+                'tag': self.tags
+            })
+        if months is not None:
+            df = df[df['date'].map(month_of).isin(set(months))]
+        return df
+
+    def rows(self, positions, employees):
+        """기록 위치를 직원 정보가 포함된 dict 목록으로 변환 (직원이 없으면 빈 문자열)"""
+        employee_map = {int(employee['employee_id']): employee for employee in employees}
+        with self.lock:
+            return _make_rows(self._arrays(), positions, employee_map)
+
+    def iter_rows(self, filters=None, employees=None, chunk_size=5000):
+        """
+        select()와 같은 필터/순서의 기록을 chunk_size개씩 dict 목록으로 내보내는 제너레이터
+        조회 시점의 배열을 잡아 두고 그 배열에서 읽으므로, 도중에 기록이 추가되어 배열이
+        다시 만들어져도 위치가 어긋나지 않는다.
+        """
+        employee_map = {int(employee['employee_id']): employee for employee in employees or []}
+        with self.lock:
+            positions = self.select(filters, employees)
+            columns = self._arrays()
+        for start in range(0, len(positions), chunk_size):
+            yield _make_rows(columns, positions[start:start + chunk_size], employee_map)
+
+    def _arrays(self):
+        return self.record_ids, self.employee_ids, self.date_strs, self.times, self.tags
+
+    def metrics(self):
+        with self.lock:
+            return {
+                "loaded": self.loaded,
+                "loaded_months": len(self.loaded_months),
+                "records": len(self.record_ids) + len(self.pending) if self.loaded else None,
+                "loads": self.loads,
+                "queries": self.queries
+            }
+
+
+# 프로세스 전역 출퇴근 기록 인덱스 (CSV 저장소에서만 사용)
+attendance_index = AttendanceIndex(attendance_partitions)
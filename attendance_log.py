@@ -0,0 +1,145 @@
+# attendance_log.py - 출퇴근 기록 추가 전용(append-only) 기록기
+import os
+import csv
+import time
+import threading
+import pandas as pd
+
+from config import ATTENDANCE_SEQ_PATH, ATTENDANCE_FSYNC_BATCH, ATTENDANCE_FSYNC_INTERVAL
+from attendance_partitions import attendance_partitions, month_of, last_record_id, ATTENDANCE_COLUMNS
+
+
+class AttendanceLog:
+    """
+    출퇴근 기록을 기록 날짜의 월 파티션(CSV) 끝에 한 줄씩 덧붙이는 기록기
+
+    record_id는 시퀀스 파일에 저장된 마지막 값에서 이어서 발급한다.
+    매 기록마다 flush는 하지만 fsync는 ATTENDANCE_FSYNC_BATCH건 또는
+    ATTENDANCE_FSYNC_INTERVAL초마다 한 번씩 몰아서 한다 (파티션 manifest도 이때 저장).
+    열어 두는 파일은 마지막으로 쓴 월의 파티션 하나이고, 월이 바뀌면 새 파티션으로 넘어간다.
+    파티션을 다시 쓰는 작업(태그 수정 등)은 lock을 잡은 상태에서 해야 한다.
+    """
+
+    def __init__(self, partitions, seq_path):
+        self.partitions = partitions
+        self.seq_path = seq_path
+        self.lock = threading.RLock()
+        self.file = None
+        self.month = None
+        self.columns = ATTENDANCE_COLUMNS
+        self.last_record_id = 0
+        self.opened = False
+        self.pending = 0
+        self.last_sync = time.monotonic()
+        self.timer = None
+
+    def _read_last_record_id_from_partitions(self):
+        """가장 최근 파티션 마지막 줄의 record_id (파일 끝부분만 읽음)"""
+        latest = self.partitions.latest_month()
+        if latest is None:
+            return 0
+        path = self.partitions.path(latest)
+        if path.endswith('.gz') or not os.path.exists(path):
+            return self.partitions.partitions()[latest].get("max_record_id") or 0
+        return last_record_id(path)
+
+    def open(self):
+        """시퀀스를 읽어 다음 record_id를 준비 (파티션 파일은 첫 기록 때 엶)"""
+        with self.lock:
+            if self.opened:
+                return
+
+            # 지난 실행이 manifest 저장 전에 끝났으면 파일에만 있는 기록을 manifest에 반영
+            # (반영하지 않으면 record_id 범위로 파티션을 찾는 태그 수정에서 그 기록을 못 찾음)
+            self.partitions.reconcile()
+
+            seq_value = 0
+            if os.path.exists(self.seq_path):
+                with open(self.seq_path, 'r') as f:
+                    content = f.read().strip()
+                    seq_value = int(content) if content else 0
+            else:
+                # 시퀀스 파일이 없으면 기존 기록의 최대값으로 한 번만 초기화
+                df = self.partitions.read_all()
+                seq_value = int(pd.to_numeric(df['record_id']).max()) if not df.empty else 0
+
+            # 시퀀스 fsync 전에 종료된 경우를 대비해 최근 파티션 마지막 줄과 비교
+            self.last_record_id = max(seq_value, self._read_last_record_id_from_partitions())
+            self.opened = True
+
+    def _open_month(self, month, record_id):
+        """month 파티션을 추가 모드로 엶 (다른 월 파일이 열려 있으면 fsync 후 닫음)"""
+        if self.file is not None:
+            self.sync()
+            self.file.close()
+        path = self.partitions.open_for_append(month, record_id)
+        self.file = open(path, 'a', encoding='utf-8', newline='')
+        self.writer = csv.writer(self.file, lineterminator='\n')  # 헤더/파티션 다시 쓰기와 같은 줄바꿈
+        self.month = month
+
+    def append(self, row):
+        """새 record_id를 발급해 기록 한 줄을 기록 날짜의 월 파티션에 추가하고 그 record_id 반환"""
+        with self.lock:
+            self.open()
+            record_id = self.last_record_id + 1
+            row = dict(row, record_id=record_id)
+            month = month_of(row.get('date'))
+            if month != self.month or self.file is None:
+                self._open_month(month, record_id)
+
+            self.writer.writerow(['' if row.get(column) is None else row.get(column) for column in self.columns])
+            self.file.flush()
+            self.partitions.record_appended(month, record_id)
+
+            self.last_record_id = record_id
+            # 쓰는 도중 종료되어도 시퀀스 파일이 비지 않도록 임시 파일에 쓴 뒤 교체
+            temp_path = f"{self.seq_path}.tmp"
+            with open(temp_path, 'w') as f:
+                f.write(str(self.last_record_id))
+            os.replace(temp_path, self.seq_path)
+
+            self.pending += 1
+            if self.pending >= ATTENDANCE_FSYNC_BATCH or time.monotonic() - self.last_sync >= ATTENDANCE_FSYNC_INTERVAL:
+                self.sync()
+            elif self.timer is None:
+                self.timer = threading.Timer(ATTENDANCE_FSYNC_INTERVAL, self.sync)
+                self.timer.daemon = True
+                self.timer.start()
+
+            return record_id
+
+    def sync(self):
+        """쌓여 있는 기록을 디스크에 fsync"""
+        with self.lock:
+            if self.timer is not None:
+                self.timer.cancel()
+                self.timer = None
+            if self.file is None or self.pending == 0:
+                return
+
+            self.file.flush()
+            os.fsync(self.file.fileno())
+            with open(self.seq_path, 'r+') as f:
+                os.fsync(f.fileno())
+            self.partitions.flush_manifest()
+            self.pending = 0
+            self.last_sync = time.monotonic()
+
+    def release(self, month):
+        """month 파티션 파일이 열려 있으면 fsync 후 닫음 (파티션을 다시 쓰기 전에 호출, 다음 기록 때 다시 엶)"""
+        with self.lock:
+            if self.file is not None and self.month == month:
+                self.close()
+
+    def close(self):
+        """남은 기록을 fsync하고 파일을 닫음"""
+        with self.lock:
+            self.sync()
+            if self.file is not None:
+                self.file.close()
+                self.file = None
+                self.month = None
+
+
+# 프로세스 전역 출퇴근 기록기
+attendance_log = AttendanceLog(attendance_partitions, ATTENDANCE_SEQ_PATH)
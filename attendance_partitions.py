@@ -0,0 +1,430 @@
+# attendance_partitions.py - 월별 출퇴근 기록 파티션 저장소 (CSV 저장소)
+import os
+import re
+import gzip
+import json
+import shutil
+import argparse
+import datetime
+import threading
+from contextlib import contextmanager
+import pandas as pd
+
+# fcntl은 POSIX에서만 사용 가능 (없으면 같은 프로세스 안의 잠금만 사용)
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+from config import ATTENDANCE_CSV_PATH, ATTENDANCE_PARTITION_DIR
+
+ATTENDANCE_COLUMNS = ['record_id', 'employee_id', 'date', 'time', 'tag']
+UNDATED = 'undated'  # 날짜가 'YYYY-MM'로 시작하지 않는 기록의 파티션
+MONTH_PATTERN = re.compile(r'^\d{4}-\d{2}')
+
+
+def month_of(date_str):
+    """날짜 문자열의 파티션 키 ('YYYY-MM', 읽을 수 없으면 UNDATED)"""
+    date_str = '' if date_str is None else str(date_str)
+    return date_str[:7] if MONTH_PATTERN.match(date_str) else UNDATED
+
+
+def last_record_id(path):
+    """CSV 파티션 파일 마지막 줄의 record_id (파일 끝부분만 읽음, 기록이 없으면 0)"""
+    with open(path, 'rb') as f:
+        f.seek(0, os.SEEK_END)
+        size = f.tell()
+        f.seek(max(0, size - 4096))
+        lines = [line for line in f.read().splitlines() if line.strip()]
+
+    for line in reversed(lines):
+        first_field = line.split(b',', 1)[0]
+        if first_field.isdigit():
+            return int(first_field)
+    return 0
+
+
+def month_range(start_date=None, end_date=None):
+    """
+    기간(YYYY-MM-DD, 포함)에 걸치는 월 목록
+    한쪽이라도 비어 있으면 전체 기간이므로 None
+    """
+    if not start_date or not end_date:
+        return None
+    year, month = int(start_date[:4]), int(start_date[5:7])
+    months = []
+    while f"{year:04d}-{month:02d}" <= end_date[:7]:
+        months.append(f"{year:04d}-{month:02d}")
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return months
+
+
+class AttendancePartitions:
+    """
+    출퇴근 기록을 월마다 한 파일(YYYY-MM.csv)로 나눠 저장하고 manifest.json으로 목록을 관리
+
+    manifest에는 파티션마다 파일 이름, 기록 수, record_id 범위(min/max), 압축 여부를 둔다.
+    - 조회는 기간과 겹치는 월의 파일만 연다.
+    - 기록 추가는 이번 달 파일 끝에만 덧붙이고, 태그 수정은 record_id 범위로 찾은 파티션 하나만 다시 쓴다.
+    - 지난 달 파일은 archive()로 gzip 압축(YYYY-MM.csv.gz)해 둘 수 있다 (읽기/수정은 그대로 가능).
+    manifest는 서버와 보관 명령(다른 프로세스)이 함께 고치므로, 읽고-고치고-저장하는 작업은 모두
+    manifest.lock 파일 잠금(fcntl.flock) 안에서 최신 manifest를 다시 읽은 뒤 한다.
+    잠금 밖의 조회는 manifest 파일이 바뀌었으면(수정 시각/inode) 다시 읽는다.
+    """
+
+    def __init__(self, directory, legacy_csv_path=None):
+        self.directory = directory
+        self.manifest_path = os.path.join(directory, "manifest.json")
+        self.lock_path = os.path.join(directory, "manifest.lock")
+        self.legacy_csv_path = legacy_csv_path
+        self.lock = threading.RLock()
+        self.lock_file = None
+        self.lock_depth = 0
+        self.manifest = None
+        self.manifest_signature = None
+        self.appended = {}  # 아직 manifest 파일에 반영하지 않은 월 -> [추가 기록 수, 마지막 record_id]
+
+        # 지표
+        self.partition_reads = 0
+        self.partition_rewrites = 0
+
+    # === manifest ===
+
+    @contextmanager
+    def _locked(self):
+        """
+        프로세스 간 manifest 잠금 (스레드 lock + manifest.lock 파일 flock, 같은 스레드에서 중첩 가능)
+        잠금을 처음 잡을 때 manifest를 파일에서 다시 읽는다.
+        """
+        with self.lock:
+            if self.lock_depth == 0:
+                os.makedirs(self.directory, exist_ok=True)
+                self.lock_file = open(self.lock_path, 'a')
+                if fcntl is not None:
+                    fcntl.flock(self.lock_file.fileno(), fcntl.LOCK_EX)
+                self.manifest_signature = None
+            self.lock_depth += 1
+            try:
+                yield
+            finally:
+                self.lock_depth -= 1
+                if self.lock_depth == 0:
+                    if fcntl is not None:
+                        fcntl.flock(self.lock_file.fileno(), fcntl.LOCK_UN)
+                    self.lock_file.close()
+                    self.lock_file = None
+
+    def init(self):
+        """디렉터리와 manifest 생성 (단일 CSV 파일이 있으면 월별 파티션으로 한 번만 옮김)"""
+        with self._locked():
+            if os.path.exists(self.manifest_path):
+                return
+            self.manifest = {"version": 1, "partitions": {}}
+            if self.legacy_csv_path and os.path.exists(self.legacy_csv_path):
+                self._migrate_legacy_csv()
+            self._save_manifest()
+            print(f"출퇴근 기록 파티션 디렉터리 '{self.directory}'이 생성되었습니다.")
+
+    def _migrate_legacy_csv(self):
+        df = pd.read_csv(self.legacy_csv_path, dtype={'date': str, 'time': str, 'tag': str}, keep_default_na=False)
+        months = df['date'].map(month_of)
+        for month, part in df.groupby(months, sort=True):
+            part = part[ATTENDANCE_COLUMNS]
+            part.to_csv(self.path(month, archived=False), index=False, lineterminator='\n')
+            self.manifest["partitions"][month] = self._entry_for(part, month, archived=False)
+        # 원본은 지우지 않고 이름만 바꿔 둠
+        os.replace(self.legacy_csv_path, f"{self.legacy_csv_path}.migrated")
+        print(f"출퇴근 기록 {len(df)}건을 월별 파티션 {months.nunique()}개로 옮겼습니다.")
+
+    def _entry_for(self, df, month, archived):
+        """파티션 내용으로 manifest 항목 생성"""
+        record_ids = pd.to_numeric(df['record_id'])
+        return {
+            "file": os.path.basename(self.path(month, archived=archived)),
+            "records": int(len(df)),
+            "min_record_id": int(record_ids.min()) if len(df) else None,
+            "max_record_id": int(record_ids.max()) if len(df) else None,
+            "archived": archived
+        }
+
+    def _load_manifest(self):
+        """manifest를 (바뀌었으면 다시) 읽음 (self.lock을 잡은 상태에서 호출)"""
+        if not os.path.exists(self.manifest_path):
+            self.init()
+        stat = os.stat(self.manifest_path)
+        signature = (stat.st_mtime_ns, stat.st_ino, stat.st_size)
+        if self.manifest is None or signature != self.manifest_signature:
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                self.manifest = json.load(f)
+            self.manifest_signature = signature
+        return self.manifest
+
+    def _save_manifest(self):
+        """임시 파일에 쓴 뒤 교체 (_locked() 안에서 호출)"""
+        temp_path = f"{self.manifest_path}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.manifest, f, ensure_ascii=False, indent=2, sort_keys=True)
+        os.replace(temp_path, self.manifest_path)
+        stat = os.stat(self.manifest_path)
+        self.manifest_signature = (stat.st_mtime_ns, stat.st_ino, stat.st_size)
+
+    # === 파티션 ===
+
+    def path(self, month, archived=None):
+        if archived is None:
+            entry = self.partitions().get(month)
+            archived = bool(entry and entry.get("archived"))
+        return os.path.join(self.directory, f"{month}.csv.gz" if archived else f"{month}.csv")
+
+    def partitions(self):
+        """월 -> manifest 항목"""
+        with self.lock:
+            return dict(self._load_manifest()["partitions"])
+
+    def months(self, start_month=None, end_month=None):
+        """기간(월, 포함)과 겹치는 파티션 월 목록 (기간을 주면 날짜 없는 파티션은 제외)"""
+        months = sorted(self.partitions())
+        if start_month is None and end_month is None:
+            return months
+        return [
+            month for month in months
+            if month != UNDATED and (start_month is None or month >= start_month) and (end_month is None or month <= end_month)
+        ]
+
+    def _read_file(self, path):
+        return pd.read_csv(path, dtype={'date': str, 'time': str, 'tag': str}, keep_default_na=False)
+
+    def read(self, months):
+        """
+        파티션들을 읽어 하나의 DataFrame으로 (날짜/시간/태그는 문자열)
+        manifest에 있는 파티션 파일이 없으면 (보관 명령이 막 압축한 경우를 위해 manifest를 다시 읽어
+        한 번 더 찾은 뒤) FileNotFoundError
+        """
+        frames = []
+        for month in months:
+            path = self.path(month)
+            if not os.path.exists(path):
+                with self._locked():
+                    path = self.path(month)
+                    if month in self.manifest["partitions"] and not os.path.exists(path):
+                        raise FileNotFoundError(f"출퇴근 기록 파티션 파일이 없습니다: {path} (manifest에는 {month} 항목이 있음)")
+                    if month not in self.manifest["partitions"]:
+                        continue
+            frames.append(self._read_file(path))
+            self.partition_reads += 1
+        if not frames:
+            return pd.DataFrame({column: pd.Series(dtype=object) for column in ATTENDANCE_COLUMNS})
+        return pd.concat(frames, ignore_index=True)
+
+    def read_all(self):
+        return self.read(self.months())
+
+    def open_for_append(self, month, record_id):
+        """
+        month 파티션의 추가 모드 파일 경로 (없으면 헤더와 함께 만들고 manifest에 등록)
+        manifest에 항목이 없는데 파일이 남아 있으면 지우지 않고 파일 내용으로 항목을 다시 만든다.
+        압축된 파티션에 다시 써야 하면(시계가 되돌아간 경우 등) 먼저 압축을 푼다.
+        """
+        with self._locked():
+            manifest = self._load_manifest()
+            entry = manifest["partitions"].get(month)
+            if entry is None:
+                path = self._recover_entry(month)
+                if path is None:
+                    path = self.path(month, archived=False)
+                    with open(path, 'x', encoding='utf-8', newline='') as f:
+                        f.write(','.join(ATTENDANCE_COLUMNS) + '\n')
+                    manifest["partitions"][month] = {
+                        "file": os.path.basename(path),
+                        "records": 0,
+                        "min_record_id": int(record_id),
+                        "max_record_id": None,
+                        "archived": False
+                    }
+                self._save_manifest()
+                entry = manifest["partitions"][month]
+            if entry.get("archived"):
+                self._unarchive(month)
+            return self.path(month, archived=False)
+
+    def _recover_entry(self, month):
+        """manifest에 없는 월의 파티션 파일이 있으면 내용을 읽어 항목을 다시 만들고 경로 반환 (_locked() 안에서 호출)"""
+        for archived in (False, True):
+            path = self.path(month, archived=archived)
+            if os.path.exists(path):
+                df = self._read_file(path)
+                self.manifest["partitions"][month] = self._entry_for(df, month, archived)
+                print(f"manifest에 없던 출퇴근 기록 파티션을 복구했습니다: {path} ({len(df)}건)")
+                return path
+        return None
+
+    def reconcile(self):
+        """
+        파일 마지막 record_id가 manifest의 max_record_id보다 큰 파티션 항목을 파일 내용으로 다시 만듦
+        (기록을 덧붙인 뒤 manifest를 저장하기 전에 종료된 경우, 기록기를 열 때 호출)
+        """
+        with self._locked():
+            partitions = self._load_manifest()["partitions"]
+            changed = False
+            for month, entry in sorted(partitions.items()):
+                path = self.path(month, archived=False)
+                if entry.get("archived") or not os.path.exists(path):
+                    continue
+                if last_record_id(path) > (entry.get("max_record_id") or 0):
+                    df = self._read_file(path)
+                    partitions[month] = self._entry_for(df, month, archived=False)
+                    changed = True
+                    print(f"manifest에 반영되지 않은 출퇴근 기록을 복구했습니다: {path} ({len(df)}건)")
+            if changed:
+                self._save_manifest()
+
+    def record_appended(self, month, record_id):
+        """추가한 기록 수와 record_id를 모아 둠 (manifest 파일에는 flush_manifest에서 반영)"""
+        with self.lock:
+            appended = self.appended.setdefault(month, [0, int(record_id)])
+            appended[0] += 1
+            appended[1] = max(appended[1], int(record_id))
+
+    def flush_manifest(self):
+        """모아 둔 추가 기록을 최신 manifest에 반영"""
+        with self._locked():
+            if not self.appended:
+                return
+            partitions = self._load_manifest()["partitions"]
+            for month, (count, max_record_id) in self.appended.items():
+                entry = partitions.get(month)
+                if entry is None:
+                    self._recover_entry(month)
+                    continue
+                entry["records"] = entry.get("records", 0) + count
+                entry["max_record_id"] = max(entry.get("max_record_id") or 0, max_record_id)
+            self.appended = {}
+            self._save_manifest()
+
+    def latest_month(self):
+        """기록이 마지막으로 추가된 월 파티션 (날짜 없는 파티션은 다른 파티션이 없을 때만)"""
+        partitions = self.partitions()
+        months = [month for month in partitions if month != UNDATED] or list(partitions)
+        return max(
+            months,
+            key=lambda month: partitions[month].get("max_record_id") or partitions[month].get("min_record_id") or 0,
+            default=None
+        )
+
+    def find_record_months(self, record_id):
+        """
+        record_id 범위에 해당하는 파티션 월 목록 (최근 월부터)
+        기록이 추가되는 가장 최근 파티션은 manifest의 max_record_id가 늦게 반영되므로 상한 없이 취급
+        """
+        record_id = int(record_id)
+        partitions = self.partitions()
+        latest = self.latest_month()
+        return [
+            month for month, entry in sorted(partitions.items(), reverse=True)
+            if (entry.get("min_record_id") is None or entry["min_record_id"] <= record_id)
+            and (month == latest or entry.get("max_record_id") is None or record_id <= entry["max_record_id"])
+        ]
+
+    def rewrite(self, month, df):
+        """파티션 하나를 다시 씀 (압축된 파티션은 압축해서, 보관 명령과 겹치지 않도록 manifest 잠금 안에서)"""
+        with self._locked():
+            path = self.path(month)
+            temp_path = f"{path}.tmp"
+            df[ATTENDANCE_COLUMNS].to_csv(temp_path, index=False, lineterminator='\n', compression='gzip' if path.endswith('.gz') else None)
+            os.replace(temp_path, path)
+            self.partition_rewrites += 1
+
+    # === 보관 ===
+
+    def archive(self, before_month=None, dry_run=False):
+        """
+        before_month(기본: 이번 달) 이전의 압축되지 않은 파티션을 gzip으로 압축
+        반환값: 압축한(dry_run이면 압축할) 월 목록
+
+        압축은 잠금 밖에서 임시 파일로 하고, 월마다 잠금을 잡아 최신 manifest를 다시 읽은 뒤
+        원본이 그 사이 바뀌지 않았을 때만 교체한다 (바뀌었으면 그 월은 건너뜀).
+        """
+        before_month = before_month or datetime.date.today().strftime("%Y-%m")
+        targets = [
+            month for month, entry in sorted(self.partitions().items())
+            if month != UNDATED and month < before_month and not entry.get("archived")
+        ]
+        if dry_run:
+            return targets
+
+        archived = []
+        for month in targets:
+            source = self.path(month, archived=False)
+            if not os.path.exists(source):
+                continue
+            before = os.stat(source)
+            temp_path = f"{source}.gz.tmp"
+            with open(source, 'rb') as src, gzip.open(temp_path, 'wb') as dst:
+                shutil.copyfileobj(src, dst)
+
+            with self._locked():
+                entry = self._load_manifest()["partitions"].get(month)
+                after = os.stat(source) if os.path.exists(source) else None
+                unchanged = after is not None and (after.st_ino, after.st_size, after.st_mtime_ns) == (
+                    before.st_ino, before.st_size, before.st_mtime_ns)
+                if entry is None or entry.get("archived") or not unchanged:
+                    os.remove(temp_path)
+                    print(f"{month} 파티션이 압축 중에 바뀌어 건너뜁니다.")
+                    continue
+                os.replace(temp_path, f"{source}.gz")
+                entry["archived"] = True
+                entry["file"] = os.path.basename(f"{source}.gz")
+                self._save_manifest()
+                os.remove(source)
+            archived.append(month)
+        return archived
+
+    def _unarchive(self, month):
+        """압축된 파티션을 다시 풀어 둠 (_locked() 안에서 호출)"""
+        source = self.path(month, archived=True)
+        with gzip.open(source, 'rb') as src, open(self.path(month, archived=False), 'wb') as dst:
+            shutil.copyfileobj(src, dst)
+        entry = self.manifest["partitions"][month]
+        entry["archived"] = False
+        entry["file"] = os.path.basename(self.path(month, archived=False))
+        self._save_manifest()
+        os.remove(source)
+
+    def metrics(self):
+        with self.lock:
+            partitions = self._load_manifest()["partitions"]
+            return {
+                "partitions": len(partitions),
+                "archived": sum(1 for entry in partitions.values() if entry.get("archived")),
+                "records": sum(entry.get("records", 0) for entry in partitions.values()),
+                "partition_reads": self.partition_reads,
+                "partition_rewrites": self.partition_rewrites
+            }
+
+
+# 프로세스 전역 출퇴근 기록 파티션 저장소
+attendance_partitions = AttendancePartitions(ATTENDANCE_PARTITION_DIR, ATTENDANCE_CSV_PATH)
+
+
+def main():
+    # 지난 달 파티션 압축: python attendance_partitions.py archive [--before 2025-01] [--dry-run]
+    parser = argparse.ArgumentParser(description="월별 출퇴근 기록 파티션 관리")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    archive_parser = subparsers.add_parser("archive", help="지난 달 파티션을 gzip으로 압축")
+    archive_parser.add_argument("--before", default=None, help="이 월(YYYY-MM) 이전 파티션만 압축 (기본: 이번 달)")
+    archive_parser.add_argument("--dry-run", action="store_true", help="압축하지 않고 대상만 출력")
+    subparsers.add_parser("status", help="파티션 목록 출력")
+    args = parser.parse_args()
+
+    attendance_partitions.init()
+    if args.command == "archive":
+        months = attendance_partitions.archive(args.before, args.dry_run)
+        action = "압축 대상" if args.dry_run else "압축 완료"
+        print(f"{action}: {', '.join(months) if months else '없음'}")
+    else:
+        for month, entry in sorted(attendance_partitions.partitions().items()):
+            print(f"{month}: {entry['file']} ({entry.get('records', 0)}건, record_id {entry.get('min_record_id')} ~ {entry.get('max_record_id')})")
+
+
+if __name__ == "__main__":
+    main()
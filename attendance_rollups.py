@@ -0,0 +1,288 @@
+# attendance_rollups.py - 출퇴근 통계용 (날짜, 직원)별 일일 집계 테이블
+import threading
+import numpy as np
+import pandas as pd
+
+from attendance_index import match_employee_ids
+from attendance_partitions import month_of
+
+# 집계하는 태그 (그 외 태그는 '기타', 빈 태그는 '미지정')
+TAGS = ['출근', '지각', '퇴근', '외근', '반차', '미지정', '기타']
+CHECKIN_TAGS = ('출근', '지각')  # 출근 시간 분포/평균에 포함하는 태그
+
+# 집계 행의 열 배치: 기록 수, 태그별 수, 출근 기록 수, 출근 시각(분) 합, 시간대(0~23시)별 출근 수
+COL_RECORDS = 0
+COL_TAGS = 1
+COL_CHECKINS = COL_TAGS + len(TAGS)
+COL_CHECKIN_MINUTES = COL_CHECKINS + 1
+COL_HOURS = COL_CHECKIN_MINUTES + 1
+WIDTH = COL_HOURS + 24
+
+
+def tag_column(tag):
+    if not tag:
+        return '미지정'
+    return tag if tag in TAGS else '기타'
+
+
+def time_minutes(time_str):
+    """'HH:MM:SS' -> 자정 이후 분 (형식이 잘못되면 None)"""
+    try:
+        hour, minute = int(time_str[:2]), int(time_str[3:5])
+    except (TypeError, ValueError):
+        return None
+    return hour * 60 + minute if 0 <= hour < 24 else None
+
+
+def format_minutes(minutes):
+    return f"{int(minutes // 60):02d}:{int(round(minutes % 60)):02d}"
+
+
+class AttendanceRollups:
+    """
+    출퇴근 기록을 (날짜, 직원)마다 한 행으로 미리 집계한 테이블
+
+    각 행은 WIDTH 길이의 배열(기록 수, 태그별 수, 출근 시각 합, 시간대별 출근 수)과 첫/마지막 기록 시각.
+    월 단위로 처음 조회할 때 그 월의 기록으로 한 번 만들고(pandas group-by), 이후에는 기록 추가/태그
+    수정 때 해당 행만 갱신한다. 통계 조회는 기간에 해당하는 날짜의 행만 모아 numpy/pandas로 다시 묶는다.
+    기록 저장과 add()/태그 수정과 retag()는 lock 안에서 함께 해야 한다 (그 사이 집계를 만들면 두 번 반영됨).
+    """
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.loaded = False  # 전체 월을 만들었는지
+        self.loaded_months = set()
+        self.days = {}  # 날짜 문자열 -> {employee_id: [집계 배열, 첫 기록 시각, 마지막 기록 시각]}
+
+        # 지표
+        self.builds = 0
+        self.updates = 0
+
+    def invalidate(self):
+        with self.lock:
+            self.loaded = False
+            self.loaded_months = set()
+            self.days = {}
+
+    def _is_loaded(self, date):
+        return self.loaded or month_of(date) in self.loaded_months
+
+    def ensure_loaded(self, load_records, months=None):
+        """
+        months(None이면 전체) 중 아직 만들지 않은 월의 집계 행 생성
+        load_records(months): 그 월들(None이면 전체)의 employee_id, date, time, tag 열 DataFrame을 반환하는 함수
+        """
+        with self.lock:
+            if self.loaded:
+                return
+            if months is None:
+                self.days = {}
+                self._build(load_records(None))
+                self.loaded = True
+            else:
+                missing = [month for month in months if month not in self.loaded_months]
+                if not missing:
+                    return
+                self._build(load_records(missing))
+                self.loaded_months.update(missing)
+            self.builds += 1
+
+    def _build(self, df):
+        """기록으로 집계 행을 만들어 추가 (이미 있는 날짜와 겹치지 않는 월만 넘겨야 함)"""
+        if df.empty:
+            return
+
+        df = pd.DataFrame({
+            'employee_id': df['employee_id'].astype(np.int64),
+            'date': df['date'].astype(str),
+            'time': df['time'].astype(str),
+            'tag': df['tag'].fillna('').astype(str).map(tag_column)
+        }).reset_index(drop=True)
+        minutes = pd.to_numeric(df['time'].str[:2], errors='coerce') * 60 + pd.to_numeric(df['time'].str[3:5], errors='coerce')
+        checkin = df['tag'].isin(CHECKIN_TAGS) & minutes.notna() & (minutes < 24 * 60)
+
+        values = np.zeros((len(df), WIDTH), dtype=np.float64)
+        values[:, COL_RECORDS] = 1
+        values[np.arange(len(df)), COL_TAGS + df['tag'].map(TAGS.index).to_numpy()] = 1
+        values[:, COL_CHECKINS] = checkin.to_numpy()
+        values[:, COL_CHECKIN_MINUTES] = np.where(checkin, minutes.fillna(0), 0)
+        rows = np.flatnonzero(checkin.to_numpy())
+        values[rows, COL_HOURS + (minutes.to_numpy()[rows] // 60).astype(int)] = 1
+
+        keys = df[['date', 'employee_id']]
+        sums = pd.DataFrame(values).groupby([keys['date'], keys['employee_id']]).sum()
+        times = df.groupby(['date', 'employee_id'])['time'].agg(['min', 'max'])
+        for (date, employee_id), row in zip(sums.index, sums.to_numpy().copy()):
+            first, last = times.loc[(date, employee_id)]
+            self.days.setdefault(date, {})[int(employee_id)] = [row, first, last]
+
+    def add(self, employee_id, date, time, tag):
+        """기록 한 건 반영 (그 월을 아직 만들기 전이면 만들 때 포함되므로 무시)"""
+        with self.lock:
+            if not self._is_loaded(date):
+                return
+            entry = self.days.setdefault(date, {}).get(int(employee_id))
+            if entry is None:
+                entry = [np.zeros(WIDTH, dtype=np.float64), time, time]
+                self.days[date][int(employee_id)] = entry
+            entry[0][COL_RECORDS] += 1
+            entry[1], entry[2] = min(entry[1], time), max(entry[2], time)
+            self._apply_tag(entry[0], time, tag, 1)
+            self.updates += 1
+
+    def retag(self, employee_id, date, time, old_tag, new_tag):
+        """기록 한 건의 태그 변경 반영"""
+        with self.lock:
+            if not self._is_loaded(date):
+                return
+            entry = self.days.get(date, {}).get(int(employee_id))
+            if entry is None:
+                return
+            self._apply_tag(entry[0], time, old_tag, -1)
+            self._apply_tag(entry[0], time, new_tag, 1)
+            self.updates += 1
+
+    def _apply_tag(self, values, time, tag, sign):
+        column = tag_column(tag)
+        values[COL_TAGS + TAGS.index(column)] += sign
+        minutes = time_minutes(time)
+        if column in CHECKIN_TAGS and minutes is not None:
+            values[COL_CHECKINS] += sign
+            values[COL_CHECKIN_MINUTES] += sign * minutes
+            values[COL_HOURS + minutes // 60] += sign
+
+    def frame(self, start_date=None, end_date=None, employee_ids=None):
+        """
+        기간(날짜 문자열, 포함)과 직원 집합에 해당하는 집계 행을 DataFrame으로
+        열: date, employee_id, first_time, last_time, 그리고 0 ~ WIDTH-1 집계 값
+        """
+        with self.lock:
+            dates = sorted(date for date in self.days
+                           if (not start_date or date >= start_date) and (not end_date or date <= end_date))
+            keys, firsts, lasts, values = [], [], [], []
+            for date in dates:
+                for employee_id, (row, first, last) in self.days[date].items():
+                    if employee_ids is not None and employee_id not in employee_ids:
+                        continue
+                    keys.append((date, employee_id))
+                    firsts.append(first)
+                    lasts.append(last)
+                    values.append(row)
+
+        df = pd.DataFrame(np.array(values).reshape(len(values), WIDTH))
+        df.insert(0, 'date', [date for date, _ in keys])
+        df.insert(1, 'employee_id', [employee_id for _, employee_id in keys])
+        df.insert(2, 'first_time', firsts)
+        df.insert(3, 'last_time', lasts)
+        return df
+
+    def metrics(self):
+        with self.lock:
+            return {
+                "loaded": self.loaded,
+                "loaded_months": len(self.loaded_months),
+                "days": len(self.days),
+                "rows": sum(len(employees) for employees in self.days.values()),
+                "builds": self.builds,
+                "updates": self.updates
+            }
+
+
+def _tag_counts(values):
+    return {tag: int(values[COL_TAGS + i]) for i, tag in enumerate(TAGS)}
+
+
+def _summary(df):
+    """집계 행 전체의 태그별 수, 직원 수, 시간대별 출근 분포"""
+    totals = df[list(range(WIDTH))].to_numpy().sum(axis=0) if len(df) else np.zeros(WIDTH)
+    return {
+        "employees": int(df['employee_id'].nunique()),
+        "tag_counts": _tag_counts(totals),
+        "records": int(totals[COL_RECORDS])
+    }, totals[COL_HOURS:COL_HOURS + 24].astype(int).tolist(), totals
+
+
+def daily_statistics(rollups, start_date=None, end_date=None):
+    """일자별 태그 수와 출근 직원 수"""
+    df = rollups.frame(start_date, end_date)
+    summary, time_distribution, _ = _summary(df)
+
+    days = []
+    if len(df):
+        grouped = df.groupby('date')
+        sums = grouped[list(range(WIDTH))].sum()
+        employees = grouped['employee_id'].nunique()
+        for date, values in zip(sums.index, sums.to_numpy()):
+            days.append({"date": date, "tags": _tag_counts(values), "employees": int(employees[date])})
+
+    return {"summary": summary, "time_distribution": time_distribution, "days": days}
+
+
+def department_statistics(rollups, employees, start_date=None, end_date=None, department=None):
+    """부서별(현재 직원 정보 기준) 태그 수와 직원 수 (department가 있으면 부분 일치하는 부서만)"""
+    employee_ids = match_employee_ids(employees, {'department': department})
+    df = rollups.frame(start_date, end_date, employee_ids)
+    summary, time_distribution, _ = _summary(df)
+
+    departments = []
+    if len(df):
+        department_map = {int(employee['employee_id']): employee.get('department') or '미지정' for employee in employees}
+        df['department'] = df['employee_id'].map(lambda employee_id: department_map.get(employee_id, '미지정'))
+        grouped = df.groupby('department')
+        sums = grouped[list(range(WIDTH))].sum()
+        counts = grouped['employee_id'].nunique()
+        for name, values in zip(sums.index, sums.to_numpy()):
+            departments.append({"department": name, "tags": _tag_counts(values), "employees": int(counts[name])})
+
+    return {"summary": summary, "time_distribution": time_distribution, "departments": departments}
+
+
+def personal_statistics(rollups, employees, name, start_date=None, end_date=None):
+    """
+    이름이 일치하는 직원의 일자별 기록 수/첫·마지막 기록/태그와 평균 출근 시각
+    (같은 이름이 있으면 그 직원을, 없으면 부분 일치하는 직원들을 합쳐 집계)
+    """
+    matched = [employee for employee in employees if employee.get('name') == name]
+    if not matched:
+        employee_ids = match_employee_ids(employees, {'name': name})
+        matched = [employee for employee in employees if int(employee['employee_id']) in employee_ids]
+    employee_ids = {int(employee['employee_id']) for employee in matched}
+
+    df = rollups.frame(start_date, end_date, employee_ids)
+    summary, time_distribution, totals = _summary(df)
+    checkins = totals[COL_CHECKINS]
+
+    days = []
+    if len(df):
+        grouped = df.groupby('date')
+        sums = grouped[list(range(WIDTH))].sum()
+        firsts = grouped['first_time'].min()
+        lasts = grouped['last_time'].max()
+        for date, values in zip(sums.index, sums.to_numpy()):
+            days.append({
+                "date": date,
+                "records": int(values[COL_RECORDS]),
+                "first_time": firsts[date],
+                "last_time": lasts[date],
+                "tags": [tag for i, tag in enumerate(TAGS) if values[COL_TAGS + i] > 0]
+            })
+
+    employee = matched[0] if matched else {}
+    return {
+        "summary": summary,
+        "time_distribution": time_distribution,
+        "employee": {
+            "name": employee.get('name') or name,
+            "department": employee.get('department') or '',
+            "position": employee.get('position') or '',
+            "employeeId": employee.get('employeeId') or ''
+        },
+        "matched_employees": len(matched),
+        "total_days": len(days),
+        "avg_checkin_time": format_minutes(totals[COL_CHECKIN_MINUTES] / checkins) if checkins else None,
+        "days": days
+    }
+
+
+# 프로세스 전역 출퇴근 일일 집계 테이블
+attendance_rollups = AttendanceRollups()
@@ -0,0 +1,124 @@
+# benchmark_ann.py - 정확 검색 대비 HNSW 근사 검색의 재현율/지연 시간 측정
+#
+# 사용 예:
+#   python benchmark_ann.py                         # 합성 벡터 20,000개
+#   python benchmark_ann.py --size 50000 --ef 50 100 200
+#   python benchmark_ann.py --real                  # 등록된 얼굴 벡터(face_encodings.f32) 사용
+import os
+import time
+import argparse
+import tempfile
+import numpy as np
+
+from face_gallery import FaceGallery, normalize_vectors
+from ann_index import AnnIndex, hnswlib
+from config import COMPARE_TOP_K, HNSW_M, HNSW_EF_CONSTRUCTION
+
+
+def synthetic_vectors(size, dim, faces_per_person, seed):
+    """직원별 중심 벡터 주변에 흩어진 얼굴 벡터 생성 (실제 임베딩 분포와 비슷하게)"""
+    rng = np.random.default_rng(seed)
+    people = max(1, size // faces_per_person)
+    centers = normalize_vectors(rng.standard_normal((people, dim)))
+    owners = rng.integers(0, people, size)
+    noise = rng.standard_normal((size, dim)) * (2.8 / np.sqrt(dim))
+    return normalize_vectors(centers[owners] + noise), rng
+
+
+def make_probes(vectors, count, rng):
+    """등록 벡터에 잡음을 더해 같은 사람의 다른 사진처럼 만든 프로브"""
+    picks = rng.integers(0, len(vectors), count)
+    noise = rng.standard_normal((count, vectors.shape[1])).astype(np.float32) * (0.5 / np.sqrt(vectors.shape[1]))
+    return normalize_vectors(vectors[picks] + noise)
+
+
+def real_vectors():
+    """바이너리 임베딩 저장소의 모든 벡터"""
+    from embedding_store import embedding_store
+    embedding_store.open()
+    encoding_ids = [int(encoding_id) for encoding_id in embedding_store.ids if encoding_id >= 0]
+    _, vectors = embedding_store.get_many(encoding_ids)
+    return normalize_vectors(vectors)
+
+
+def percentile_ms(samples, q):
+    return round(float(np.percentile(samples, q)) * 1000, 3)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="정확 검색 대비 HNSW 근사 검색 벤치마크")
+    parser.add_argument("--size", type=int, default=20000, help="합성 벡터 수")
+    parser.add_argument("--dim", type=int, default=512, help="벡터 차원 (ArcFace: 512)")
+    parser.add_argument("--faces-per-person", type=int, default=5, help="합성 데이터의 직원당 얼굴 수")
+    parser.add_argument("--queries", type=int, default=500, help="프로브 수")
+    parser.add_argument("--top-k", type=int, default=COMPARE_TOP_K, help="재현율을 측정할 상위 개수")
+    parser.add_argument("--ef", type=int, nargs="+", default=[50, 100, 200, 400], help="측정할 검색 탐색 폭(ef)")
+    parser.add_argument("--M", type=int, default=HNSW_M)
+    parser.add_argument("--ef-construction", type=int, default=HNSW_EF_CONSTRUCTION)
+    parser.add_argument("--real", action="store_true", help="등록된 얼굴 벡터 사용")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    if hnswlib is None:
+        print("hnswlib가 설치되어 있지 않습니다. (pip install hnswlib)")
+        return
+
+    rng = np.random.default_rng(args.seed)
+    if args.real:
+        vectors = real_vectors()
+        print(f"등록된 얼굴 벡터 {len(vectors)}개 사용")
+    else:
+        vectors, rng = synthetic_vectors(args.size, args.dim, args.faces_per_person, args.seed)
+        print(f"합성 벡터 {len(vectors)}개 생성 (차원 {vectors.shape[1]}, 직원당 얼굴 {args.faces_per_person}개)")
+    if len(vectors) == 0:
+        print("측정할 벡터가 없습니다.")
+        return
+
+    records = [{'encoding_id': i, 'employee_id': i, 'image_path': None} for i in range(len(vectors))]
+    probes = make_probes(vectors, args.queries, rng)
+    top_k = min(args.top_k, len(vectors))
+
+    # 정확 검색 (기준)
+    exact = FaceGallery()
+    exact.build(records, vectors=vectors)
+    truth = []
+    exact_best = []
+    exact_times = []
+    for probe in probes:
+        started = time.perf_counter()
+        results = exact.search(probe, top_k=top_k)
+        exact_times.append(time.perf_counter() - started)
+        truth.append({record['encoding_id'] for record, _ in results})
+        exact_best.append(results[0][0]['encoding_id'])
+    print(f"\n[정확 검색] top-{top_k}  p50 {percentile_ms(exact_times, 50)}ms  p95 {percentile_ms(exact_times, 95)}ms")
+
+    # HNSW 인덱스 생성 (임시 디렉토리에 저장)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        index = AnnIndex(os.path.join(tmp_dir, "bench.hnsw"), M=args.M,
+                         ef_construction=args.ef_construction, min_size=0)
+        approx = FaceGallery(index=index)
+        started = time.perf_counter()
+        approx.build(records, vectors=vectors)
+        print(f"[HNSW] M={args.M} ef_construction={args.ef_construction}  생성 {round(time.perf_counter() - started, 2)}초")
+
+        print(f"\n{'ef':>6} {'recall@k':>10} {'top1 일치':>10} {'p50(ms)':>10} {'p95(ms)':>10} {'속도 향상':>10}")
+        for ef in args.ef:
+            index.ef_search = ef
+            recalls = []
+            top1_hits = 0
+            times = []
+            for probe, expected, best in zip(probes, truth, exact_best):
+                started = time.perf_counter()
+                results = approx.search(probe, top_k=top_k)
+                times.append(time.perf_counter() - started)
+                found = [record['encoding_id'] for record, _ in results]
+                recalls.append(len(expected.intersection(found)) / len(expected))
+                top1_hits += int(bool(found) and found[0] == best)
+
+            speedup = np.median(exact_times) / np.median(times)
+            print(f"{ef:>6} {np.mean(recalls):>10.4f} {top1_hits / len(probes):>10.4f} "
+                  f"{percentile_ms(times, 50):>10} {percentile_ms(times, 95):>10} {speedup:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -6,16 +6,92 @@ DATA_DIR = "data_faces"
 # CSV 파일 경로들
 EMPLOYEES_CSV_PATH = "employees.csv"
 FACE_ENCODINGS_CSV_PATH = "face_encodings.csv" 
-ATTENDANCE_CSV_PATH = "attendance_records.csv"
+ATTENDANCE_CSV_PATH = "attendance_records.csv"  # 이전 단일 파일 (있으면 처음 시작할 때 월별 파티션으로 옮김)
+ATTENDANCE_PARTITION_DIR = "attendance_records"  # 출퇴근 기록 월별 파티션(YYYY-MM.csv)과 manifest.json 디렉터리
+
+# 얼굴 썸네일 설정 (비교 결과/직원 관리 화면 표시용)
+THUMBNAIL_DIR = "data_faces/thumbnails"
+THUMBNAIL_MAX_SIZE = 200  # 썸네일 긴 변 최대 픽셀
+THUMBNAIL_JPEG_QUALITY = 85
+THUMBNAIL_CACHE_SIZE = 512  # 메모리에 보관할 썸네일 수 (LRU)
+
+# 저장소 백엔드 설정
+STORAGE_BACKEND = "csv"  # "csv": CSV 파일, "sqlite": SQLite (최초 시작 시 기존 CSV 데이터를 가져옴)
+SQLITE_DB_PATH = "face_attendance.db"
+
+# 얼굴 벡터 바이너리 저장소 경로 (float32 행렬 + encoding_id 사이드카)
+EMBEDDINGS_PATH = "face_encodings.f32"
+EMBEDDING_IDS_PATH = "face_encodings.ids"
+EMBEDDING_COMPACTION_RATIO = 0.25  # 삭제된 행 비율이 이 값을 넘으면 저장소 압축
+
+# 출퇴근 기록 추가 전용 기록 설정
+ATTENDANCE_SEQ_PATH = "attendance_records.seq"  # 마지막 record_id 저장 파일
+ATTENDANCE_FSYNC_BATCH = 16  # 이 건수만큼 쌓이면 fsync
+ATTENDANCE_FSYNC_INTERVAL = 1.0  # 마지막 fsync 후 이 시간(초)이 지나면 fsync
 
 # 얼굴 인식 설정
 FACE_MODEL = "ArcFace"  # 얼굴 인식 모델
 DETECTOR_BACKEND = "mtcnn"  # 얼굴 감지 백엔드
+COMPARE_TOP_K = 50  # 얼굴 비교 시 유사도 상위 몇 개의 얼굴까지 후보로 검토할지 (중간 유사도 후보의 face_count도 이 안에서 셈)
+COMPARE_ACCEPT_FACE_HINT = True  # compare-face에 얼굴 영역/눈 위치가 함께 오면 감지기 없이 정렬 후 임베딩 (False면 항상 재감지)
+PROBE_CACHE_TTL = 120.0  # 비교에 쓴 얼굴(임베딩 + 이미지)을 출근 확정 시 재사용할 수 있도록 보관하는 시간(초)
+PROBE_CACHE_MAX_ENTRIES = 64  # 보관할 최대 개수
+
+# 갤러리 정리 설정 (직원별 얼굴 수 제한, python gallery_curation.py로 기존 데이터 정리)
+GALLERY_MAX_FACES_PER_EMPLOYEE = 20  # 직원당 최대 얼굴 수 (넘으면 다양한 얼굴만 남기고 삭제, 0이면 제한 없음)
+GALLERY_DUPLICATE_THRESHOLD = 0.95  # 같은 직원의 기존 얼굴과 이 유사도 이상이면 거의 같은 사진으로 보고 추가하지 않음
+
+# 갤러리 검색 방식 설정
+GALLERY_SEARCH_MODE = "exact"  # "exact": 전체 행렬 정확 검색, "hnsw": HNSW 근사 검색 (hnswlib 설치 필요), "prototype": 직원 대표 벡터로 후보 직원을 고른 뒤 정확 검색
+HNSW_INDEX_PATH = "face_encodings.hnsw"  # 인덱스 파일 (포함된 encoding_id 목록은 .ids.npy로 함께 저장)
+HNSW_M = 16  # 노드당 연결 수 (클수록 정확하지만 메모리/생성 시간 증가)
+HNSW_EF_CONSTRUCTION = 200  # 인덱스 생성 시 탐색 폭
+HNSW_EF_SEARCH = 100  # 검색 시 탐색 폭 (클수록 재현율이 높고 느림, COMPARE_TOP_K 이상으로 자동 조정)
+HNSW_MIN_GALLERY_SIZE = 1000  # 등록 얼굴이 이 수 미만이면 근사 인덱스가 있어도 정확 검색 사용
+HNSW_SAVE_EVERY = 100  # 추가/삭제가 이 횟수만큼 쌓이면 인덱스 파일 저장 (서버 종료 시에도 저장)
+PROTOTYPE_TOP_EMPLOYEES = 20  # "prototype" 검색에서 얼굴을 정확히 재채점할 후보 직원 수
+PROTOTYPE_MIN_GALLERY_SIZE = 1000  # 등록 얼굴이 이 수 미만이면 대표 벡터 인덱스가 있어도 정확 검색 사용
+
+WARMUP_ON_STARTUP = True  # 서버 시작 시 모델을 미리 적재하고 합성 이미지로 워밍업
+
+# 추론 실행기 설정 (얼굴 감지/인식을 이벤트 루프 밖에서 실행)
+INFERENCE_EXECUTOR_KIND = "thread"  # "thread" 또는 "process" (process는 워커마다 갤러리 캐시를 따로 적재하므로 등록 직후 결과가 반영되지 않음)
+INFERENCE_WORKERS = 2  # 동시에 실행할 추론 작업 수
+INFERENCE_QUEUE_SIZE = 8  # 실행 대기 가능한 작업 수 (초과 시 429 응답)
+INFERENCE_TIMEOUT = 30.0  # 작업 완료 대기 시간(초) (초과 시 503 응답)
+
+# 얼굴 후보 검출 설정 (감지 전 Haar cascade로 빈 프레임을 거르고 MTCNN을 돌릴 영역 제안)
+PREDETECT_ENABLED = True
+PREDETECT_WIDTH = 320  # 후보 검출용으로 축소할 프레임 너비(px)
+PREDETECT_SCALE_FACTOR = 1.1  # Haar cascade 이미지 피라미드 배율
+PREDETECT_MIN_NEIGHBORS = 3  # 작을수록 얼굴을 덜 놓치지만 오검출 증가
+PREDETECT_MIN_FACE_RATIO = 0.02  # 프레임 대비 이 비율보다 작은 얼굴 후보는 무시
+PREDETECT_ROI_MARGIN = 0.5  # 후보 주변에 더할 여백 (얼굴 크기 대비 비율)
+PREDETECT_FULL_DETECT_EVERY = 10  # 연속으로 이 횟수만큼 후보가 없으면 한 번은 전체 프레임 감지 (Haar 누락 대비)
+
+# 세션별 얼굴 추적 설정 (연속 프레임에서 얼굴 감지/검증 생략)
+FACE_TRACKER_REDETECT_EVERY = 10  # 추적 중에도 이 프레임 수마다 전체 감지를 다시 실행
+FACE_TRACKER_MIN_SCORE = 0.7  # 템플릿 매칭 점수가 이 값 미만이면 추적 실패로 보고 다시 감지
+FACE_TRACKER_SEARCH_MARGIN = 0.5  # 이전 얼굴 영역 주변 탐색 범위 (얼굴 크기 대비 비율)
+FACE_TRACKER_SESSION_TTL = 60.0  # 이 시간(초) 동안 프레임이 없는 세션의 추적기는 정리
+FACE_TRACKER_MAX_SESSIONS = 256
+
+# 키오스크 WebSocket 스트리밍 설정 (/ws/kiosk)
+KIOSK_MAX_FRAME_BYTES = 2 * 1024 * 1024  # 이보다 큰 프레임은 버림
+
+# 임베딩 배치 처리 설정 (동시에 들어온 얼굴 비교 요청을 모아 한 번에 추론)
+EMBEDDING_BATCH_WINDOW_MS = 10  # 첫 요청 후 다른 요청을 기다리는 시간(ms)
+EMBEDDING_BATCH_MAX_SIZE = 8  # 한 번에 추론할 최대 얼굴 수
 
 # 경로 생성 시 슬래시 사용하는 함수
 def create_path(*args):
     return '/'.join(args)
 
+# 출퇴근 기록 목록 페이지 크기 (/api/attendance?limit=)
+ATTENDANCE_PAGE_SIZE = 100  # limit 생략 시 기본값 (cursor를 쓰는 경우)
+ATTENDANCE_MAX_PAGE_SIZE = 1000  # 한 페이지 최대 기록 수
+ATTENDANCE_EXPORT_CHUNK_SIZE = 5000  # 내보내기(/api/attendance/export) 시 한 번에 읽어 전송하는 기록 수
+
 # 출퇴근 태그 시간 설정
 ATTENDANCE_TIMES = {
     "CLOCK_IN": (5, 10),        # 출근: 05:00 ~ 10:00
@@ -0,0 +1,129 @@
+# embedding_batcher.py - 동시에 들어온 얼굴 임베딩 요청을 모아 한 번에 추론하는 배치 처리기
+import queue
+import threading
+import time
+from concurrent.futures import Future
+import numpy as np
+
+from config import FACE_MODEL, EMBEDDING_BATCH_WINDOW_MS, EMBEDDING_BATCH_MAX_SIZE
+from inference_executor import inference_executor
+
+
+class EmbeddingBatcher:
+    """
+    정렬된 얼굴 이미지를 받아 인식 모델(ArcFace 등)에 배치로 넣어 임베딩을 계산
+
+    첫 요청이 도착한 뒤 window_ms 동안(최대 max_batch개까지) 들어온 요청을 모아
+    모델을 한 번만 호출하고, 결과를 각 요청에 나눠준다.
+    다른 추론 작업이 없으면(합류할 요청이 없으면) 기다리지 않고 바로 계산한다.
+    결과를 기다리는 동안은 추론 실행기의 슬롯을 내놓으므로, 실행기 workers 수보다 큰 배치도 모인다.
+    """
+
+    def __init__(self, model_name, window_ms=10, max_batch=8):
+        self.model_name = model_name
+        self.window = window_ms / 1000.0
+        self.max_batch = max_batch
+        self.requests = queue.Queue()
+        self.thread = None
+        self.start_lock = threading.Lock()
+        self.model_lock = threading.Lock()
+        self.model = None
+
+        # 지표
+        self.batches = 0
+        self.items = 0
+        self.max_batch_seen = 0
+
+    def get_model(self):
+        """DeepFace 인식 모델 (최초 1회 생성)"""
+        if self.model is None:
+            with self.model_lock:
+                if self.model is None:
+                    from deepface import DeepFace
+                    self.model = DeepFace.build_model(self.model_name)
+        return self.model
+
+    def preprocess(self, face_rgb):
+        """DeepFace.extract_faces()의 얼굴(RGB, 0~1)을 DeepFace.represent()와 같은 방식으로 모델 입력으로 변환"""
+        from deepface.modules import preprocessing
+
+        target_size = self.get_model().input_shape
+        img = face_rgb[:, :, ::-1]  # RGB -> BGR
+        img = preprocessing.resize_image(img=img, target_size=(target_size[1], target_size[0]))
+        return preprocessing.normalize_input(img=img, normalization="base")
+
+    def _ensure_started(self):
+        if self.thread is None:
+            with self.start_lock:
+                if self.thread is None:
+                    self.thread = threading.Thread(target=self._loop, name="embedding-batcher", daemon=True)
+                    self.thread.start()
+
+    def embed(self, face_rgb):
+        """얼굴 한 개의 임베딩 벡터 반환 (다른 요청과 함께 배치로 계산될 때까지 대기)"""
+        self._ensure_started()
+        future = Future()
+        self.requests.put((self.preprocess(face_rgb), future))
+        with inference_executor.yielded():
+            return future.result()
+
+    def _collect(self):
+        """
+        첫 요청 이후 window 동안 들어온 요청을 최대 max_batch개까지 모음
+        모은 요청 외에 실행 중인 추론 작업이 없으면 기다리지 않음
+        """
+        batch = [self.requests.get()]
+        deadline = time.monotonic() + self.window
+        while len(batch) < self.max_batch:
+            try:
+                batch.append(self.requests.get_nowait())
+                continue
+            except queue.Empty:
+                pass
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or inference_executor.pending() <= len(batch):
+                break
+            try:
+                batch.append(self.requests.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _forward(self, tensors):
+        model = self.get_model()
+        inputs = np.concatenate(tensors, axis=0)
+        keras_model = getattr(model, "model", None)
+        if callable(keras_model):
+            return np.asarray(keras_model(inputs, training=False))
+        # keras 모델이 아닌 경우 한 개씩 계산
+        return np.asarray([model.forward(tensor) for tensor in tensors])
+
+    def _loop(self):
+        while True:
+            batch = self._collect()
+            tensors = [tensor for tensor, _ in batch]
+            try:
+                embeddings = self._forward(tensors)
+                for (_, future), embedding in zip(batch, embeddings):
+                    future.set_result(np.asarray(embedding, dtype=np.float32))
+            except Exception as e:
+                print(f"배치 임베딩 계산 중 오류: {str(e)}")
+                for _, future in batch:
+                    future.set_exception(e)
+
+            self.batches += 1
+            self.items += len(batch)
+            self.max_batch_seen = max(self.max_batch_seen, len(batch))
+
+    def metrics(self):
+        return {
+            "batches": self.batches,
+            "items": self.items,
+            "avg_batch_size": round(self.items / self.batches, 2) if self.batches else None,
+            "max_batch_size": self.max_batch_seen,
+            "pending": self.requests.qsize()
+        }
+
+
+# 프로세스 전역 임베딩 배치 처리기
+embedding_batcher = EmbeddingBatcher(FACE_MODEL, EMBEDDING_BATCH_WINDOW_MS, EMBEDDING_BATCH_MAX_SIZE)
@@ -0,0 +1,269 @@
+# embedding_store.py - 얼굴 벡터 바이너리 저장소 (float32 행렬 + encoding_id 사이드카, mmap)
+import os
+import json
+import threading
+import numpy as np
+
+from config import EMBEDDINGS_PATH, EMBEDDING_IDS_PATH, EMBEDDING_COMPACTION_RATIO
+
+# 삭제된 행을 표시하는 encoding_id 값
+TOMBSTONE = -1
+
+
+class EmbeddingStore:
+    """
+    얼굴 벡터를 float32 원시 행렬 파일로 저장하고 mmap으로 여는 저장소
+
+    - 벡터 파일: 행마다 dim개의 float32 (헤더 없음)
+    - ID 파일: 행마다 int64 encoding_id 하나 (삭제된 행은 TOMBSTONE)
+    - 메타 파일('<벡터 파일>.meta'): dim과 현재 세대(generation) 번호
+    추가는 벡터 파일, ID 파일 순으로 끝에 한 행씩 덧붙이고, 삭제는 ID 파일의 해당 칸만 TOMBSTONE으로 덮어쓴다.
+    추가 도중 중단되면 ID 없는 벡터 한 행만 남을 수 있으므로 open()에서 그 행만 잘라내고,
+    그 밖에 행 수가 맞지 않으면 (ID가 엉뚱한 벡터를 가리키지 않도록) 열지 않고 오류를 낸다.
+    삭제된 행 비율이 EMBEDDING_COMPACTION_RATIO를 넘으면 살아있는 행만 모아 다음 세대 파일
+    ('<파일>.<세대>')에 쓰고, 메타 파일을 한 번에 교체해 새 세대로 넘어간다 (중간에 중단되면 이전 세대 유지).
+
+    메모리에서는 ID 배열과 mmap 이후 추가된 벡터(tail)를 여유 용량을 두고 잡아 두고,
+    tail이 가득 찰 때만 다시 mmap하므로 추가는 평균 O(1).
+    """
+
+    def __init__(self, vectors_path, ids_path):
+        self.vectors_path = vectors_path
+        self.ids_path = ids_path
+        self.meta_path = f"{vectors_path}.meta"
+        self.lock = threading.RLock()
+        self.opened = False
+        self.generation = 0
+        self.vectors_file, self.ids_file = self._files(0)
+
+    def _files(self, generation):
+        """세대의 (벡터 파일, ID 파일) 경로 (0세대는 설정된 경로 그대로)"""
+        if generation == 0:
+            return self.vectors_path, self.ids_path
+        return f"{self.vectors_path}.{generation}", f"{self.ids_path}.{generation}"
+
+    def exists(self):
+        return os.path.exists(self.vectors_file) and os.path.exists(self.ids_file)
+
+    @property
+    def ids(self):
+        """행 번호 순서의 encoding_id 배열 (삭제된 행은 TOMBSTONE)"""
+        return self._ids[:self.count]
+
+    def _read_meta(self):
+        """메타 파일의 (dim, 세대) (없으면 예전 형식으로 보고 0세대 파일 크기에서 dim을 계산해 메타 파일 생성)"""
+        if os.path.exists(self.meta_path):
+            with open(self.meta_path, 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+            return int(meta["dim"]), int(meta.get("generation", 0))
+
+        dim = 0
+        if os.path.exists(self.ids_path) and os.path.exists(self.vectors_path):
+            id_rows = os.path.getsize(self.ids_path) // 8
+            vector_bytes = os.path.getsize(self.vectors_path)
+            if id_rows > 0 and vector_bytes > 0:
+                if vector_bytes % (id_rows * 4) != 0:
+                    raise ValueError(f"임베딩 파일 크기가 ID 파일과 맞지 않고 메타 파일도 없습니다: {vector_bytes} bytes / {id_rows} rows")
+                dim = vector_bytes // (id_rows * 4)
+                self._write_meta(dim, 0)
+        return dim, 0
+
+    def _write_meta(self, dim, generation):
+        tmp_path = self.meta_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({"dim": int(dim), "dtype": "float32", "generation": int(generation)}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.meta_path)
+
+    def _remove_generation(self, generation):
+        for path in self._files(generation):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def open(self):
+        """파일을 mmap으로 열고 encoding_id -> 행 번호 맵 구성 (파일이 없으면 생성)"""
+        with self.lock:
+            self.dim, self.generation = self._read_meta()
+            self.vectors_file, self.ids_file = self._files(self.generation)
+
+            # 끝나지 않은 압축의 다음 세대 파일과, 교체 후 지우지 못한 이전 세대 파일 정리
+            self._remove_generation(self.generation + 1)
+            if self.generation > 0:
+                self._remove_generation(self.generation - 1)
+
+            for path in (self.vectors_file, self.ids_file):
+                if not os.path.exists(path):
+                    if self.generation > 0:
+                        raise FileNotFoundError(f"임베딩 파일이 없습니다: {path} (메타 파일의 세대 {self.generation})")
+                    open(path, 'wb').close()
+
+            id_bytes = os.path.getsize(self.ids_file)
+            vector_bytes = os.path.getsize(self.vectors_file)
+            id_rows = id_bytes // 8
+            vector_rows = vector_bytes // (self.dim * 4) if self.dim > 0 else 0
+
+            # 추가 도중 중단된 경우만 복구: ID가 쓰이지 않은 마지막 벡터 행(과 덜 쓰인 바이트)을 잘라냄
+            if self.dim == 0 and id_rows > 0:
+                raise ValueError(f"임베딩 메타 파일에 dim이 없는데 ID가 {id_rows}개 있습니다.")
+            if not id_rows <= vector_rows <= id_rows + 1:
+                raise ValueError(
+                    f"임베딩 파일 행 수가 맞지 않습니다: 벡터 {vector_rows}행, ID {id_rows}행 "
+                    f"({self.vectors_file}, {self.ids_file}) - 자동으로 고치지 않습니다."
+                )
+            for path, size in ((self.ids_file, id_rows * 8), (self.vectors_file, id_rows * self.dim * 4)):
+                if os.path.getsize(path) != size:
+                    print(f"임베딩 파일 '{path}'의 끝나지 않은 추가를 잘라냅니다: {os.path.getsize(path)} -> {size} bytes")
+                    os.truncate(path, size)
+
+            self._ids = np.fromfile(self.ids_file, dtype=np.int64)
+            self.count = id_rows
+            self.rows = {int(encoding_id): row for row, encoding_id in enumerate(self._ids) if encoding_id != TOMBSTONE}
+            self.tombstones = id_rows - len(self.rows)
+            self._remap()
+            self.opened = True
+
+    def _remap(self):
+        """벡터 파일을 다시 mmap하고 추가용 tail을 비움 (tail이 가득 찼을 때/압축 후 호출)"""
+        rows = self.count
+        if rows == 0 or self.dim == 0:
+            self.vectors = np.zeros((0, self.dim), dtype=np.float32)
+        else:
+            self.vectors = np.memmap(self.vectors_file, dtype=np.float32, mode='r', shape=(rows, self.dim))
+        self.tail = np.zeros((max(64, rows), self.dim), dtype=np.float32)
+
+    def _take(self, rows):
+        """행 번호들의 벡터를 (N, dim) 행렬로 복사 (mmap 부분과 tail 부분을 합침)"""
+        rows = np.asarray(rows, dtype=np.int64)
+        mapped = len(self.vectors)
+        result = np.empty((len(rows), self.dim), dtype=np.float32)
+        in_map = rows < mapped
+        result[in_map] = self.vectors[rows[in_map]]
+        result[~in_map] = self.tail[rows[~in_map] - mapped]
+        return result
+
+    def _ensure_open(self):
+        if not self.opened:
+            self.open()
+
+    def __len__(self):
+        with self.lock:
+            self._ensure_open()
+            return len(self.rows)
+
+    def __contains__(self, encoding_id):
+        with self.lock:
+            self._ensure_open()
+            return int(encoding_id) in self.rows
+
+    def append(self, encoding_id, vector):
+        """벡터 한 개를 파일 끝에 추가 (평균 O(1))"""
+        vector = np.asarray(vector, dtype=np.float32).ravel()
+        with self.lock:
+            self._ensure_open()
+            if self.dim == 0:
+                self.dim = len(vector)
+                self._write_meta(self.dim, self.generation)
+                self._remap()
+            elif len(vector) != self.dim:
+                raise ValueError(f"벡터 차원이 다릅니다: {len(vector)} != {self.dim}")
+            if int(encoding_id) in self.rows:
+                self.delete(encoding_id, compact=False)
+
+            # 벡터를 먼저 기록 (중단되면 open()에서 ID 없는 벡터 행을 잘라냄)
+            with open(self.vectors_file, 'ab') as f:
+                f.write(vector.tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+            with open(self.ids_file, 'ab') as f:
+                f.write(np.int64(encoding_id).tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+
+            row = self.count
+            if row >= len(self._ids):
+                self._ids = np.resize(self._ids, max(64, len(self._ids) * 2))
+            self._ids[row] = encoding_id
+            self.count += 1
+            self.rows[int(encoding_id)] = row
+
+            tail_row = row - len(self.vectors)
+            if tail_row >= len(self.tail):
+                self._remap()
+            else:
+                self.tail[tail_row] = vector
+
+    def delete(self, encoding_id, compact=True):
+        """ID 파일의 해당 행을 TOMBSTONE으로 표시 (없으면 False)"""
+        with self.lock:
+            self._ensure_open()
+            row = self.rows.pop(int(encoding_id), None)
+            if row is None:
+                return False
+
+            with open(self.ids_file, 'r+b') as f:
+                f.seek(row * 8)
+                f.write(np.int64(TOMBSTONE).tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+
+            self._ids[row] = TOMBSTONE
+            self.tombstones += 1
+
+            if compact and self.tombstones > self.count * EMBEDDING_COMPACTION_RATIO:
+                self.compact()
+            return True
+
+    def compact(self):
+        """
+        삭제 표시된 행을 제거해 다음 세대 파일에 쓰고 메타 파일 교체로 세대를 넘김
+        (메타 파일을 바꾸기 전에 중단되면 이전 세대가 그대로 쓰이고, 새 세대 파일은 open()에서 정리)
+        """
+        with self.lock:
+            self._ensure_open()
+            live_rows = np.flatnonzero(self.ids != TOMBSTONE)
+            ids = self.ids[live_rows]
+            vectors = self._take(live_rows)
+
+            # 닫힌 mmap을 참조하지 않도록 먼저 해제
+            self.vectors = np.zeros((0, self.dim), dtype=np.float32)
+
+            generation = self.generation + 1
+            files = self._files(generation)
+            for path, data in zip(files, (vectors, ids)):
+                with open(path, 'wb') as f:
+                    f.write(data.tobytes())
+                    f.flush()
+                    os.fsync(f.fileno())
+            self._write_meta(self.dim, generation)
+            self._remove_generation(self.generation)
+            self.generation = generation
+            self.vectors_file, self.ids_file = files
+
+            print(f"임베딩 저장소 압축: {self.tombstones}개 삭제 행 제거, {len(ids)}개 유지")
+            self._ids = ids
+            self.count = len(ids)
+            self.rows = {int(encoding_id): row for row, encoding_id in enumerate(ids)}
+            self.tombstones = 0
+            self._remap()
+
+    def get(self, encoding_id):
+        """encoding_id의 벡터 복사본 반환 (없으면 None)"""
+        with self.lock:
+            self._ensure_open()
+            row = self.rows.get(int(encoding_id))
+            if row is None:
+                return None
+            return self._take([row])[0]
+
+    def get_many(self, encoding_ids):
+        """여러 encoding_id의 벡터를 (N, dim) 행렬로 반환 (없는 ID는 제외하고 함께 반환)"""
+        with self.lock:
+            self._ensure_open()
+            found_ids = [int(encoding_id) for encoding_id in encoding_ids if int(encoding_id) in self.rows]
+            rows = [self.rows[encoding_id] for encoding_id in found_ids]
+            return found_ids, self._take(rows)
+
+
+# 프로세스 전역 임베딩 저장소
+embedding_store = EmbeddingStore(EMBEDDINGS_PATH, EMBEDDING_IDS_PATH)
@@ -0,0 +1,285 @@
+# face_gallery.py - 등록 얼굴 벡터 검색 엔진
+import threading
+import numpy as np
+
+from ann_index import create_ann_index
+from prototype_index import create_prototype_index
+
+
+def normalize_vectors(vectors):
+    """벡터(또는 행렬)를 float32 단위 벡터로 정규화 (영벡터는 그대로 0)"""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+class FaceGallery:
+    """
+    등록된 얼굴 벡터를 하나의 정규화된 float32 행렬로 보관하고 검색
+
+    행렬은 여유 용량을 두고 늘려서 추가가 O(1)이며, 삭제는 마지막 행과 자리를 바꿔 처리한다.
+    변경이 일어날 때마다 version이 1씩 증가한다.
+    index(AnnIndex)가 주어지면 추가/삭제를 함께 반영하고, top_k 검색 시 근사 후보만 정확히 재채점한다.
+    prototypes(PrototypeIndex)가 주어지면 직원 대표 벡터를 함께 갱신하고,
+    top_k 검색 시 대표 벡터 상위 직원들의 얼굴만 정확히 재채점한다.
+    """
+
+    def __init__(self, records=None, employees=None, index=None, prototypes=None):
+        self.lock = threading.RLock()
+        self.version = 0
+        self.loaded = False
+        self.index = index
+        self.prototypes = prototypes
+        self._reset()
+        if records is not None:
+            self.build(records, employees)
+
+    def __len__(self):
+        return self.size
+
+    def _reset(self, dim=0, capacity=0):
+        self.size = 0
+        self.matrix = np.zeros((capacity, dim), dtype=np.float32)
+        self.encoding_ids = np.zeros(capacity, dtype=np.int64)
+        self.employee_ids = np.zeros(capacity, dtype=np.int64)
+        self.image_paths = [None] * capacity
+        self.rows = {}  # encoding_id -> 행 번호
+        self.employees = {}  # employee_id -> 직원 정보
+
+    def _grow(self, dim):
+        """행렬 용량을 두 배로 확장"""
+        capacity = max(16, len(self.encoding_ids) * 2)
+        matrix = np.zeros((capacity, dim), dtype=np.float32)
+        matrix[:self.size] = self.matrix[:self.size]
+        self.matrix = matrix
+        self.encoding_ids = np.resize(self.encoding_ids, capacity)
+        self.employee_ids = np.resize(self.employee_ids, capacity)
+        self.image_paths.extend([None] * (capacity - len(self.image_paths)))
+
+    def build(self, records, employees=None, vectors=None):
+        """
+        get_all_face_encodings_with_employee_info() 형식의 레코드로 전체 재구성
+
+        vectors: 레코드 순서와 같은 (N, dim) 행렬 (주어지면 레코드의 'encoding' 대신 사용)
+        """
+        with self.lock:
+            if vectors is None:
+                vectors = [np.asarray(record['encoding'], dtype=np.float32).ravel() for record in records]
+                vectors = np.stack(vectors) if vectors else np.zeros((0, 0), dtype=np.float32)
+            dim = vectors.shape[1] if len(vectors) else 0
+            self._reset(dim, len(vectors))
+
+            if len(vectors):
+                self.matrix[:] = normalize_vectors(vectors)
+            for row, record in enumerate(records):
+                self.encoding_ids[row] = int(record['encoding_id'])
+                self.employee_ids[row] = int(record['employee_id'])
+                self.image_paths[row] = record['image_path']
+                self.rows[int(record['encoding_id'])] = row
+                if 'name' in record:
+                    self._set_employee(record)
+            self.size = len(vectors)
+
+            for employee in employees or []:
+                self._set_employee(employee)
+
+            if self.index is not None:
+                self.index.build(self.encoding_ids[:self.size].tolist(), self.matrix[:self.size])
+            if self.prototypes is not None:
+                self.prototypes.build(self.encoding_ids[:self.size], self.employee_ids[:self.size], self.matrix[:self.size])
+
+            self.loaded = True
+            self.version += 1
+
+    def _set_employee(self, info):
+        self.employees[int(info['employee_id'])] = {
+            'name': info.get('name'),
+            'department': info.get('department', ''),
+            'position': info.get('position', ''),
+            'employeeId': info.get('employeeId', '')
+        }
+
+    def set_employee(self, employee_id, name, department="", position="", employeeId=""):
+        """직원 정보 추가/갱신 (아직 적재 전이면 무시하고 적재 시 반영)"""
+        with self.lock:
+            if not self.loaded:
+                return
+            self._set_employee({
+                'employee_id': employee_id,
+                'name': name,
+                'department': department,
+                'position': position,
+                'employeeId': employeeId
+            })
+            self.version += 1
+
+    def add(self, encoding_id, employee_id, image_path, vector):
+        """얼굴 벡터 한 개 추가 (아직 적재 전이면 무시하고 적재 시 반영)"""
+        vector = normalize_vectors(np.asarray(vector, dtype=np.float32).ravel())
+        with self.lock:
+            if not self.loaded:
+                return
+            if self.matrix.shape[1] != len(vector):
+                if self.size > 0:
+                    raise ValueError(f"벡터 차원이 다릅니다: {len(vector)} != {self.matrix.shape[1]}")
+                employees = self.employees
+                self._reset(len(vector))
+                self.employees = employees
+            if int(encoding_id) in self.rows:
+                self._remove(int(encoding_id))
+            if self.size == len(self.encoding_ids):
+                self._grow(len(vector))
+
+            row = self.size
+            self.matrix[row] = vector
+            self.encoding_ids[row] = int(encoding_id)
+            self.employee_ids[row] = int(employee_id)
+            self.image_paths[row] = image_path
+            self.rows[int(encoding_id)] = row
+            self.size += 1
+            if self.index is not None:
+                self.index.add(encoding_id, vector)
+            if self.prototypes is not None:
+                self.prototypes.add(encoding_id, employee_id, vector)
+            self.version += 1
+
+    def _remove(self, encoding_id):
+        row = self.rows.pop(encoding_id)
+        if self.prototypes is not None:
+            self.prototypes.remove(encoding_id, self.employee_ids[row], self.matrix[row])
+        last = self.size - 1
+        if row != last:
+            self.matrix[row] = self.matrix[last]
+            self.encoding_ids[row] = self.encoding_ids[last]
+            self.employee_ids[row] = self.employee_ids[last]
+            self.image_paths[row] = self.image_paths[last]
+            self.rows[int(self.encoding_ids[row])] = row
+        self.image_paths[last] = None
+        self.size -= 1
+
+    def remove(self, encoding_id):
+        """얼굴 벡터 한 개 삭제 (없으면 False)"""
+        with self.lock:
+            if int(encoding_id) not in self.rows:
+                return False
+            self._remove(int(encoding_id))
+            if self.index is not None:
+                self.index.remove(encoding_id)
+            self.version += 1
+            return True
+
+    def employee_vectors(self, employee_id):
+        """직원의 (encoding_id 배열, 정규화된 벡터 행렬) 복사본"""
+        with self.lock:
+            rows = np.flatnonzero(self.employee_ids[:self.size] == int(employee_id))
+            return self.encoding_ids[rows].copy(), self.matrix[rows].copy()
+
+    def get_image_path(self, encoding_id):
+        """encoding_id의 이미지 경로 (없으면 None)"""
+        with self.lock:
+            row = self.rows.get(int(encoding_id))
+            return self.image_paths[row] if row is not None else None
+
+    def _record(self, row):
+        employee_id = int(self.employee_ids[row])
+        employee = self.employees.get(employee_id, {})
+        return {
+            'encoding_id': int(self.encoding_ids[row]),
+            'employee_id': employee_id,
+            'name': employee.get('name'),
+            'department': employee.get('department', ''),
+            'position': employee.get('position', ''),
+            'employeeId': employee.get('employeeId', ''),
+            'image_path': self.image_paths[row]
+        }
+
+    def scores(self, probe):
+        """프로브 벡터와 모든 등록 벡터 간의 코사인 유사도 (행렬-벡터 곱 한 번)"""
+        with self.lock:
+            if self.size == 0:
+                return np.zeros(0, dtype=np.float32)
+
+            probe = normalize_vectors(np.asarray(probe, dtype=np.float32).ravel())
+            return np.clip(self.matrix[:self.size] @ probe, -1.0, 1.0)
+
+    def _exclude_rows(self, candidates, exclude):
+        """후보 행 번호에서 exclude(encoding_id 집합)에 해당하는 행 제거"""
+        if not exclude:
+            return candidates
+        excluded = np.asarray([self.rows[encoding_id] for encoding_id in exclude if encoding_id in self.rows], dtype=np.int64)
+        return candidates[~np.isin(candidates, excluded)]
+
+    def search(self, probe, top_k=None, min_score=None, exclude=None):
+        """
+        유사도 상위 결과를 (레코드, 유사도) 리스트로 내림차순 반환
+
+        top_k: 최대 반환 개수 (argpartition으로 부분 정렬)
+        min_score: 이 값 미만의 유사도는 제외
+        exclude: 제외할 encoding_id 집합 (top_k를 자르기 전에 제외)
+        """
+        with self.lock:
+            if top_k is not None and self.index is not None and self.index.usable(self.size):
+                return self._search_index(probe, top_k, min_score, exclude)
+            if top_k is not None and self.prototypes is not None and self.prototypes.usable(self.size):
+                return self._search_prototypes(probe, top_k, min_score, exclude)
+
+            scores = self.scores(probe)
+
+            if min_score is not None:
+                candidates = np.flatnonzero(scores >= min_score)
+            else:
+                candidates = np.arange(len(scores))
+            candidates = self._exclude_rows(candidates, exclude)
+
+            if top_k is not None and 0 < top_k < len(candidates):
+                partitioned = np.argpartition(-scores[candidates], top_k - 1)[:top_k]
+                candidates = candidates[partitioned]
+
+            ordered = candidates[np.argsort(-scores[candidates], kind='stable')]
+            return [(self._record(i), float(scores[i])) for i in ordered]
+
+    def _search_index(self, probe, top_k, min_score=None, exclude=None):
+        """근사 인덱스로 top_k 후보를 찾고 행렬에서 정확한 유사도로 다시 계산 (제외할 얼굴 수만큼 더 찾음)"""
+        probe = normalize_vectors(np.asarray(probe, dtype=np.float32).ravel())
+        exclude = exclude or set()
+        candidates = np.asarray(
+            [self.rows[encoding_id] for encoding_id in self.index.query(probe, top_k + len(exclude))
+             if encoding_id in self.rows and encoding_id not in exclude][:top_k],
+            dtype=np.int64
+        )
+        scores = np.clip(self.matrix[candidates] @ probe, -1.0, 1.0)
+
+        if min_score is not None:
+            keep = scores >= min_score
+            candidates, scores = candidates[keep], scores[keep]
+
+        order = np.argsort(-scores, kind='stable')
+        return [(self._record(candidates[i]), float(scores[i])) for i in order]
+
+    def _search_prototypes(self, probe, top_k, min_score=None, exclude=None):
+        """대표 벡터 상위 직원들의 얼굴만 정확한 유사도로 계산해 top_k 반환"""
+        probe = normalize_vectors(np.asarray(probe, dtype=np.float32).ravel())
+        exclude = exclude or set()
+        candidates = np.asarray(
+            [self.rows[encoding_id] for encoding_id in self.prototypes.candidates(probe)
+             if encoding_id in self.rows and encoding_id not in exclude],
+            dtype=np.int64
+        )
+        scores = np.clip(self.matrix[candidates] @ probe, -1.0, 1.0)
+
+        if min_score is not None:
+            keep = scores >= min_score
+            candidates, scores = candidates[keep], scores[keep]
+
+        if 0 < top_k < len(candidates):
+            partitioned = np.argpartition(-scores, top_k - 1)[:top_k]
+            candidates, scores = candidates[partitioned], scores[partitioned]
+
+        order = np.argsort(-scores, kind='stable')
+        return [(self._record(candidates[i]), float(scores[i])) for i in order]
+
+
+# 프로세스 전역 갤러리 캐시 (utils.get_face_gallery()로 최초 1회 적재)
+# GALLERY_SEARCH_MODE가 "hnsw"이면 근사 인덱스를, "prototype"이면 직원 대표 벡터 인덱스를 함께 유지
+gallery_cache = FaceGallery(index=create_ann_index(), prototypes=create_prototype_index())
@@ -0,0 +1,79 @@
+# face_mesh_pool.py - 스레드별로 재사용하는 MediaPipe FaceMesh 인스턴스 풀
+import threading
+import mediapipe as mp
+
+
+class FaceMeshPool:
+    """
+    워커 스레드마다 FaceMesh 인스턴스를 하나씩 만들어 계속 재사용
+
+    FaceMesh는 스레드 간에 공유하면 안 되므로 스레드별로 따로 두고,
+    종료된 스레드의 인스턴스는 새 인스턴스를 만들 때 정리(close)한다.
+    """
+
+    def __init__(self, **options):
+        self.options = options
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.instances = {}  # thread ident -> (thread, FaceMesh)
+
+        # 지표
+        self.created = 0
+        self.closed = 0
+        self.uses = 0
+
+    def _prune_dead_threads(self):
+        """종료된 스레드가 쓰던 인스턴스 정리 (lock을 잡은 상태에서 호출)"""
+        for ident, (thread, face_mesh) in list(self.instances.items()):
+            if not thread.is_alive():
+                face_mesh.close()
+                del self.instances[ident]
+                self.closed += 1
+
+    def get(self):
+        """현재 스레드의 FaceMesh 인스턴스 (없으면 생성)"""
+        face_mesh = getattr(self.local, 'face_mesh', None)
+        if face_mesh is None:
+            face_mesh = mp.solutions.face_mesh.FaceMesh(**self.options)
+            self.local.face_mesh = face_mesh
+            with self.lock:
+                self._prune_dead_threads()
+                self.instances[threading.get_ident()] = (threading.current_thread(), face_mesh)
+                self.created += 1
+            print(f"MediaPipe Face Mesh 인스턴스 생성 ({threading.current_thread().name})")
+        return face_mesh
+
+    def process(self, image):
+        """현재 스레드의 인스턴스로 얼굴 메시 감지"""
+        face_mesh = self.get()
+        with self.lock:
+            self.uses += 1
+        return face_mesh.process(image)
+
+    def close_all(self):
+        """모든 인스턴스 정리 (서버 종료 시)"""
+        with self.lock:
+            for _, face_mesh in self.instances.values():
+                face_mesh.close()
+                self.closed += 1
+            self.instances.clear()
+            self.local = threading.local()
+
+    def metrics(self):
+        with self.lock:
+            return {
+                "instances": len(self.instances),
+                "created": self.created,
+                "closed": self.closed,
+                "uses": self.uses
+            }
+
+
+# 얼굴 특징 검증용 FaceMesh 풀 (validate_facial_features_with_mediapipe에서 사용)
+face_mesh_pool = FaceMeshPool(
+    static_image_mode=True,
+    max_num_faces=1,
+    refine_landmarks=True,
+    min_detection_confidence=0.5,
+    min_tracking_confidence=0.5
+)
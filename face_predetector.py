@@ -0,0 +1,142 @@
+# face_predetector.py - MTCNN 앞단의 빠른 얼굴 후보 검출 (OpenCV Haar cascade)
+import threading
+import time
+from collections import OrderedDict
+import cv2
+
+from config import (
+    PREDETECT_WIDTH, PREDETECT_SCALE_FACTOR, PREDETECT_MIN_NEIGHBORS, PREDETECT_MIN_FACE_RATIO,
+    PREDETECT_ROI_MARGIN, PREDETECT_FULL_DETECT_EVERY, FACE_TRACKER_SESSION_TTL, FACE_TRACKER_MAX_SESSIONS
+)
+
+
+class FacePreDetector:
+    """
+    축소한 흑백 프레임에서 Haar cascade로 얼굴 후보를 빠르게 찾아 MTCNN을 돌릴 영역(ROI)을 제안
+
+    - 후보가 없으면 None (빈 프레임은 MTCNN을 실행하지 않음)
+    - 후보가 있으면 여백을 더한 후보들을 모두 감싸는 원본 좌표 영역 (x1, y1, x2, y2)
+    Haar가 놓치는 얼굴(어두운 조명, 기울어진 얼굴 등)에 대비해 같은 세션에서 연속으로
+    full_detect_every번 거절하면 한 번은 전체 프레임을 MTCNN에 넘긴다 (세션 ID 없는 요청끼리는 한 카운터를 공유).
+    CascadeClassifier는 스레드마다 따로 만든다.
+    기본값은 config의 PREDETECT_* 설정을 따른다.
+    """
+
+    def __init__(self, width=PREDETECT_WIDTH, scale_factor=PREDETECT_SCALE_FACTOR, min_neighbors=PREDETECT_MIN_NEIGHBORS,
+                 min_face_ratio=PREDETECT_MIN_FACE_RATIO, roi_margin=PREDETECT_ROI_MARGIN,
+                 full_detect_every=PREDETECT_FULL_DETECT_EVERY, ttl=FACE_TRACKER_SESSION_TTL,
+                 max_sessions=FACE_TRACKER_MAX_SESSIONS):
+        self.width = width
+        self.scale_factor = scale_factor
+        self.min_neighbors = min_neighbors
+        self.min_face_ratio = min_face_ratio
+        self.roi_margin = roi_margin
+        self.full_detect_every = full_detect_every
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        self.sessions = OrderedDict()  # session_id -> [연속 거절 수, 마지막 사용 시각]
+
+        # 지표
+        self.rejected = 0
+        self.proposed = 0
+        self.fallbacks = 0
+
+    def _get_cascade(self):
+        cascade = getattr(self.local, 'cascade', None)
+        if cascade is None:
+            cascade = cv2.CascadeClassifier(cv2.data.haarcascades + "haarcascade_frontalface_default.xml")
+            if cascade.empty():
+                raise RuntimeError("Haar cascade 파일을 불러올 수 없습니다.")
+            self.local.cascade = cascade
+        return cascade
+
+    def _session(self, session_id):
+        """세션의 [연속 거절 수, 마지막 사용 시각] (lock을 잡은 상태에서 호출, 오래된 세션은 정리)"""
+        now = time.monotonic()
+        state = self.sessions.get(session_id)
+        if state is None:
+            state = self.sessions[session_id] = [0, now]
+        self.sessions.move_to_end(session_id)
+        state[1] = now
+
+        while self.sessions:
+            oldest_id, (_, last_used) = next(iter(self.sessions.items()))
+            if len(self.sessions) <= self.max_sessions and now - last_used <= self.ttl:
+                break
+            del self.sessions[oldest_id]
+        return state
+
+    def propose(self, img, session_id=None):
+        """얼굴 후보 영역 (x1, y1, x2, y2) 반환 (후보가 없으면 None, 이 세션의 전체 프레임 감지 차례면 전체 영역)"""
+        frame_h, frame_w = img.shape[:2]
+        scale = min(1.0, self.width / frame_w)
+        small = cv2.resize(img, (int(frame_w * scale), int(frame_h * scale)), interpolation=cv2.INTER_AREA) if scale < 1.0 else img
+        gray = cv2.equalizeHist(cv2.cvtColor(small, cv2.COLOR_BGR2GRAY))
+
+        # 프레임 대비 너무 작은 얼굴은 어차피 키오스크에서 쓰지 않으므로 최소 크기로 제외
+        min_side = max(12, int(min(gray.shape[:2]) * self.min_face_ratio ** 0.5))
+        boxes = self._get_cascade().detectMultiScale(
+            gray,
+            scaleFactor=self.scale_factor,
+            minNeighbors=self.min_neighbors,
+            minSize=(min_side, min_side)
+        )
+
+        with self.lock:
+            state = self._session(session_id)
+            if len(boxes) == 0:
+                state[0] += 1
+                if self.full_detect_every and state[0] >= self.full_detect_every:
+                    state[0] = 0
+                    self.fallbacks += 1
+                    return (0, 0, frame_w, frame_h)
+                self.rejected += 1
+                return None
+            state[0] = 0
+            self.proposed += 1
+
+        # 여백을 더한 후보들을 모두 감싸는 영역을 원본 좌표로 변환 (MTCNN은 한 번만 실행)
+        x1 = y1 = float('inf')
+        x2 = y2 = 0
+        for (x, y, w, h) in boxes:
+            margin_x, margin_y = w * self.roi_margin, h * self.roi_margin
+            x1, y1 = min(x1, x - margin_x), min(y1, y - margin_y)
+            x2, y2 = max(x2, x + w + margin_x), max(y2, y + h + margin_y)
+
+        return (
+            max(0, int(x1 / scale)),
+            max(0, int(y1 / scale)),
+            min(frame_w, int(x2 / scale)),
+            min(frame_h, int(y2 / scale))
+        )
+
+    def metrics(self):
+        with self.lock:
+            total = self.rejected + self.proposed + self.fallbacks
+            return {
+                "rejected": self.rejected,
+                "proposed": self.proposed,
+                "full_frame_fallbacks": self.fallbacks,
+                "rejected_ratio": round(self.rejected / total, 3) if total else None
+            }
+
+
+def offset_faces(faces, dx, dy):
+    """ROI에서 감지한 결과의 좌표(facial_area, 눈 위치)를 원본 프레임 좌표로 이동"""
+    if dx == 0 and dy == 0:
+        return faces
+    for face in faces:
+        facial_area = face.get("facial_area", {})
+        if "x" in facial_area:
+            facial_area["x"] += dx
+            facial_area["y"] += dy
+        for eye in ("left_eye", "right_eye"):
+            if facial_area.get(eye) is not None:
+                facial_area[eye] = (facial_area[eye][0] + dx, facial_area[eye][1] + dy)
+    return faces
+
+
+# 프로세스 전역 얼굴 후보 검출기 (설정은 config의 PREDETECT_* 값)
+face_predetector = FacePreDetector()
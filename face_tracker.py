@@ -0,0 +1,157 @@
+# face_tracker.py - 키오스크 세션별 얼굴 추적 (연속 프레임에서 얼굴 감지 생략)
+import time
+import threading
+from collections import OrderedDict
+import cv2
+
+from config import (
+    FACE_TRACKER_REDETECT_EVERY, FACE_TRACKER_MIN_SCORE, FACE_TRACKER_SEARCH_MARGIN,
+    FACE_TRACKER_SESSION_TTL, FACE_TRACKER_MAX_SESSIONS
+)
+
+
+class FaceTracker:
+    """
+    마지막으로 검증된 얼굴 영역을 템플릿으로 저장해 두고, 다음 프레임에서는
+    그 주변만 템플릿 매칭으로 찾아 MTCNN 감지와 MediaPipe 검증을 건너뜀
+
+    매칭 점수가 min_score 미만이거나(추적 실패) redetect_every 프레임마다 전체 감지를 다시 실행한다.
+    """
+
+    def __init__(self, redetect_every=10, min_score=0.7, search_margin=0.5):
+        self.redetect_every = redetect_every
+        self.min_score = min_score
+        self.search_margin = search_margin
+        self.lock = threading.Lock()
+        self.last_used = time.monotonic()
+        self.reset()
+
+    def reset(self):
+        self.box = None  # (x, y, w, h)
+        self.template = None  # 감지 당시 얼굴 영역 (흑백)
+        self.detection = None  # 감지 당시 응답 (face_detection_response 형식)
+        self.frames_since_detect = 0
+
+    def start(self, gray, detection):
+        """전체 감지로 확인된 얼굴로 추적 시작"""
+        area = detection["face_area"]
+        x, y, w, h = int(area["x"]), int(area["y"]), int(area["width"]), int(area["height"])
+        with self.lock:
+            template = gray[max(0, y):y + h, max(0, x):x + w]
+            if template.size == 0:
+                self.reset()
+                return
+            self.box = (max(0, x), max(0, y), template.shape[1], template.shape[0])
+            self.template = template.copy()
+            self.detection = detection
+            self.frames_since_detect = 0
+
+    def track(self, gray):
+        """
+        이전 얼굴 위치 주변에서 얼굴을 찾아 감지 응답 형식으로 반환
+        (추적 중이 아니거나, 재감지할 차례이거나, 놓친 경우 None)
+        """
+        with self.lock:
+            self.last_used = time.monotonic()
+            if self.box is None or self.frames_since_detect >= self.redetect_every:
+                return None
+
+            x, y, w, h = self.box
+            frame_h, frame_w = gray.shape[:2]
+            margin_x, margin_y = int(w * self.search_margin), int(h * self.search_margin)
+            x1, y1 = max(0, x - margin_x), max(0, y - margin_y)
+            x2, y2 = min(frame_w, x + w + margin_x), min(frame_h, y + h + margin_y)
+
+            window = gray[y1:y2, x1:x2]
+            if window.shape[0] < h or window.shape[1] < w:
+                self.reset()
+                return None
+
+            scores = cv2.matchTemplate(window, self.template, cv2.TM_CCOEFF_NORMED)
+            _, score, _, (match_x, match_y) = cv2.minMaxLoc(scores)
+            if score < self.min_score:
+                self.reset()
+                return None
+
+            self.box = (x1 + match_x, y1 + match_y, w, h)
+            self.frames_since_detect += 1
+
+            result = dict(self.detection)
+            result["face_area"] = {"x": self.box[0], "y": self.box[1], "width": w, "height": h}
+            if "landmarks" in self.detection:
+                # 감지 당시 눈 위치를 얼굴이 움직인 만큼 이동
+                dx = self.box[0] - self.detection["face_area"]["x"]
+                dy = self.box[1] - self.detection["face_area"]["y"]
+                result["landmarks"] = {
+                    eye: [point[0] + dx, point[1] + dy] for eye, point in self.detection["landmarks"].items()
+                }
+            result["face_ratio"] = (w * h) / (frame_w * frame_h)
+            result["tracked"] = True
+            result["track_score"] = float(score)
+            return result
+
+
+class FaceTrackerRegistry:
+    """키오스크 세션 ID별 FaceTracker (오래 쓰지 않은 세션은 정리)"""
+
+    def __init__(self, ttl=60.0, max_sessions=256, **tracker_options):
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self.tracker_options = tracker_options
+        self.lock = threading.Lock()
+        self.trackers = OrderedDict()  # session_id -> FaceTracker
+
+        # 지표
+        self.tracked_frames = 0
+        self.detected_frames = 0
+
+    def get(self, session_id):
+        """세션의 추적기 (없으면 생성)"""
+        with self.lock:
+            now = time.monotonic()
+            tracker = self.trackers.get(session_id)
+            if tracker is None:
+                tracker = FaceTracker(**self.tracker_options)
+                self.trackers[session_id] = tracker
+            self.trackers.move_to_end(session_id)
+            tracker.last_used = now
+
+            # 오래된 세션부터 정리
+            while self.trackers:
+                oldest_id, oldest = next(iter(self.trackers.items()))
+                if len(self.trackers) <= self.max_sessions and now - oldest.last_used <= self.ttl:
+                    break
+                del self.trackers[oldest_id]
+            return tracker
+
+    def discard(self, session_id):
+        with self.lock:
+            self.trackers.pop(session_id, None)
+
+    def record(self, tracked):
+        """프레임 처리 방식 집계 (추적 / 전체 감지)"""
+        with self.lock:
+            if tracked:
+                self.tracked_frames += 1
+            else:
+                self.detected_frames += 1
+
+    def metrics(self):
+        with self.lock:
+            total = self.tracked_frames + self.detected_frames
+            return {
+                "sessions": len(self.trackers),
+                "tracked_frames": self.tracked_frames,
+                "detected_frames": self.detected_frames,
+                "tracked_ratio": round(self.tracked_frames / total, 3) if total else None
+            }
+
+
+# 프로세스 전역 세션별 얼굴 추적기
+face_trackers = FaceTrackerRegistry(
+    ttl=FACE_TRACKER_SESSION_TTL,
+    max_sessions=FACE_TRACKER_MAX_SESSIONS,
+    redetect_every=FACE_TRACKER_REDETECT_EVERY,
+    min_score=FACE_TRACKER_MIN_SCORE,
+    search_margin=FACE_TRACKER_SEARCH_MARGIN
+)
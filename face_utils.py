@@ -7,11 +7,10 @@ import base64
 from datetime import datetime
 from fastapi import HTTPException
 import mediapipe as mp
-from typing import Dict, Any, List
-import gc
+from typing import Dict, Any, List, Union
 
 # 자체 모듈 임포트
-from config import DATA_DIR, FACE_MODEL, DETECTOR_BACKEND, create_path
+from config import DATA_DIR, FACE_MODEL, DETECTOR_BACKEND, COMPARE_TOP_K, COMPARE_ACCEPT_FACE_HINT, PREDETECT_ENABLED, create_path
 from utils import (
     sanitize_filename, 
     get_or_create_employee, 
@@ -19,8 +18,18 @@ from utils import (
     get_employee_info, 
     get_all_face_encodings_with_employee_info, 
     delete_face_encoding, 
-    record_attendance
+    record_attendance,
+    get_face_gallery
 )
+from embedding_batcher import embedding_batcher
+from face_mesh_pool import face_mesh_pool
+from thumbnails import thumbnail_cache
+from face_tracker import face_trackers
+from face_predetector import face_predetector, offset_faces
+from stage_timings import StageTimer, detection_timings
+from probe_cache import probe_cache
+from image_writer import image_writer
+from gallery_curation import gallery_curator
 
 # DeepFace 로드
 try:
@@ -29,26 +38,48 @@ except Exception as e:
     print(f"DeepFace 로딩 실패: {e}")
     exit(1)
 
-def process_face_image(name, image_data, metadata=None):
-    """얼굴 이미지 처리 및 특징 벡터 추출"""
+def new_face_image_path(name):
+    """새 얼굴 이미지 저장 경로 (이름_타임스탬프.jpg)"""
     # 이미지 저장 경로 지정 - 슬래시 사용
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S.%f")[:-3]
     safe_name = sanitize_filename(name)  # 한글 이름 문제 해결
     image_filename = f"{safe_name}_{timestamp}.jpg"
-    image_path = create_path(DATA_DIR, image_filename)  # 슬래시 경로 사용
+    return create_path(DATA_DIR, image_filename)  # 슬래시 경로 사용
+
+def duplicate_face_response(name, employee_id, duplicate):
+    """기존 얼굴과 거의 같아 저장하지 않은 경우의 응답"""
+    encoding_id, similarity = duplicate
+    return {
+        "success": True,
+        "skipped": True,
+        "message": f"{name}의 기존 얼굴과 거의 같은 사진이라 추가하지 않았습니다.",
+        "employee_id": employee_id,
+        "name": name,
+        "duplicate_of": encoding_id,
+        "similarity": similarity
+    }
+
+def face_thumbnail(encoding_id, image_path):
+    """등록 얼굴 썸네일 Base64 (원본을 아직 백그라운드로 저장 중이면 메모리의 이미지로 생성, 없으면 None)"""
+    img_base64 = thumbnail_cache.get_base64(encoding_id, image_path)
+    if img_base64 is None:
+        img = image_writer.pending_image(encoding_id)
+        if img is not None:
+            img_base64 = thumbnail_cache.create(encoding_id, img)
+    return img_base64
+
+def has_face_image(encoding_id, image_path):
+    """원본 이미지 파일이 있거나 백그라운드로 저장 중인지"""
+    return os.path.exists(image_path) or image_writer.pending_image(encoding_id) is not None
+
+def process_face_image(name, image_data, metadata=None):
+    """얼굴 이미지 처리 및 특징 벡터 추출"""
+    image_path = new_face_image_path(name)
     
-    # Base64 이미지 데이터 디코딩
+    # 이미지 데이터 디코딩 (Base64 문자열 또는 바이너리)
     try:
-        # Base64 접두사 제거 (있는 경우)
-        if "base64," in image_data:
-            image_data = image_data.split("base64,")[1]
-            
-        image_bytes = base64.b64decode(image_data)
-        nparr = np.frombuffer(image_bytes, np.uint8)
-        img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-        
-        if img is None:
-            raise HTTPException(status_code=400, detail="이미지 데이터를 디코딩할 수 없습니다.")
+        image_bytes = image_data_to_bytes(image_data)
+        img = decode_image(image_bytes)
     except Exception as e:
         print(f"이미지 디코딩 중 오류: {str(e)}")
         raise HTTPException(status_code=400, detail=f"이미지 디코딩 중 오류: {str(e)}")
@@ -106,11 +137,23 @@ def process_face_image(name, image_data, metadata=None):
         if employee_id is None:
             raise HTTPException(status_code=500, detail="직원 정보 처리에 실패했습니다.")
         
+        # 같은 직원의 거의 같은 얼굴이 이미 있으면 저장하지 않음
+        duplicate = gallery_curator.find_duplicate(get_face_gallery(), employee_id, embedding_vector)
+        if duplicate is not None:
+            os.remove(image_path)
+            return duplicate_face_response(name, employee_id, duplicate)
+        
         # 2단계: 얼굴 벡터 저장
         encoding_id = save_face_encoding(employee_id, image_path, np.array(embedding_vector))
         if encoding_id is None:
             raise HTTPException(status_code=500, detail="얼굴 벡터를 저장하지 못했습니다.")
         
+        # 비교 결과/관리 화면용 썸네일을 저장 시점에 한 번만 생성
+        thumbnail_cache.create(encoding_id, img)
+        
+        # 직원별 얼굴 수 한도를 넘으면 다양한 얼굴만 남기고 정리 (방금 등록한 얼굴은 유지)
+        pruned = gallery_curator.enforce(employee_id, protect_ids=[encoding_id])
+        
         # 이미지를 Base64로 인코딩하여 응답
         _, buffer = cv2.imencode('.jpg', img)
         img_base64 = base64.b64encode(buffer).decode('utf-8')
@@ -128,7 +171,8 @@ def process_face_image(name, image_data, metadata=None):
             "employeeId": employee_info.get('employeeId', ''),
             "image_path": image_path,
             "vector_length": len(embedding_vector),
-            "image_base64": img_base64
+            "image_base64": img_base64,
+            "pruned_encoding_ids": pruned
         }
         
     except HTTPException:
@@ -145,19 +189,121 @@ def process_face_image(name, image_data, metadata=None):
             
         raise HTTPException(status_code=500, detail=f"특징 벡터 추출 중 오류: {str(e)}")
 
+def register_probe_face(name, embedding_vector, img, metadata=None):
+    """
+    비교 단계에서 이미 계산한 임베딩과 얼굴 이미지로 얼굴 추가 등록 (감지/임베딩 재계산 없음)
+    임베딩/메타데이터는 바로 저장하고 원본 이미지와 썸네일 저장은 백그라운드로 넘김
+    """
+    image_path = new_face_image_path(name)
+    
+    department = metadata.get("department", "") if metadata else ""
+    position = metadata.get("position", "") if metadata else ""
+    employeeId = metadata.get("employeeId", "") if metadata else ""
+    
+    employee_id = get_or_create_employee(name, department, position, employeeId)
+    if employee_id is None:
+        raise HTTPException(status_code=500, detail="직원 정보 처리에 실패했습니다.")
+    
+    duplicate = gallery_curator.find_duplicate(get_face_gallery(), employee_id, embedding_vector)
+    if duplicate is not None:
+        return duplicate_face_response(name, employee_id, duplicate)
+    
+    encoding_id = save_face_encoding(employee_id, image_path, np.array(embedding_vector))
+    if encoding_id is None:
+        raise HTTPException(status_code=500, detail="얼굴 벡터를 저장하지 못했습니다.")
+    
+    image_writer.submit(encoding_id, image_path, img)
+    pruned = gallery_curator.enforce(employee_id, protect_ids=[encoding_id])
+    
+    employee_info = get_employee_info(employee_id=employee_id)
+    return {
+        "success": True,
+        "message": f"{name}의 얼굴 특징 벡터가 성공적으로 저장되었습니다.",
+        "employee_id": employee_id,
+        "encoding_id": encoding_id,
+        "name": name,
+        "department": employee_info.get('department', ''),
+        "position": employee_info.get('position', ''),
+        "employeeId": employee_info.get('employeeId', ''),
+        "image_path": image_path,
+        "vector_length": len(embedding_vector),
+        "reused_probe": True,
+        "pruned_encoding_ids": pruned
+    }
+
+# 모델 사전 적재/워밍업 상태 (/api/ready에서 사용)
+warmup_state = {
+    "ready": False,
+    "started_at": None,
+    "finished_at": None,
+    "duration_ms": None,
+    "error": None
+}
+
+def warm_up_models():
+    """인식 모델과 감지 모델을 미리 만들고 합성 이미지로 한 번씩 추론해 첫 요청의 지연을 없앰"""
+    started = datetime.now()
+    warmup_state.update({"ready": False, "started_at": started.isoformat(), "error": None})
+    print(f"모델 워밍업 시작: {FACE_MODEL} / {DETECTOR_BACKEND}")
+    
+    try:
+        # 1. 모델 가중치 적재
+        embedding_batcher.get_model()
+        DeepFace.build_model(DETECTOR_BACKEND, task="face_detector")
+        
+        # 2. 합성 이미지로 감지 + 임베딩 한 번씩 실행 (그래프 생성/첫 호출 트레이싱)
+        synthetic_img = np.full((480, 640, 3), 127, dtype=np.uint8)
+        cv2.ellipse(synthetic_img, (320, 240), (90, 120), 0, 0, 360, (180, 200, 230), -1)
+        faces = DeepFace.extract_faces(
+            img_path=synthetic_img,
+            detector_backend=DETECTOR_BACKEND,
+            enforce_detection=False,
+            align=True
+        )
+        embedding_batcher.embed(faces[0]["face"])
+        
+        finished = datetime.now()
+        warmup_state.update({
+            "ready": True,
+            "finished_at": finished.isoformat(),
+            "duration_ms": round((finished - started).total_seconds() * 1000, 1)
+        })
+        print(f"모델 워밍업 완료: {warmup_state['duration_ms']} ms")
+    except Exception as e:
+        import traceback
+        print(f"모델 워밍업 중 오류: {str(e)}\n{traceback.format_exc()}")
+        warmup_state.update({"finished_at": datetime.now().isoformat(), "error": str(e)})
+    
+    return warmup_state
+
+def extract_face_embedding(img, enforce_detection=True):
+    """
+    DeepFace.represent()와 같은 결과를 내되, 임베딩 계산은 배치 처리기를 거침
+    (얼굴이 없으면 None, enforce_detection=True이면 DeepFace가 예외 발생)
+    """
+    faces = DeepFace.extract_faces(
+        img_path=img,
+        detector_backend=DETECTOR_BACKEND,
+        enforce_detection=enforce_detection,
+        align=True
+    )
+    
+    if not faces:
+        return None
+    
+    # 첫 번째 얼굴의 임베딩 벡터 추출
+    return embedding_batcher.embed(faces[0]["face"])
+
 def get_all_faces():
-    """저장된 모든 얼굴 데이터 목록 반환"""
+    """저장된 모든 얼굴 데이터 목록 반환 (이미지는 썸네일)"""
     face_encodings = get_all_face_encodings_with_employee_info()
     faces = []
     
     for encoding_data in face_encodings:
         image_path = encoding_data['image_path']
-        if os.path.exists(image_path):
-            img = cv2.imread(image_path)
-            if img is not None:
-                _, buffer = cv2.imencode('.jpg', img)
-                img_base64 = base64.b64encode(buffer).decode('utf-8')
-                
+        if has_face_image(encoding_data['encoding_id'], image_path):
+            img_base64 = face_thumbnail(encoding_data['encoding_id'], image_path)
+            if img_base64 is not None:
                 faces.append({
                     "id": encoding_data['encoding_id'],          
                     "employee_id": encoding_data['employee_id'],
@@ -171,6 +317,13 @@ def get_all_faces():
     
     return faces
 
+def get_face_image_path(face_id):
+    """얼굴 원본 이미지 경로 반환 (없으면 None)"""
+    image_path = get_face_gallery().get_image_path(face_id)
+    if image_path and os.path.exists(image_path):
+        return image_path
+    return None
+
 def delete_face_data(face_id):
     """특정 얼굴 데이터 삭제"""
     result = delete_face_encoding(face_id)  # encoding_id 기반으로 삭제
@@ -214,17 +367,11 @@ def validate_facial_features_with_mediapipe(img, face_region):
     """
     MediaPipe를 사용하여 얼굴의 주요 특징(눈, 코, 입)이 모두 존재하는지 검증
     """
+    mp_face_mesh = mp.solutions.face_mesh
     try:
-        mp_face_mesh = mp.solutions.face_mesh
-        face_mesh = mp_face_mesh.FaceMesh(
-            static_image_mode=True,
-            max_num_faces=1,
-            refine_landmarks=True,
-            min_detection_confidence=0.5,
-            min_tracking_confidence=0.5
-        )
+        # 현재 스레드의 FaceMesh 인스턴스를 재사용 (최초 1회만 생성)
+        face_mesh_pool.get()
         MEDIAPIPE_AVAILABLE = True
-        print("MediaPipe Face Mesh initialized successfully")
     except Exception as e:
         print(f"Warning: MediaPipe not available: {e}. Using basic face detection.")
         MEDIAPIPE_AVAILABLE = False
@@ -243,7 +390,7 @@ def validate_facial_features_with_mediapipe(img, face_region):
             return False
         
         # MediaPipe로 얼굴 메시 감지
-        results = face_mesh.process(face_img)
+        results = face_mesh_pool.process(face_img)
         
         if not results.multi_face_landmarks:
             print("No face landmarks detected by MediaPipe")
@@ -379,97 +526,247 @@ def validate_facial_features_with_mediapipe(img, face_region):
         print(f"Error in MediaPipe facial feature validation: {str(e)}")
         return False
 
-def detect_face(image_data: str) -> Dict[str, Any]:
-    """이미지에서 얼굴 감지 (MediaPipe 기반 완전한 특징 검증 포함)"""
+def image_data_to_bytes(image_data: Union[str, bytes]) -> bytes:
+    """Base64(data URL 포함) 문자열이면 디코딩하고, 바이너리 업로드(bytes)면 그대로 반환"""
+    if isinstance(image_data, (bytes, bytearray, memoryview)):
+        return image_data
+    
+    if "base64," in image_data:
+        image_data = image_data.split("base64,")[1]
+    return base64.b64decode(image_data)
+
+def decode_image(image_data: Union[str, bytes]):
+    """Base64 문자열 또는 JPEG/PNG 바이트를 BGR 이미지로 디코딩 (바이트는 복사 없이 바로 디코딩)"""
+    nparr = np.frombuffer(image_data_to_bytes(image_data), np.uint8)
+    img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+    
+    if img is None:
+        raise HTTPException(status_code=400, detail="이미지 데이터를 디코딩할 수 없습니다.")
+    return img
+
+def find_largest_valid_face(img, faces):
+    """
+    DeepFace.extract_faces() 결과 중 MediaPipe 특징 검증을 통과한 가장 큰 얼굴 반환 (없으면 None)
+    반환값: {"face": 감지 결과, "facial_area", "face_ratio", "confidence"}
+    """
+    valid_faces = []
+    frame_area = img.shape[0] * img.shape[1]  # 전체 프레임 면적
+    
+    for face in faces:
+        if "facial_area" in face:
+            facial_area = face["facial_area"]
+            if all(key in facial_area for key in ['x', 'y', 'w', 'h']):
+                # 얼굴 영역이 너무 작거나 이상한 경우 필터링
+                x, y, w, h = facial_area['x'], facial_area['y'], facial_area['w'], facial_area['h']
+                if w <= 10 or h <= 10 or w > img.shape[1]*0.9 or h > img.shape[0]*0.9:
+                    continue
+                
+                # MediaPipe로 얼굴 특징 검증
+                if not validate_facial_features_with_mediapipe(img, facial_area):
+                    print("Face REJECTED: MediaPipe validation failed - missing complete facial features (eyes, nose, mouth)")
+                    continue
+                
+                # 얼굴 영역 면적과 비율 계산
+                face_area = w * h
+                face_ratio = face_area / frame_area
+                
+                # 신뢰도 점수가 있으면 사용, 없으면 기본값 0 사용
+                confidence = face.get("confidence", 0)
+                
+                valid_faces.append({
+                    "face": face,
+                    "facial_area": facial_area,
+                    "face_ratio": face_ratio,
+                    "confidence": confidence
+                })
+
+                global timestamp_face_detect_end
+                timestamp_face_detect_end = datetime.now()
+                print('Timestamp - Face Detect End:', timestamp_face_detect_end)
+    
+    if not valid_faces:
+        return None
+    
+    # 가장 큰 얼굴 선택
+    return max(valid_faces, key=lambda face: face["face_ratio"])
+
+def face_detection_response(largest_face):
+    """
+    감지된 얼굴의 위치/크기 응답 (detect-face, identify-face 공통)
+    감지기가 눈 위치를 주면 landmarks도 포함 (compare-face에 그대로 보내면 재감지 없이 정렬)
+    """
+    facial_area = largest_face["facial_area"]
+    result = {
+        "success": True,
+        "face_detected": True,
+        "face_area": {
+            "x": facial_area["x"],
+            "y": facial_area["y"],
+            "width": facial_area["w"],
+            "height": facial_area["h"]
+        },
+        "face_ratio": largest_face["face_ratio"],
+        "confidence": largest_face["confidence"]
+    }
+    if facial_area.get("left_eye") is not None and facial_area.get("right_eye") is not None:
+        result["landmarks"] = {
+            "left_eye": list(facial_area["left_eye"]),
+            "right_eye": list(facial_area["right_eye"])
+        }
+    return result
+
+def align_face_crop(img, face_area, landmarks=None):
+    """
+    이전 감지 결과(face_area, 눈 위치)로 감지기 없이 얼굴 정렬
+    DeepFace.extract_faces(align=True)와 같이 두 눈이 수평이 되도록 얼굴 중심 기준으로 회전한 뒤
+    회전된 얼굴 영역을 감싸는 영역을 잘라 RGB(0~1) 얼굴 이미지로 반환 (영역이 잘못되면 None)
+    """
+    x, y = float(face_area["x"]), float(face_area["y"])
+    w, h = float(face_area["width"]), float(face_area["height"])
+    if w <= 10 or h <= 10:
+        return None
+    
+    angle = 0.0
+    if landmarks and landmarks.get("left_eye") is not None and landmarks.get("right_eye") is not None:
+        # DeepFace 규칙: left_eye는 사람 기준 왼쪽 눈 (이미지에서는 오른쪽)
+        left_eye, right_eye = landmarks["left_eye"], landmarks["right_eye"]
+        angle = float(np.degrees(np.arctan2(
+            float(left_eye[1]) - float(right_eye[1]),
+            float(left_eye[0]) - float(right_eye[0])
+        )))
+    
+    if angle != 0.0:
+        # 회전 후 얼굴 영역을 감싸는 크기 (DeepFace project_facial_area와 동일)
+        center = (x + w / 2, y + h / 2)
+        rotation = cv2.getRotationMatrix2D(center, angle, 1.0)
+        img = cv2.warpAffine(img, rotation, (img.shape[1], img.shape[0]), flags=cv2.INTER_CUBIC)
+        radians = np.radians(angle)
+        rotated_w = abs(w * np.cos(radians)) + abs(h * np.sin(radians))
+        rotated_h = abs(w * np.sin(radians)) + abs(h * np.cos(radians))
+        x, y, w, h = center[0] - rotated_w / 2, center[1] - rotated_h / 2, rotated_w, rotated_h
+    
+    x1, y1 = max(0, int(x)), max(0, int(y))
+    x2, y2 = min(img.shape[1], int(x + w)), min(img.shape[0], int(y + h))
+    if x2 - x1 <= 10 or y2 - y1 <= 10:
+        return None
+    
+    return img[y1:y2, x1:x2, ::-1] / 255.0
+
+def crop_face(img, facial_area, margin=0.2):
+    """얼굴 영역에 여백(margin 비율)을 더해 잘라낸 이미지"""
+    x, y, w, h = facial_area['x'], facial_area['y'], facial_area['w'], facial_area['h']
+    x1, y1 = max(0, int(x - w * margin)), max(0, int(y - h * margin))
+    x2, y2 = min(img.shape[1], int(x + w * (1 + margin))), min(img.shape[0], int(y + h * (1 + margin)))
+    return img[y1:y2, x1:x2]
+
+def crop_face_base64(img, facial_area, margin=0.2):
+    """얼굴 영역에 여백(margin 비율)을 더해 잘라낸 JPEG Base64 문자열"""
+    _, buffer = cv2.imencode('.jpg', crop_face(img, facial_area, margin), [cv2.IMWRITE_JPEG_QUALITY, 90])
+    return base64.b64encode(buffer).decode('utf-8')
+
+NO_FACE_MESSAGE = "얼굴이 감지되지 않았습니다."
+INCOMPLETE_FACE_MESSAGE = "완전한 얼굴이 감지되지 않았습니다. 눈, 코, 입이 모두 명확하게 보이도록 얼굴을 정면으로 향하게 해주세요."
+
+def track_session_face(img, session_id):
+    """
+    세션 추적기로 이전 얼굴 위치 주변만 확인
+    반환값: (추적 결과 또는 None, 추적기, 흑백 프레임) - session_id가 없으면 (None, None, None)
+    """
+    if not session_id:
+        return None, None, None
+    
+    tracker = face_trackers.get(session_id)
+    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+    return tracker.track(gray), tracker, gray
+
+def detect_faces_cascade(img, timer, enhance=False, align=False, session_id=None):
+    """
+    빠른 후보 검출(Haar) 후 후보 영역에서만 DETECTOR_BACKEND로 얼굴 감지 (PREDETECT_ENABLED)
+    후보가 없으면 감지기를 실행하지 않고 빈 리스트 반환. 결과 좌표는 원본 프레임 기준.
+    session_id: 후보 검출기가 전체 프레임 감지 차례를 세션별로 세는 데 사용
+    """
+    x1, y1, x2, y2 = 0, 0, img.shape[1], img.shape[0]
+    if PREDETECT_ENABLED:
+        roi = face_predetector.propose(img, session_id)
+        timer.lap("predetect")
+        if roi is None:
+            return []
+        x1, y1, x2, y2 = roi
+    
+    target = np.ascontiguousarray(img[y1:y2, x1:x2])
+    if enhance:
+        # 이미지 향상 적용 (밝기 및 대비 조정)
+        target = cv2.convertScaleAbs(target, alpha=1.5, beta=30)
+    
+    faces = DeepFace.extract_faces(
+        img_path=target,
+        detector_backend=DETECTOR_BACKEND,
+        enforce_detection=False,
+        align=align
+    )
+    timer.lap("detect")
+    
+    # enforce_detection=False일 때 얼굴이 없으면 입력 전체를 얼굴로 돌려주므로 제외
+    faces = [
+        face for face in faces
+        if not (face.get("confidence", 0) == 0 and face["facial_area"].get("x") == 0 and face["facial_area"].get("y") == 0
+                and face["facial_area"].get("w") == target.shape[1] and face["facial_area"].get("h") == target.shape[0])
+    ]
+    return offset_faces(faces, x1, y1)
+
+def detect_face(image_data: Union[str, bytes], session_id: str = None) -> Dict[str, Any]:
+    """
+    이미지에서 얼굴 감지 (MediaPipe 기반 완전한 특징 검증 포함)
+    session_id가 주어지면 이전 프레임의 얼굴을 추적해 감지/검증을 건너뛸 수 있음 (tracked: True)
+    응답의 timings에 단계별 소요 시간(ms)을 포함
+    """
+    timer = StageTimer(detection_timings)
     try:
-        # Base64 이미지 데이터 디코딩
-        if "base64," in image_data:
-            image_data = image_data.split("base64,")[1]
-            
-        image_bytes = base64.b64decode(image_data)
-        nparr = np.frombuffer(image_bytes, np.uint8)
-        img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+        img = decode_image(image_data)
+        timer.lap("decode")
         
-        if img is None:
-            raise HTTPException(status_code=400, detail="이미지 데이터를 디코딩할 수 없습니다.")
+        tracked, tracker, gray = track_session_face(img, session_id)
+        if tracker is not None:
+            timer.lap("track")
+        if tracked is not None:
+            face_trackers.record(tracked=True)
+            tracked["timings"] = timer.finish()
+            return tracked
         
-        # 이미지 향상 적용 (밝기 및 대비 조정)
-        enhanced_img = cv2.convertScaleAbs(img, alpha=1.5, beta=30)
-
-        # DeepFace로 얼굴 감지
-        faces = DeepFace.extract_faces(
-            img_path=enhanced_img,
-            detector_backend=DETECTOR_BACKEND,
-            enforce_detection=False
-        )
+        # 후보 영역에서만 DeepFace로 얼굴 감지 (밝기/대비 향상 적용)
+        faces = detect_faces_cascade(img, timer, enhance=True, session_id=session_id)
+        
+        if tracker is not None:
+            face_trackers.record(tracked=False)
+            tracker.reset()
         
         # 얼굴이 감지되었는지 확인
         if not faces or len(faces) == 0:
             return {
                 "success": True,
                 "face_detected": False,
-                "message": "얼굴이 감지되지 않았습니다."
+                "message": NO_FACE_MESSAGE,
+                "timings": timer.finish()
             }
         
         # 유효한 얼굴 찾기 (MediaPipe로 엄격한 특징 검증)
-        valid_faces = []
-        frame_area = img.shape[0] * img.shape[1]  # 전체 프레임 면적
-        
-        for face in faces:
-            if "facial_area" in face:
-                facial_area = face["facial_area"]
-                if all(key in facial_area for key in ['x', 'y', 'w', 'h']):
-                    # 얼굴 영역이 너무 작거나 이상한 경우 필터링
-                    x, y, w, h = facial_area['x'], facial_area['y'], facial_area['w'], facial_area['h']
-                    if w <= 10 or h <= 10 or w > img.shape[1]*0.9 or h > img.shape[0]*0.9:
-                        continue
-                    
-                    # MediaPipe로 얼굴 특징 검증
-                    if not validate_facial_features_with_mediapipe(img, facial_area):
-                        print("Face REJECTED: MediaPipe validation failed - missing complete facial features (eyes, nose, mouth)")
-                        continue
-                    
-                    # 얼굴 영역 면적과 비율 계산
-                    face_area = w * h
-                    face_ratio = face_area / frame_area
-                    
-                    # 신뢰도 점수가 있으면 사용, 없으면 기본값 0 사용
-                    confidence = face.get("confidence", 0)
-                    
-                    valid_faces.append({
-                        "facial_area": facial_area,
-                        "face_ratio": face_ratio,
-                        "confidence": confidence
-                    })
-
-                    global timestamp_face_detect_end
-                    timestamp_face_detect_end = datetime.now()
-                    print('Timestamp - Face Detect End:', timestamp_face_detect_end)
+        largest_face = find_largest_valid_face(img, faces)
+        timer.lap("validate")
         
         # 유효한 얼굴이 없는 경우
-        if not valid_faces:
+        if largest_face is None:
             return {
                 "success": True,
                 "face_detected": False,
-                "message": "완전한 얼굴이 감지되지 않았습니다. 눈, 코, 입이 모두 명확하게 보이도록 얼굴을 정면으로 향하게 해주세요."
+                "message": INCOMPLETE_FACE_MESSAGE,
+                "timings": timer.finish()
             }
         
-        # 가장 큰 얼굴 선택
-        largest_face = max(valid_faces, key=lambda face: face["face_ratio"])
-        facial_area = largest_face["facial_area"]
-        
-        return {
-            "success": True,
-            "face_detected": True,
-            "face_area": {
-                "x": facial_area["x"],
-                "y": facial_area["y"],
-                "width": facial_area["w"],
-                "height": facial_area["h"]
-            },
-            "face_ratio": largest_face["face_ratio"],
-            "confidence": largest_face["confidence"]
-        }
+        result = face_detection_response(largest_face)
+        if tracker is not None:
+            tracker.start(gray, result)
+        result["timings"] = timer.finish()
+        return result
     
     except Exception as e:
         import traceback
@@ -481,194 +778,301 @@ def detect_face(image_data: str) -> Dict[str, Any]:
             "message": f"얼굴 감지 중 오류: {str(e)}"
         }
 
-def compare_face(image_data: str) -> Dict[str, Any]:
-    """촬영된 얼굴과 등록된 얼굴들 비교"""
+def match_gallery(gallery, embedding_vector, started_at) -> Dict[str, Any]:
+    """
+    임베딩 벡터를 갤러리에서 검색해 유사도 기준(high/medium/low)에 따른 비교 결과 생성
+    (compare-face, identify-face 공통)
+    """
+    # 등록된 얼굴 전체를 하나의 행렬로 두고 한 번에 비교
+    high_threshold = 0.75
+    medium_threshold = 0.6
+    
+    # 썸네일을 만들 수 없는 얼굴(이미지 없음/디코딩 실패)은 top-K를 자르기 전에 제외
+    # (제외할 얼굴이 새로 나오면 그 얼굴들을 빼고 다시 검색해 상위 COMPARE_TOP_K개를 채움)
+    unusable = set()
+    while True:
+        ranked = gallery.search(embedding_vector, top_k=COMPARE_TOP_K, min_score=medium_threshold, exclude=unusable)
+        thumbnails = {}
+        for record, _ in ranked:
+            img_base64 = face_thumbnail(record['encoding_id'], record['image_path'])
+            if img_base64 is None:
+                unusable.add(record['encoding_id'])
+            else:
+                thumbnails[record['encoding_id']] = img_base64
+        if len(thumbnails) == len(ranked):
+            break
+    matches = ranked
+    
+    # 유사도 기준에 따라 결과 처리
+    # 1. 0.75 이상 유사도: 가장 높은 유사도를 가진 얼굴 하나만 반환
+    for record, similarity in matches:
+        if similarity < high_threshold:
+            break
+        
+        img_base64 = thumbnails[record['encoding_id']]
+        
+        best_match = {
+            "id": record['encoding_id'],
+            "employee_id": record['employee_id'],
+            "name": record['name'],
+            "department": record['department'],
+            "position": record['position'],
+            "employeeId": record['employeeId'],
+            "confidence": similarity,
+            "image_path": record['image_path'],
+            "image_base64": img_base64
+        }
+        
+        global timestamp_face_compare_end
+        timestamp_face_compare_end = datetime.now()
+        print('Timestamp - Face Compare End (High):', timestamp_face_compare_end)
+        time_diff = timestamp_face_compare_end - started_at
+        print(f"High match comparison time: {time_diff.total_seconds() * 1000} ms")
+        
+        return {
+            "success": True,
+            "match_type": "high",
+            "best_match": best_match
+        }
+    
+    # 2. 0.6 이상 0.75 미만 유사도: 직원별로 그룹화하여 후보 반환
+    medium_matches = [(record, similarity) for record, similarity in matches if similarity < high_threshold]
+    if medium_matches:
+        # 직원별로 그룹화 (유사도 내림차순이므로 처음 나온 얼굴이 직원별 최고 유사도)
+        employee_groups = {}
+        for record, similarity in medium_matches:
+            employee_id = record["employee_id"]
+            if employee_id not in employee_groups:
+                employee_groups[employee_id] = {
+                    "record": record,
+                    "max_confidence": similarity,
+                    "face_count": 1
+                }
+            else:
+                employee_groups[employee_id]["face_count"] += 1
+        
+        # 유사도 순으로 최대 3명까지만 반환하고 이미지는 반환할 후보의 썸네일만 사용
+        candidates = []
+        for group in list(employee_groups.values())[:3]:
+            record = group["record"]
+            candidates.append({
+                "id": record["encoding_id"],  # 가장 높은 유사도를 가진 얼굴의 ID
+                "employee_id": record["employee_id"],
+                "name": record["name"],
+                "department": record["department"],
+                "position": record["position"],
+                "employeeId": record["employeeId"],
+                "confidence": group["max_confidence"],
+                "image_base64": thumbnails[record["encoding_id"]],
+                # 유사도 상위 COMPARE_TOP_K개 얼굴 중 0.6 ~ 0.75 구간에 든 이 직원의 얼굴 수 (등록 얼굴 전체 수가 아님)
+                "face_count": group["face_count"]
+            })
+        
+        timestamp_face_compare_end = datetime.now()
+        print('Timestamp - Face Compare End (Medium):', timestamp_face_compare_end)
+        time_diff = timestamp_face_compare_end - started_at
+        print(f"Medium match comparison time: {time_diff.total_seconds() * 1000} ms")
+        
+        return {
+            "success": True,
+            "match_type": "medium",
+            "candidates": candidates,
+            "total_candidates": len(candidates)
+        }
+    
+    # 3. 0.6 미만 유사도: 아무것도 반환하지 않음 (인식 실패)
+    timestamp_face_compare_end = datetime.now()
+    print('Timestamp - Face Compare End (Low):', timestamp_face_compare_end)
+    time_diff = timestamp_face_compare_end - started_at
+    print(f"Low match comparison time: {time_diff.total_seconds() * 1000} ms")
+    
+    return {
+        "success": True,
+        "match_type": "low",
+        "message": "등록된 얼굴 중에 일치하는 얼굴을 찾지 못했습니다."
+    }
+
+def compare_face(image_data: Union[str, bytes], face_area: Dict[str, Any] = None,
+                 landmarks: Dict[str, Any] = None) -> Dict[str, Any]:
+    """
+    촬영된 얼굴과 등록된 얼굴들 비교
+    face_area(와 landmarks)가 함께 오면 (직전 detect-face 결과를 이미지 좌표로 옮긴 값)
+    감지기를 다시 돌리지 않고 정렬 후 바로 임베딩 (COMPARE_ACCEPT_FACE_HINT)
+    """
 
     global timestamp_face_compare_start
     timestamp_face_compare_start = datetime.now()
     print('Timestamp - Face Compare Start:', timestamp_face_compare_start)
     time_diff = timestamp_face_compare_start - timestamp_face_detect_end
     print(time_diff.total_seconds() * 1000)
+    timer = StageTimer(detection_timings)
 
     try:
-        # CSV 파일 확인
-        face_encodings = get_all_face_encodings_with_employee_info()
-        if not face_encodings:
+        # 갤러리 캐시 확인
+        gallery = get_face_gallery()
+        if len(gallery) == 0:
             return {"success": False, "message": "등록된 얼굴 데이터가 없습니다."}
         
-        # Base64 이미지 데이터 디코딩
-        if "base64," in image_data:
-            image_data = image_data.split("base64,")[1]
-            
-        image_bytes = base64.b64decode(image_data)
-        nparr = np.frombuffer(image_bytes, np.uint8)
-        img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+        img = decode_image(image_data)
+        timer.lap("decode")
         
-        if img is None:
-            raise HTTPException(status_code=400, detail="이미지 데이터를 디코딩할 수 없습니다.")
+        aligned_face = None
+        if COMPARE_ACCEPT_FACE_HINT and face_area:
+            aligned_face = align_face_crop(img, face_area, landmarks)
+            timer.lap("align")
         
-        # DeepFace로 얼굴 임베딩 추출
-        embedding_obj = DeepFace.represent(
-            img_path=img,
-            model_name=FACE_MODEL,
-            detector_backend=DETECTOR_BACKEND,
-            enforce_detection=True
-        )
+        if aligned_face is not None:
+            # 감지 생략: 정렬된 얼굴로 바로 임베딩
+            embedding_vector = embedding_batcher.embed(aligned_face)
+        else:
+            # 얼굴 감지/정렬 후 다른 요청과 함께 배치로 임베딩 추출
+            embedding_vector = extract_face_embedding(img, enforce_detection=True)
+        timer.lap("embed")
         
-        if not embedding_obj or len(embedding_obj) == 0:
+        if embedding_vector is None:
             return {
                 "success": False,
                 "message": "이미지에서 얼굴을 감지할 수 없습니다."
             }
         
-        # 첫 번째 얼굴의 임베딩 벡터 추출
-        embedding_vector = np.array(embedding_obj[0]["embedding"])
-        
-        # 각 등록된 얼굴과 비교
-        matches = []
+        result = match_gallery(gallery, embedding_vector, timestamp_face_compare_start)
+        timer.lap("search")
+        result["detection_skipped"] = aligned_face is not None
+        if result.get("success"):
+            # 출근 확정 시 얼굴 추가 등록에 재사용 (register_attendance의 probe_token)
+            result["probe_token"] = probe_cache.put(embedding_vector, img)
+        result["timings"] = timer.finish()
+        return result
+    
+    except Exception as e:
+        import traceback
+        traceback_str = traceback.format_exc()
+        print(f"얼굴 비교 중 오류: {str(e)}\n{traceback_str}")
+        return {
+            "success": False,
+            "message": f"얼굴 비교 중 오류: {str(e)}"
+        }
 
-        for encoding_data in face_encodings:
-            try:
-                image_path = encoding_data['image_path']
-                if not os.path.exists(image_path):
-                    continue
-                
-                registered_vector = encoding_data['encoding']
-                similarity = calculate_similarity(embedding_vector, registered_vector)
-                
-                # 이미지 Base64 인코딩
-                registered_img = cv2.imread(image_path)
-                if registered_img is not None:
-                    _, buffer = cv2.imencode('.jpg', registered_img)
-                    img_base64 = base64.b64encode(buffer).decode('utf-8')
-                else:
-                    continue
-                
-                # 일치 정보 추가
-                matches.append({
-                    "id": encoding_data['encoding_id'],
-                    "employee_id": encoding_data['employee_id'],
-                    "name": encoding_data['name'],
-                    "department": encoding_data['department'],
-                    "position": encoding_data['position'],
-                    "employeeId": encoding_data['employeeId'],
-                    "confidence": float(similarity),
-                    "image_path": image_path,
-                    "image_base64": img_base64
-                })
-            except Exception as e:
-                print(f"얼굴 비교 중 오류: {str(e)}")
-                continue
-        
-        # 유사도에 따라 정렬
-        matches = sorted(matches, key=lambda x: x["confidence"], reverse=True)
-        
-        # 유사도 기준에 따라 결과 처리
-        # 1. 0.75 이상 유사도: 가장 높은 유사도를 가진 얼굴 하나만 반환
-        high_threshold = 0.75
-        medium_threshold = 0.6
-        
-        high_matches = [match for match in matches if match["confidence"] >= high_threshold]
-        if high_matches:
-            best_match = high_matches[0]
-            
-            global timestamp_face_compare_end
-            timestamp_face_compare_end = datetime.now()
-            print('Timestamp - Face Compare End (High):', timestamp_face_compare_end)
-            time_diff = timestamp_face_compare_end - timestamp_face_compare_start
-            print(f"High match comparison time: {time_diff.total_seconds() * 1000} ms")
-            
+def parse_min_face_ratio(value) -> float:
+    """min_face_ratio 요청 값을 0 ~ 1 사이 실수로 (없으면 0.0, 잘못된 값이면 ValueError)"""
+    if value is None or value == "":
+        return 0.0
+    try:
+        ratio = float(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"min_face_ratio는 숫자여야 합니다: {value!r}")
+    if not 0.0 <= ratio <= 1.0:
+        raise ValueError(f"min_face_ratio는 0 ~ 1 사이여야 합니다: {value!r}")
+    return ratio
+
+def identify_face(image_data: Union[str, bytes], min_face_ratio: float = 0.0,
+                  include_face_image: bool = False, session_id: str = None) -> Dict[str, Any]:
+    """
+    전체 프레임에서 얼굴 감지 -> 특징 검증 -> 임베딩 -> 갤러리 검색을 한 번에 처리
+
+    이미지 디코딩과 얼굴 감지는 한 번만 한다. 감지는 detect-face와 같이 대비를 높인 이미지에서 하고,
+    임베딩은 detect-face -> compare-face(얼굴 위치 전달)와 같이 원본 이미지에서 정렬한 얼굴로 계산한다.
+    얼굴이 min_face_ratio보다 작으면 감지 결과만 반환한다. (identified: False)
+    include_face_image=True이면 여백을 둔 얼굴 영역을 face_image(Base64)로 함께 반환한다.
+    (클라이언트가 처리된 프레임을 갖고 있지 않은 스트리밍 모드에서 출퇴근 등록 시 사용)
+    session_id가 주어지면 얼굴이 아직 작은 동안에는 추적 결과만 반환하고 감지를 건너뜀
+    """
+    started_at = datetime.now()
+    timer = StageTimer(detection_timings)
+
+    try:
+        gallery = get_face_gallery()
+        if len(gallery) == 0:
+            return {"success": False, "message": "등록된 얼굴 데이터가 없습니다."}
+
+        img = decode_image(image_data)
+        timer.lap("decode")
+
+        # 얼굴이 아직 작으면 추적 결과만으로 응답 (충분히 크면 정렬된 얼굴이 필요하므로 전체 감지)
+        tracked, tracker, gray = track_session_face(img, session_id)
+        if tracker is not None:
+            timer.lap("track")
+        if tracked is not None and tracked["face_ratio"] < min_face_ratio:
+            face_trackers.record(tracked=True)
+            tracked["identified"] = False
+            tracked["timings"] = timer.finish()
+            return tracked
+
+        # detect-face와 같은 전처리(대비 향상)로 감지
+        faces = detect_faces_cascade(img, timer, enhance=True, session_id=session_id)
+        if tracker is not None:
+            face_trackers.record(tracked=False)
+            tracker.reset()
+
+        if not faces:
             return {
                 "success": True,
-                "match_type": "high",
-                "best_match": best_match
+                "face_detected": False,
+                "identified": False,
+                "message": NO_FACE_MESSAGE,
+                "timings": timer.finish()
             }
-        
-        # 2. 0.6 이상 0.75 미만 유사도: 직원별로 그룹화하여 후보 반환
-        medium_matches = [match for match in matches if high_threshold > match["confidence"] >= medium_threshold]
-        if medium_matches:
-            # 직원별로 그룹화
-            employee_groups = {}
-            for match in medium_matches:
-                employee_id = match["employee_id"]
-                if employee_id not in employee_groups:
-                    employee_groups[employee_id] = {
-                        "employee_id": employee_id,
-                        "name": match["name"],
-                        "department": match["department"],
-                        "position": match["position"],
-                        "employeeId": match["employeeId"],
-                        "max_confidence": match["confidence"],
-                        "face_count": 1,
-                        "best_image_base64": match["image_base64"],
-                        "best_encoding_id": match["id"]
-                    }
-                else:
-                    # 기존 직원의 더 높은 유사도 발견 시 업데이트
-                    if match["confidence"] > employee_groups[employee_id]["max_confidence"]:
-                        employee_groups[employee_id]["max_confidence"] = match["confidence"]
-                        employee_groups[employee_id]["best_image_base64"] = match["image_base64"]
-                        employee_groups[employee_id]["best_encoding_id"] = match["id"]
-                    employee_groups[employee_id]["face_count"] += 1
-            
-            # 그룹화된 후보자들을 유사도 순으로 정렬하고 최대 3명까지만 반환
-            grouped_candidates = list(employee_groups.values())
-            grouped_candidates = sorted(grouped_candidates, key=lambda x: x["max_confidence"], reverse=True)
-            grouped_candidates = grouped_candidates[:3]
-            
-            # 응답용 형식으로 변환
-            candidates = []
-            for candidate in grouped_candidates:
-                candidates.append({
-                    "id": candidate["best_encoding_id"],  # 가장 높은 유사도를 가진 얼굴의 ID
-                    "employee_id": candidate["employee_id"],
-                    "name": candidate["name"],
-                    "department": candidate["department"],
-                    "position": candidate["position"],
-                    "employeeId": candidate["employeeId"],
-                    "confidence": candidate["max_confidence"],
-                    "image_base64": candidate["best_image_base64"],
-                    "face_count": candidate["face_count"]  # 해당 직원의 등록된 얼굴 수
-                })
-            
-            timestamp_face_compare_end = datetime.now()
-            print('Timestamp - Face Compare End (Medium):', timestamp_face_compare_end)
-            time_diff = timestamp_face_compare_end - timestamp_face_compare_start
-            print(f"Medium match comparison time: {time_diff.total_seconds() * 1000} ms")
-            
+
+        largest_face = find_largest_valid_face(img, faces)
+        timer.lap("validate")
+        if largest_face is None:
             return {
                 "success": True,
-                "match_type": "medium",
-                "candidates": candidates,
-                "total_candidates": len(candidates)
+                "face_detected": False,
+                "identified": False,
+                "message": INCOMPLETE_FACE_MESSAGE,
+                "timings": timer.finish()
             }
-        
-        # 3. 0.6 미만 유사도: 아무것도 반환하지 않음 (인식 실패)
-        timestamp_face_compare_end = datetime.now()
-        print('Timestamp - Face Compare End (Low):', timestamp_face_compare_end)
-        time_diff = timestamp_face_compare_end - timestamp_face_compare_start
-        print(f"Low match comparison time: {time_diff.total_seconds() * 1000} ms")
-        
-        return {
-            "success": True,
-            "match_type": "low",
-            "message": "등록된 얼굴 중에 일치하는 얼굴을 찾지 못했습니다."
-        }
-    
+
+        result = face_detection_response(largest_face)
+        if largest_face["face_ratio"] < min_face_ratio:
+            if tracker is not None:
+                tracker.start(gray, result)
+            result["identified"] = False
+            result["timings"] = timer.finish()
+            return result
+
+        # 감지 결과(얼굴 위치, 눈 위치)로 원본 이미지에서 정렬해 임베딩 계산 (감지 재실행 없음)
+        aligned_face = align_face_crop(img, result["face_area"], result.get("landmarks"))
+        timer.lap("align")
+        if aligned_face is not None:
+            embedding_vector = embedding_batcher.embed(aligned_face)
+        else:
+            embedding_vector = extract_face_embedding(img, enforce_detection=True)
+        timer.lap("embed")
+        if embedding_vector is None:
+            result.update({"success": False, "identified": False, "message": "이미지에서 얼굴을 감지할 수 없습니다."})
+            result["timings"] = timer.finish()
+            return result
+
+        result.update(match_gallery(gallery, embedding_vector, started_at))
+        timer.lap("search")
+        if result.get("success"):
+            # 출근 확정 시 얼굴 추가 등록에 재사용 (register_attendance의 probe_token)
+            result["probe_token"] = probe_cache.put(embedding_vector, crop_face(img, largest_face["facial_area"]).copy())
+        result["identified"] = True
+        if include_face_image:
+            result["face_image"] = crop_face_base64(img, largest_face["facial_area"])
+        result["timings"] = timer.finish()
+        return result
+
     except Exception as e:
         import traceback
         traceback_str = traceback.format_exc()
-        print(f"얼굴 비교 중 오류: {str(e)}\n{traceback_str}")
+        print(f"얼굴 인식 중 오류: {str(e)}\n{traceback_str}")
         return {
             "success": False,
-            "message": f"얼굴 비교 중 오류: {str(e)}"
+            "face_detected": False,
+            "identified": False,
+            "message": f"얼굴 인식 중 오류: {str(e)}"
         }
-    finally:
-        # 강제 가비지 컬렉션
-        gc.collect()
 
-def register_attendance(name, image_data=None, attendance_type='checkin'):
-    """출퇴근 기록 등록"""
+def register_attendance(name, image_data=None, attendance_type='checkin', probe_token=None):
+    """
+    출퇴근 기록 등록
+    probe_token(compare-face/identify-face 응답)이 유효하면 그때 계산한 임베딩으로 얼굴을 추가 등록하고,
+    없거나 만료되었으면 image_data로 감지/임베딩을 다시 계산
+    """
     try:
         # 1. 직원 정보 조회
         employee_info = get_employee_info(name=name)
@@ -693,14 +1097,20 @@ def register_attendance(name, image_data=None, attendance_type='checkin'):
             result['record_id'] = int(result['record_id'])
             result['employee_id'] = int(result['employee_id'])
             
-            # 5. 이미지 데이터가 있으면 얼굴 추가 등록
-            if image_data:
+            # 5. 비교 때 계산한 얼굴 또는 이미지 데이터가 있으면 얼굴 추가 등록
+            probe = probe_cache.take(probe_token) if probe_token else None
+            if probe is not None or image_data:
                 try:
-                    face_result = process_face_image(name, image_data, {
+                    metadata = {
                         "source": "auto_register",
                         "memo": "출근 시스템에서 자동 등록된 얼굴"
-                    })
-                    result['face_registered'] = True
+                    }
+                    if probe is not None:
+                        face_result = register_probe_face(name, probe[0], probe[1], metadata)
+                    else:
+                        face_result = process_face_image(name, image_data, metadata)
+                    # 기존 얼굴과 거의 같아 건너뛴 경우(skipped)는 등록되지 않은 것으로 표시
+                    result['face_registered'] = bool(face_result.get('success')) and not face_result.get('skipped')
                     result['face_registration_details'] = face_result
                 except Exception as e:
                     print(f"추가 얼굴 등록 중 오류: {str(e)}")
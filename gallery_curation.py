@@ -0,0 +1,178 @@
+# gallery_curation.py - 직원별 등록 얼굴 수 제한 (중복 제거 + k-center 다양성 선택)
+#
+# 오프라인 정리 사용 예:
+#   python gallery_curation.py --dry-run                # 삭제될 얼굴만 출력
+#   python gallery_curation.py                          # GALLERY_MAX_FACES_PER_EMPLOYEE 기준으로 정리
+#   python gallery_curation.py --max-per-employee 10 --duplicate-threshold 0.9
+import argparse
+import threading
+import numpy as np
+
+from config import GALLERY_MAX_FACES_PER_EMPLOYEE, GALLERY_DUPLICATE_THRESHOLD
+from face_gallery import normalize_vectors
+
+
+def face_quality(vectors):
+    """
+    직원의 평균 벡터와의 유사도 (0~1)
+    흐리거나 가려진 사진, 잘못 등록된 다른 사람 사진처럼 이상치일수록 낮음
+    """
+    centroid = normalize_vectors(vectors.mean(axis=0))
+    return np.clip(vectors @ centroid, 0.0, 1.0)
+
+
+def drop_duplicates(vectors, quality, threshold, protect=()):
+    """
+    유사도가 threshold 이상인 얼굴끼리는 하나만 남김 (보호 대상, 품질이 높은 순으로 우선)
+    남길 행 번호 리스트 반환
+    """
+    order = sorted(range(len(vectors)), key=lambda row: (row not in protect, -quality[row]))
+    kept = []
+    for row in order:
+        if kept and row not in protect and float(np.max(vectors[kept] @ vectors[row])) >= threshold:
+            continue
+        kept.append(row)
+    return kept
+
+
+def select_diverse(vectors, quality, k, protect=()):
+    """
+    k-center 탐욕 선택: 가장 대표적인 얼굴(품질 최고)과 보호 대상에서 시작해,
+    이미 고른 얼굴들과의 최소 거리 × 품질이 가장 큰 얼굴을 k개가 될 때까지 추가
+    (서로 다른 조명/각도/표정을 고르되 이상치만 골라지지 않도록 품질로 가중)
+    고른 행 번호 리스트 반환
+    """
+    if len(vectors) <= k:
+        return list(range(len(vectors)))
+
+    selected = [row for row in protect if row < len(vectors)][:k]
+    best = int(np.argmax(quality))
+    if len(selected) < k and best not in selected:
+        selected.append(best)
+
+    min_distance = np.min(1.0 - vectors @ vectors[selected].T, axis=1)
+    while len(selected) < k:
+        gain = min_distance * quality
+        gain[selected] = -1.0
+        row = int(np.argmax(gain))
+        selected.append(row)
+        min_distance = np.minimum(min_distance, 1.0 - vectors @ vectors[row])
+    return sorted(selected)
+
+
+class GalleryCurator:
+    """
+    직원별 얼굴 갤러리를 max_per_employee개 이하로 유지
+
+    - 새 얼굴이 같은 직원의 기존 얼굴과 duplicate_threshold 이상 유사하면 저장하지 않음
+    - 저장 후 직원의 얼굴 수가 한도를 넘으면 중복을 먼저 제거하고 k-center 선택으로 다양한 얼굴만 남김
+      (방금 등록한 얼굴은 현재 모습이므로 항상 유지)
+    max_per_employee가 0이면 개수 제한 없음
+    """
+
+    def __init__(self, max_per_employee=20, duplicate_threshold=0.95):
+        self.max_per_employee = max_per_employee
+        self.duplicate_threshold = duplicate_threshold
+        self.lock = threading.Lock()
+
+        # 지표
+        self.duplicates_rejected = 0
+        self.pruned = 0
+
+    def find_duplicate(self, gallery, employee_id, vector):
+        """같은 직원의 거의 같은 얼굴 (encoding_id, 유사도) 반환 (없으면 None)"""
+        encoding_ids, vectors = gallery.employee_vectors(employee_id)
+        if len(encoding_ids) == 0:
+            return None
+
+        scores = vectors @ normalize_vectors(np.asarray(vector, dtype=np.float32).ravel())
+        best = int(np.argmax(scores))
+        if float(scores[best]) < self.duplicate_threshold:
+            return None
+
+        with self.lock:
+            self.duplicates_rejected += 1
+        return int(encoding_ids[best]), float(scores[best])
+
+    def plan(self, encoding_ids, vectors, protect_ids=()):
+        """한도를 넘는 직원의 얼굴 중 삭제할 encoding_id 리스트 (한도 이내면 빈 리스트)"""
+        if not self.max_per_employee or len(encoding_ids) <= self.max_per_employee:
+            return []
+
+        vectors = normalize_vectors(vectors)
+        quality = face_quality(vectors)
+        protect_ids = {int(encoding_id) for encoding_id in protect_ids}
+        protect = [row for row, encoding_id in enumerate(encoding_ids) if int(encoding_id) in protect_ids]
+
+        kept = drop_duplicates(vectors, quality, self.duplicate_threshold, protect)
+        kept_protect = [kept.index(row) for row in protect]
+        selected = select_diverse(vectors[kept], quality[kept], self.max_per_employee, kept_protect)
+
+        keep_ids = {int(encoding_ids[kept[i]]) for i in selected}
+        return [int(encoding_id) for encoding_id in encoding_ids if int(encoding_id) not in keep_ids]
+
+    def enforce(self, employee_id, protect_ids=()):
+        """직원 얼굴 수가 한도를 넘으면 정리하고 삭제한 encoding_id 리스트 반환"""
+        from utils import get_face_gallery, delete_face_encoding
+
+        encoding_ids, vectors = get_face_gallery().employee_vectors(employee_id)
+        removed = [encoding_id for encoding_id in self.plan(encoding_ids, vectors, protect_ids)
+                   if delete_face_encoding(encoding_id)]
+        if removed:
+            print(f"직원 {employee_id}의 얼굴 {len(removed)}개 정리 (한도 {self.max_per_employee}개)")
+            with self.lock:
+                self.pruned += len(removed)
+        return removed
+
+    def metrics(self):
+        with self.lock:
+            return {
+                "max_per_employee": self.max_per_employee,
+                "duplicate_threshold": self.duplicate_threshold,
+                "duplicates_rejected": self.duplicates_rejected,
+                "pruned": self.pruned
+            }
+
+
+# 프로세스 전역 갤러리 정리기
+gallery_curator = GalleryCurator(
+    max_per_employee=GALLERY_MAX_FACES_PER_EMPLOYEE,
+    duplicate_threshold=GALLERY_DUPLICATE_THRESHOLD
+)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="등록된 얼굴 갤러리를 직원별 한도에 맞게 정리")
+    parser.add_argument("--max-per-employee", type=int, default=GALLERY_MAX_FACES_PER_EMPLOYEE, help="직원당 최대 얼굴 수")
+    parser.add_argument("--duplicate-threshold", type=float, default=GALLERY_DUPLICATE_THRESHOLD, help="중복으로 볼 코사인 유사도")
+    parser.add_argument("--dry-run", action="store_true", help="삭제하지 않고 대상만 출력")
+    args = parser.parse_args()
+
+    from utils import get_face_gallery, delete_face_encoding
+
+    curator = GalleryCurator(args.max_per_employee, args.duplicate_threshold)
+    gallery = get_face_gallery()
+    employee_ids = sorted({int(employee_id) for employee_id in gallery.employee_ids[:len(gallery)]})
+    before = len(gallery)
+
+    total = 0
+    for employee_id in employee_ids:
+        encoding_ids, vectors = gallery.employee_vectors(employee_id)
+        # 가장 최근에 등록된 얼굴(가장 큰 encoding_id)은 유지
+        protect_ids = [int(max(encoding_ids))] if len(encoding_ids) else []
+        targets = curator.plan(encoding_ids, vectors, protect_ids)
+        if not targets:
+            continue
+
+        name = gallery.employees.get(employee_id, {}).get('name')
+        print(f"[{employee_id}] {name}: {len(encoding_ids)}개 -> {len(encoding_ids) - len(targets)}개 (삭제 {targets})")
+        if not args.dry_run:
+            targets = [encoding_id for encoding_id in targets if delete_face_encoding(encoding_id)]
+        total += len(targets)
+
+    action = "삭제 예정" if args.dry_run else "삭제"
+    print(f"\n직원 {len(employee_ids)}명, 얼굴 {before}개 중 {total}개 {action}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+# image_writer.py - 등록 얼굴 원본 이미지/썸네일을 요청 경로 밖에서 저장하는 백그라운드 작성기
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import cv2
+
+from thumbnails import thumbnail_cache
+
+
+class BackgroundImageWriter:
+    """
+    얼굴 원본 이미지(JPEG)와 썸네일을 별도 스레드에서 저장
+
+    임베딩과 메타데이터는 요청 안에서 먼저 저장하고, 디스크 쓰기만 뒤로 미룬다.
+    저장이 끝날 때까지는 이미지를 메모리에 두고 pending_image()로 내준다 (비교 결과 썸네일 등).
+    저장이 끝나기 전에 원본 이미지를 요청하면 아직 파일이 없을 수 있다 (/api/faces/{id}/image는 404).
+    """
+
+    def __init__(self, workers=1):
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="image-writer")
+        self.lock = threading.Lock()
+        self.images = {}  # 저장 중인 encoding_id -> 이미지(BGR)
+
+        # 지표
+        self.pending = 0
+        self.written = 0
+        self.failed = 0
+
+    def submit(self, encoding_id, image_path, img):
+        with self.lock:
+            self.pending += 1
+            self.images[int(encoding_id)] = img
+        return self.pool.submit(self._write, encoding_id, image_path, img)
+
+    def _write(self, encoding_id, image_path, img):
+        try:
+            os.makedirs(os.path.dirname(image_path) or ".", exist_ok=True)
+            if not cv2.imwrite(image_path, img):
+                raise IOError(f"이미지 파일을 저장하지 못했습니다: {image_path}")
+            thumbnail_cache.create(encoding_id, img)
+            with self.lock:
+                self.written += 1
+        except Exception as e:
+            print(f"얼굴 이미지 백그라운드 저장 중 오류: {str(e)}")
+            with self.lock:
+                self.failed += 1
+        finally:
+            with self.lock:
+                self.pending -= 1
+                self.images.pop(int(encoding_id), None)
+
+    def pending_image(self, encoding_id):
+        """아직 저장 중인 얼굴 이미지 (저장이 끝났거나 없으면 None)"""
+        with self.lock:
+            return self.images.get(int(encoding_id))
+
+    def shutdown(self):
+        """남은 저장 작업을 모두 끝내고 종료"""
+        self.pool.shutdown(wait=True)
+
+    def metrics(self):
+        with self.lock:
+            return {"pending": self.pending, "written": self.written, "failed": self.failed}
+
+
+# 프로세스 전역 이미지 작성기
+image_writer = BackgroundImageWriter()
@@ -0,0 +1,158 @@
+# inference_executor.py - 얼굴 감지/인식 추론을 이벤트 루프 밖에서 실행하는 실행기
+import asyncio
+import threading
+import time
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from fastapi import HTTPException
+
+from config import INFERENCE_EXECUTOR_KIND, INFERENCE_WORKERS, INFERENCE_QUEUE_SIZE, INFERENCE_TIMEOUT
+
+
+class InferenceExecutor:
+    """
+    DeepFace / MTCNN / MediaPipe 호출을 스레드(또는 프로세스) 풀에서 실행
+
+    동시에 받을 수 있는 작업 수는 workers + queue_size로 제한한다.
+    - 대기열이 가득 차면 즉시 429 (Too Many Requests)
+    - timeout초 안에 끝나지 않으면 503 (Service Unavailable)
+
+    스레드 풀은 받은 작업마다 스레드를 두고, 실제로 추론을 돌리는 작업 수만 workers개의 슬롯으로 제한한다.
+    임베딩 배치를 기다리는 동안에는 yielded()로 슬롯을 내놓아 다른 작업이 같은 배치에 합류할 수 있게 한다.
+    """
+
+    def __init__(self, kind="thread", workers=2, queue_size=8, timeout=30.0):
+        self.kind = kind
+        self.workers = workers
+        self.queue_size = queue_size
+        self.timeout = timeout
+        self.lock = threading.Lock()
+        self.pool = None
+        self.slots = threading.Semaphore(workers)
+        self.local = threading.local()
+
+        # 지표
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.total_seconds = 0.0
+
+    def _get_pool(self):
+        if self.pool is None:
+            if self.kind == "process":
+                self.pool = ProcessPoolExecutor(max_workers=self.workers)
+            else:
+                self.pool = ThreadPoolExecutor(max_workers=self.workers + self.queue_size, thread_name_prefix="inference")
+        return self.pool
+
+    def _run_in_slot(self, fn, *args):
+        """추론 슬롯을 잡고 fn 실행 (스레드 풀 작업)"""
+        with self.slots:
+            self.local.holding = True
+            try:
+                return fn(*args)
+            finally:
+                self.local.holding = False
+
+    @contextmanager
+    def yielded(self):
+        """
+        블록 안에서 현재 스레드의 추론 슬롯을 내놓음 (임베딩 배치 결과를 기다리는 동안 사용)
+        실행기 밖의 스레드에서는 아무것도 하지 않음
+        """
+        if not getattr(self.local, "holding", False):
+            yield
+            return
+        self.slots.release()
+        try:
+            yield
+        finally:
+            self.slots.acquire()
+
+    def pending(self):
+        """실행 중이거나 대기 중인 작업 수"""
+        with self.lock:
+            return self.in_flight
+
+    def _release(self, started_at, future):
+        with self.lock:
+            self.in_flight -= 1
+            self.total_seconds += time.perf_counter() - started_at
+            if future.cancelled() or future.exception() is not None:
+                self.failed += 1
+            else:
+                self.completed += 1
+
+    async def run(self, fn, *args):
+        """fn(*args)를 풀에서 실행하고 결과를 기다림"""
+        with self.lock:
+            if self.in_flight >= self.workers + self.queue_size:
+                self.rejected += 1
+                raise HTTPException(
+                    status_code=429,
+                    detail="얼굴 처리 요청이 많아 잠시 후 다시 시도해주세요.",
+                    headers={"Retry-After": "1"}
+                )
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+
+        started_at = time.perf_counter()
+        try:
+            if self.kind == "process":
+                future = self._get_pool().submit(fn, *args)
+            else:
+                future = self._get_pool().submit(self._run_in_slot, fn, *args)
+        except Exception:
+            with self.lock:
+                self.in_flight -= 1
+                self.failed += 1
+            raise
+        future.add_done_callback(lambda f: self._release(started_at, f))
+
+        try:
+            # 시간 초과 시에도 작업 자체는 풀에서 끝까지 실행되므로 shield로 감쌈
+            return await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(future)), timeout=self.timeout)
+        except asyncio.TimeoutError:
+            with self.lock:
+                self.timed_out += 1
+            raise HTTPException(
+                status_code=503,
+                detail="얼굴 처리 시간이 초과되었습니다. 잠시 후 다시 시도해주세요.",
+                headers={"Retry-After": "2"}
+            )
+
+    def metrics(self):
+        """대기열 깊이 및 처리 현황"""
+        with self.lock:
+            active = min(self.in_flight, self.workers)
+            finished = self.completed + self.failed
+            return {
+                "kind": self.kind,
+                "workers": self.workers,
+                "queue_size": self.queue_size,
+                "active": active,
+                "queue_depth": self.in_flight - active,
+                "max_in_flight": self.max_in_flight,
+                "completed": self.completed,
+                "failed": self.failed,
+                "rejected": self.rejected,
+                "timed_out": self.timed_out,
+                "avg_ms": round(self.total_seconds / finished * 1000, 2) if finished else None
+            }
+
+    def shutdown(self):
+        if self.pool is not None:
+            self.pool.shutdown(wait=False, cancel_futures=True)
+            self.pool = None
+
+
+# 프로세스 전역 추론 실행기
+inference_executor = InferenceExecutor(
+    kind=INFERENCE_EXECUTOR_KIND,
+    workers=INFERENCE_WORKERS,
+    queue_size=INFERENCE_QUEUE_SIZE,
+    timeout=INFERENCE_TIMEOUT
+)
@@ -0,0 +1,179 @@
+# kiosk_stream.py - 키오스크 카메라 프레임 스트리밍(WebSocket) 세션
+import json
+import uuid
+import asyncio
+import threading
+from fastapi import HTTPException, WebSocket, WebSocketDisconnect
+
+from config import KIOSK_MAX_FRAME_BYTES
+from inference_executor import inference_executor
+from face_utils import identify_face, parse_min_face_ratio
+from face_tracker import face_trackers
+from utils import sanitize_json_values
+
+
+class KioskStreamStats:
+    """전체 WebSocket 세션의 프레임 처리 지표"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.sessions = 0
+        self.active = 0
+        self.frames = 0
+        self.processed = 0
+        self.dropped = 0
+        self.busy = 0
+
+    def add(self, **counts):
+        with self.lock:
+            for name, value in counts.items():
+                setattr(self, name, getattr(self, name) + value)
+
+    def metrics(self):
+        with self.lock:
+            return {
+                "sessions": self.sessions,
+                "active": self.active,
+                "frames": self.frames,
+                "processed": self.processed,
+                "dropped": self.dropped,
+                "busy": self.busy
+            }
+
+
+kiosk_stream_stats = KioskStreamStats()
+
+
+class KioskStreamSession:
+    """
+    키오스크 한 대의 WebSocket 연결
+
+    클라이언트 -> 서버
+    - 바이너리 메시지: JPEG 프레임
+    - 텍스트 메시지: 설정 JSON ({"type": "config", "min_face_ratio": 0.1})
+
+    서버 -> 클라이언트
+    - {"type": "result", "frame": 번호, ...identify_face 결과}
+    - {"type": "busy", ...}: 추론 대기열이 가득 차거나 시간 초과 (다음 프레임으로 계속)
+    - {"type": "error", "message": ...}
+
+    받는 프레임은 가장 최근 한 장만 보관하고(latest-frame-wins), 처리 중에 새 프레임이
+    여러 장 오면 마지막 것만 처리하고 나머지는 버린다.
+    연결마다 얼굴 추적기(face_tracker)를 하나씩 사용한다.
+    """
+
+    def __init__(self, websocket: WebSocket, min_face_ratio=0.0):
+        self.websocket = websocket
+        self.session_id = f"ws-{uuid.uuid4().hex}"
+        self.min_face_ratio = min_face_ratio
+        self.latest = None  # (프레임 번호, JPEG 바이트)
+        self.frame_ready = asyncio.Event()
+        self.frame_seq = 0
+        self.dropped = 0
+        self.closed = False
+
+    async def run(self):
+        await self.websocket.accept()
+        kiosk_stream_stats.add(sessions=1, active=1)
+        processor = asyncio.create_task(self._process_loop())
+        processor.add_done_callback(self._processor_done)
+        try:
+            await self._receive_loop()
+        except WebSocketDisconnect:
+            pass
+        finally:
+            self.closed = True
+            self.frame_ready.set()
+            processor.cancel()
+            face_trackers.discard(self.session_id)
+            kiosk_stream_stats.add(active=-1)
+
+    def _processor_done(self, task):
+        """처리 작업이 예기치 않은 오류로 끝나면 기록하고 연결을 닫음 (클라이언트가 다시 연결하도록)"""
+        if task.cancelled() or task.exception() is None:
+            return
+        e = task.exception()
+        import traceback
+        traceback_str = ''.join(traceback.format_exception(type(e), e, e.__traceback__))
+        print(f"키오스크 프레임 처리 작업이 중단되었습니다: {str(e)}\n{traceback_str}")
+        if not self.closed:
+            self.closed = True
+            asyncio.ensure_future(self._close(1011))
+
+    async def _close(self, code):
+        try:
+            await self.websocket.close(code=code)
+        except Exception as e:
+            print(f"키오스크 스트림 종료 실패: {str(e)}")
+
+    async def _receive_loop(self):
+        while True:
+            message = await self.websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(message.get("code", 1000))
+
+            if message.get("bytes") is not None:
+                self._put_frame(message["bytes"])
+            elif message.get("text"):
+                await self._handle_control(message["text"])
+
+    def _put_frame(self, frame):
+        if len(frame) > KIOSK_MAX_FRAME_BYTES:
+            self.dropped += 1
+            kiosk_stream_stats.add(frames=1, dropped=1)
+            return
+
+        # 아직 처리되지 않은 이전 프레임은 버리고 최신 프레임으로 교체
+        if self.latest is not None:
+            self.dropped += 1
+            kiosk_stream_stats.add(dropped=1)
+        self.frame_seq += 1
+        self.latest = (self.frame_seq, frame)
+        kiosk_stream_stats.add(frames=1)
+        self.frame_ready.set()
+
+    async def _handle_control(self, text):
+        try:
+            control = json.loads(text)
+            if control.get("type") == "config" and "min_face_ratio" in control:
+                self.min_face_ratio = parse_min_face_ratio(control["min_face_ratio"])
+        except (ValueError, TypeError, AttributeError):
+            await self._send({"type": "error", "message": "잘못된 제어 메시지입니다."})
+
+    async def _process_loop(self):
+        while True:
+            await self.frame_ready.wait()
+            self.frame_ready.clear()
+            if self.closed:
+                return
+            if self.latest is None:
+                continue
+
+            frame_id, frame = self.latest
+            self.latest = None
+            try:
+                result = await inference_executor.run(identify_face, frame, self.min_face_ratio, True, self.session_id)
+                message = {"type": "result", "frame": frame_id, "dropped": self.dropped}
+                message.update(sanitize_json_values(result))
+                kiosk_stream_stats.add(processed=1)
+            except HTTPException as e:
+                # 429/503: 서버가 밀려 있으므로 이 프레임은 건너뛰고 다음 최신 프레임 처리
+                busy = e.status_code in (429, 503)
+                if busy:
+                    kiosk_stream_stats.add(busy=1)
+                message = {"type": "busy" if busy else "error", "frame": frame_id, "message": e.detail}
+            except Exception as e:
+                print(f"키오스크 프레임 처리 중 오류: {str(e)}")
+                message = {"type": "error", "frame": frame_id, "message": f"프레임 처리 중 오류: {str(e)}"}
+
+            await self._send(message)
+
+    async def _send(self, message):
+        if self.closed:
+            return
+        try:
+            await self.websocket.send_json(message)
+        except Exception as e:
+            # 클라이언트가 이미 연결을 끊은 경우
+            print(f"키오스크 스트림 전송 실패: {str(e)}")
+            self.closed = True
@@ -0,0 +1,70 @@
+# probe_cache.py - 비교에 쓴 얼굴(임베딩 + 이미지)을 잠시 보관해 출근 확정 시 재계산 없이 등록
+import time
+import uuid
+import threading
+from collections import OrderedDict
+
+from config import PROBE_CACHE_TTL, PROBE_CACHE_MAX_ENTRIES
+
+
+class ProbeCache:
+    """
+    compare-face / identify-face에서 계산한 임베딩과 디코딩된 얼굴 이미지를 토큰으로 보관
+
+    응답에 probe_token을 실어 보내고, 출퇴근 등록 시 토큰을 돌려받으면
+    감지/임베딩을 다시 하지 않고 그대로 저장한다.
+    토큰은 한 번만 쓸 수 있고 ttl초가 지나면 만료된다 (가장 오래된 것부터 max_entries개까지만 보관).
+    프로세스 메모리에 있으므로 추론 실행기가 process 모드면 다른 워커에서는 찾지 못할 수 있다
+    (이 경우 호출 측은 이미지 업로드 경로로 대체).
+    """
+
+    def __init__(self, ttl=120.0, max_entries=64):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()  # token -> (만료 시각, 임베딩, BGR 이미지)
+
+        # 지표
+        self.stored = 0
+        self.used = 0
+        self.missed = 0
+
+    def _prune(self, now):
+        while self.entries:
+            token, (expires_at, _, _) = next(iter(self.entries.items()))
+            if len(self.entries) <= self.max_entries and expires_at > now:
+                break
+            del self.entries[token]
+
+    def put(self, embedding, img):
+        """임베딩과 얼굴 이미지를 보관하고 토큰 반환"""
+        token = uuid.uuid4().hex
+        with self.lock:
+            now = time.monotonic()
+            self.entries[token] = (now + self.ttl, embedding, img)
+            self.stored += 1
+            self._prune(now)
+        return token
+
+    def take(self, token):
+        """토큰의 (임베딩, 이미지)를 꺼내고 삭제 (없거나 만료되었으면 None)"""
+        with self.lock:
+            entry = self.entries.pop(token, None) if token else None
+            if entry is None or entry[0] <= time.monotonic():
+                self.missed += 1
+                return None
+            self.used += 1
+            return entry[1], entry[2]
+
+    def metrics(self):
+        with self.lock:
+            return {
+                "entries": len(self.entries),
+                "stored": self.stored,
+                "used": self.used,
+                "missed": self.missed
+            }
+
+
+# 프로세스 전역 비교 얼굴 보관소
+probe_cache = ProbeCache(ttl=PROBE_CACHE_TTL, max_entries=PROBE_CACHE_MAX_ENTRIES)
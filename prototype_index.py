@@ -0,0 +1,135 @@
+# prototype_index.py - 직원별 대표(평균) 벡터로 후보 직원을 먼저 고르는 2단계 검색용 인덱스
+import threading
+import numpy as np
+
+from config import GALLERY_SEARCH_MODE, PROTOTYPE_TOP_EMPLOYEES, PROTOTYPE_MIN_GALLERY_SIZE
+
+
+class PrototypeIndex:
+    """
+    직원마다 등록 얼굴(정규화 벡터)의 평균을 정규화한 대표 벡터 한 개와 소속 encoding_id를 보관
+
+    추가/삭제 시 직원별 벡터 합만 갱신하므로 O(dim)이며, 얼굴이 모두 삭제된 직원은 마지막 행과 자리를 바꿔 제거한다.
+    검색은 대표 벡터로 유사도 상위 top_employees명을 고른 뒤 (비용 ∝ 직원 수)
+    FaceGallery가 그 직원들의 얼굴만 정확히 재채점한다.
+    """
+
+    def __init__(self, top_employees=20, min_size=1000):
+        self.top_employees = top_employees
+        self.min_size = min_size
+        self.lock = threading.Lock()
+        self._reset()
+
+        # 지표
+        self.queries = 0
+        self.candidates_scored = 0
+
+    def _reset(self, dim=0, capacity=0):
+        self.size = 0
+        self.sums = np.zeros((capacity, dim), dtype=np.float64)
+        self.matrix = np.zeros((capacity, dim), dtype=np.float32)
+        self.employee_ids = np.zeros(capacity, dtype=np.int64)
+        self.rows = {}  # employee_id -> 행 번호
+        self.members = {}  # employee_id -> encoding_id 집합
+
+    def _grow(self, dim):
+        capacity = max(16, len(self.employee_ids) * 2)
+        for name, dtype in (("sums", np.float64), ("matrix", np.float32)):
+            grown = np.zeros((capacity, dim), dtype=dtype)
+            grown[:self.size] = getattr(self, name)[:self.size]
+            setattr(self, name, grown)
+        self.employee_ids = np.resize(self.employee_ids, capacity)
+
+    def _refresh(self, row):
+        norm = np.linalg.norm(self.sums[row])
+        self.matrix[row] = self.sums[row] / norm if norm > 0 else 0.0
+
+    def build(self, encoding_ids, employee_ids, matrix):
+        """갤러리 전체(정규화된 행렬)로 재구성"""
+        with self.lock:
+            unique_ids, owners = np.unique(np.asarray(employee_ids, dtype=np.int64), return_inverse=True)
+            dim = matrix.shape[1] if len(matrix) else 0
+            self._reset(dim, len(unique_ids))
+            np.add.at(self.sums, owners, matrix)
+            self.employee_ids[:len(unique_ids)] = unique_ids
+            self.size = len(unique_ids)
+            for row, employee_id in enumerate(unique_ids.tolist()):
+                self.rows[employee_id] = row
+                self.members[employee_id] = set()
+                self._refresh(row)
+            for encoding_id, owner in zip(encoding_ids, owners):
+                self.members[int(unique_ids[owner])].add(int(encoding_id))
+
+    def add(self, encoding_id, employee_id, vector):
+        """정규화된 얼굴 벡터 한 개를 직원 대표 벡터에 반영"""
+        employee_id = int(employee_id)
+        with self.lock:
+            if self.sums.shape[1] != len(vector):
+                self._reset(len(vector))
+            row = self.rows.get(employee_id)
+            if row is None:
+                if self.size == len(self.employee_ids):
+                    self._grow(len(vector))
+                row = self.size
+                self.sums[row] = 0.0
+                self.employee_ids[row] = employee_id
+                self.rows[employee_id] = row
+                self.members[employee_id] = set()
+                self.size += 1
+            self.sums[row] += vector
+            self.members[employee_id].add(int(encoding_id))
+            self._refresh(row)
+
+    def remove(self, encoding_id, employee_id, vector):
+        """얼굴 벡터 한 개를 직원 대표 벡터에서 제외 (마지막 얼굴이면 직원 행 삭제)"""
+        employee_id = int(employee_id)
+        with self.lock:
+            row = self.rows.get(employee_id)
+            if row is None or int(encoding_id) not in self.members[employee_id]:
+                return
+            self.members[employee_id].discard(int(encoding_id))
+            if self.members[employee_id]:
+                self.sums[row] -= vector
+                self._refresh(row)
+                return
+
+            del self.rows[employee_id]
+            del self.members[employee_id]
+            last = self.size - 1
+            if row != last:
+                self.sums[row] = self.sums[last]
+                self.matrix[row] = self.matrix[last]
+                self.employee_ids[row] = self.employee_ids[last]
+                self.rows[int(self.employee_ids[row])] = row
+            self.size -= 1
+
+    def usable(self, gallery_size):
+        return self.size > 0 and gallery_size >= self.min_size
+
+    def candidates(self, probe):
+        """대표 벡터 유사도 상위 top_employees명의 encoding_id 목록"""
+        with self.lock:
+            scores = self.matrix[:self.size] @ probe
+            m = min(self.top_employees, self.size)
+            top = np.argpartition(-scores, m - 1)[:m] if m < self.size else np.arange(self.size)
+            encoding_ids = [encoding_id for row in top for encoding_id in self.members[int(self.employee_ids[row])]]
+            self.queries += 1
+            self.candidates_scored += len(encoding_ids)
+            return encoding_ids
+
+    def metrics(self):
+        with self.lock:
+            return {
+                "employees": self.size,
+                "top_employees": self.top_employees,
+                "min_gallery_size": self.min_size,
+                "queries": self.queries,
+                "avg_candidates": round(self.candidates_scored / self.queries, 1) if self.queries else None
+            }
+
+
+def create_prototype_index():
+    """GALLERY_SEARCH_MODE가 "prototype"이면 직원 대표 벡터 인덱스 생성 (아니면 None)"""
+    if GALLERY_SEARCH_MODE != "prototype":
+        return None
+    return PrototypeIndex(top_employees=PROTOTYPE_TOP_EMPLOYEES, min_size=PROTOTYPE_MIN_GALLERY_SIZE)
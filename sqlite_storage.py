@@ -0,0 +1,320 @@
+# sqlite_storage.py - SQLite 저장소 백엔드 (직원 / 얼굴 메타데이터 / 출퇴근 기록)
+import os
+import sqlite3
+import threading
+import datetime
+import pandas as pd
+
+from config import SQLITE_DB_PATH, EMPLOYEES_CSV_PATH, FACE_ENCODINGS_CSV_PATH
+from attendance_partitions import attendance_partitions
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS employees (
+    employee_id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    department TEXT DEFAULT '',
+    position TEXT DEFAULT '',
+    employeeId TEXT DEFAULT '',
+    updated_at TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_employees_name ON employees(name);
+
+CREATE TABLE IF NOT EXISTS face_encodings (
+    encoding_id INTEGER PRIMARY KEY,
+    employee_id INTEGER NOT NULL,
+    image_path TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_face_encodings_employee_id ON face_encodings(employee_id);
+
+CREATE TABLE IF NOT EXISTS attendance_records (
+    record_id INTEGER PRIMARY KEY,
+    employee_id INTEGER NOT NULL,
+    date TEXT NOT NULL,
+    time TEXT NOT NULL,
+    tag TEXT DEFAULT ''
+);
+CREATE INDEX IF NOT EXISTS idx_attendance_date_time ON attendance_records(date, time);
+CREATE INDEX IF NOT EXISTS idx_attendance_employee_id ON attendance_records(employee_id);
+"""
+
+EMPLOYEE_COLUMNS = ['employee_id', 'name', 'department', 'position', 'employeeId']
+
+
+def _like_pattern(value):
+    """부분 일치 검색용 LIKE 패턴 (%, _ 이스케이프)"""
+    escaped = value.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    return f"%{escaped}%"
+
+
+def _clean(value):
+    """CSV에서 읽은 NaN 값을 빈 문자열로"""
+    return '' if pd.isna(value) else value
+
+
+class SqliteStorage:
+    """
+    utils.py의 CSV 함수들과 같은 형식의 결과를 돌려주는 SQLite 저장소
+
+    WAL 모드를 사용하므로 쓰기 중에도 다른 스레드의 읽기가 막히지 않는다.
+    연결은 스레드마다 하나씩 만든다.
+    """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self.local = threading.local()
+        self.write_lock = threading.Lock()
+
+    @property
+    def conn(self):
+        conn = getattr(self.local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self.local.conn = conn
+        return conn
+
+    def init_schema(self):
+        """테이블과 인덱스 생성"""
+        with self.write_lock, self.conn:
+            self.conn.executescript(SCHEMA)
+
+    def is_empty(self):
+        for table in ('employees', 'face_encodings', 'attendance_records'):
+            if self.conn.execute(f"SELECT 1 FROM {table} LIMIT 1").fetchone():
+                return False
+        return True
+
+    def import_csv_files(self):
+        """기존 CSV 파일의 직원/얼굴/출퇴근 데이터를 한 번에 가져옴"""
+        counts = {}
+        with self.write_lock, self.conn:
+            if os.path.exists(EMPLOYEES_CSV_PATH):
+                df = pd.read_csv(EMPLOYEES_CSV_PATH)
+                rows = [
+                    (int(row['employee_id']), _clean(row['name']), _clean(row.get('department')),
+                     _clean(row.get('position')), _clean(row.get('employeeId')),
+                     _clean(row.get('updated_at')) or None)
+                    for _, row in df.iterrows()
+                ]
+                self.conn.executemany(
+                    "INSERT OR REPLACE INTO employees (employee_id, name, department, position, employeeId, updated_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?)", rows)
+                counts['employees'] = len(rows)
+
+            if os.path.exists(FACE_ENCODINGS_CSV_PATH):
+                df = pd.read_csv(FACE_ENCODINGS_CSV_PATH, usecols=['encoding_id', 'employee_id', 'image_path'])
+                rows = [(int(row['encoding_id']), int(row['employee_id']), row['image_path']) for _, row in df.iterrows()]
+                self.conn.executemany(
+                    "INSERT OR REPLACE INTO face_encodings (encoding_id, employee_id, image_path) VALUES (?, ?, ?)", rows)
+                counts['face_encodings'] = len(rows)
+
+            # 월별 파티션 (이전 단일 CSV 파일이 남아 있으면 먼저 파티션으로 옮겨짐)
+            attendance_partitions.init()
+            df = attendance_partitions.read_all()
+            if not df.empty:
+                rows = [
+                    (int(row['record_id']), int(row['employee_id']), str(row['date']), str(row['time']), _clean(row['tag']))
+                    for _, row in df.iterrows()
+                ]
+                self.conn.executemany(
+                    "INSERT OR REPLACE INTO attendance_records (record_id, employee_id, date, time, tag) "
+                    "VALUES (?, ?, ?, ?, ?)", rows)
+                counts['attendance_records'] = len(rows)
+
+        print(f"CSV 데이터를 SQLite로 가져왔습니다: {counts}")
+        return counts
+
+    # === 직원 관리 ===
+
+    def get_or_create_employee(self, name, department="", position="", employeeId=""):
+        """직원 정보를 가져오거나 새로 생성 (employee_id, 변경 여부) 반환"""
+        with self.write_lock, self.conn:
+            row = self.conn.execute("SELECT * FROM employees WHERE name = ? LIMIT 1", (name,)).fetchone()
+
+            if row is not None:
+                updates = {}
+                if department and row['department'] != department:
+                    updates['department'] = department
+                if position and row['position'] != position:
+                    updates['position'] = position
+                if employeeId and row['employeeId'] != employeeId:
+                    updates['employeeId'] = employeeId
+
+                if updates:
+                    updates['updated_at'] = datetime.datetime.now().isoformat()
+                    assignments = ', '.join(f"{column} = ?" for column in updates)
+                    self.conn.execute(f"UPDATE employees SET {assignments} WHERE employee_id = ?",
+                                      (*updates.values(), row['employee_id']))
+                return int(row['employee_id']), bool(updates)
+
+            cursor = self.conn.execute(
+                "INSERT INTO employees (name, department, position, employeeId) VALUES (?, ?, ?, ?)",
+                (name, department, position, employeeId))
+            return int(cursor.lastrowid), True
+
+    def get_employee_info(self, employee_id=None, name=None):
+        if employee_id is not None:
+            row = self.conn.execute("SELECT * FROM employees WHERE employee_id = ?", (int(employee_id),)).fetchone()
+        elif name is not None:
+            row = self.conn.execute("SELECT * FROM employees WHERE name = ? LIMIT 1", (name,)).fetchone()
+        else:
+            return None
+        return dict(row) if row is not None else None
+
+    def get_all_employees(self):
+        return [dict(row) for row in self.conn.execute("SELECT * FROM employees ORDER BY employee_id")]
+
+    def update_employee_info(self, employee_id, name, department="", position="", employeeId=""):
+        """직원 정보 업데이트 (대상이 없으면 False)"""
+        with self.write_lock, self.conn:
+            cursor = self.conn.execute(
+                "UPDATE employees SET name = ?, department = ?, position = ?, employeeId = ? WHERE employee_id = ?",
+                (name, department, position, employeeId, int(employee_id)))
+            return cursor.rowcount > 0
+
+    # === 얼굴 메타데이터 관리 ===
+
+    def save_face_encoding(self, employee_id, image_path):
+        """얼굴 메타데이터 저장 후 encoding_id 반환"""
+        with self.write_lock, self.conn:
+            cursor = self.conn.execute(
+                "INSERT INTO face_encodings (employee_id, image_path) VALUES (?, ?)", (int(employee_id), image_path))
+            return int(cursor.lastrowid)
+
+    def get_face_encodings_by_employee(self, employee_id):
+        return [dict(row) for row in self.conn.execute(
+            "SELECT * FROM face_encodings WHERE employee_id = ? ORDER BY encoding_id", (int(employee_id),))]
+
+    def get_all_face_encodings_with_employee_info(self):
+        return [dict(row) for row in self.conn.execute(
+            "SELECT f.encoding_id, f.employee_id, e.name, e.department, e.position, e.employeeId, f.image_path "
+            "FROM face_encodings f LEFT JOIN employees e ON f.employee_id = e.employee_id "
+            "ORDER BY f.encoding_id")]
+
+    def get_face_encoding(self, encoding_id):
+        row = self.conn.execute("SELECT * FROM face_encodings WHERE encoding_id = ?", (int(encoding_id),)).fetchone()
+        return dict(row) if row is not None else None
+
+    def delete_face_encoding(self, encoding_id):
+        with self.write_lock, self.conn:
+            cursor = self.conn.execute("DELETE FROM face_encodings WHERE encoding_id = ?", (int(encoding_id),))
+            return cursor.rowcount > 0
+
+    # === 출퇴근 기록 관리 ===
+
+    def record_attendance(self, employee_id, date_str, time_str, tag):
+        """출퇴근 기록 추가 후 record_id 반환"""
+        with self.write_lock, self.conn:
+            cursor = self.conn.execute(
+                "INSERT INTO attendance_records (employee_id, date, time, tag) VALUES (?, ?, ?, ?)",
+                (int(employee_id), date_str, time_str, tag))
+            return int(cursor.lastrowid)
+
+    def _attendance_conditions(self, filters):
+        """출퇴근 기록 필터를 WHERE 조건 목록과 파라미터로 변환"""
+        conditions = []
+        params = []
+
+        if filters:
+            for column in ('name', 'department', 'position', 'employeeId'):
+                if filters.get(column):
+                    conditions.append(f"e.{column} LIKE ? ESCAPE '\\'")
+                    params.append(_like_pattern(filters[column]))
+
+            if filters.get('start_date'):
+                try:
+                    conditions.append("a.date >= ?")
+                    params.append(pd.to_datetime(filters['start_date']).strftime('%Y-%m-%d'))
+                except Exception as e:
+                    conditions.pop()
+                    print(f"시작일 파싱 오류: {e}")
+
+            if filters.get('end_date'):
+                try:
+                    conditions.append("a.date <= ?")
+                    params.append(pd.to_datetime(filters['end_date']).strftime('%Y-%m-%d'))
+                except Exception as e:
+                    conditions.pop()
+                    print(f"종료일 파싱 오류: {e}")
+
+            if filters.get('tag'):
+                if filters['tag'] == 'empty':
+                    conditions.append("COALESCE(a.tag, '') = ''")
+                else:
+                    conditions.append("a.tag = ?")
+                    params.append(filters['tag'])
+
+        return conditions, params
+
+    def get_attendance_records_with_employee_info(self, filters=None):
+        """출퇴근 기록과 직원 정보를 함께 조회 (CSV 버전과 같은 필터 지원)"""
+        conditions, params = self._attendance_conditions(filters)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        query = (
+            "SELECT a.record_id, a.employee_id, "
+            "COALESCE(e.name, '') AS name, COALESCE(e.department, '') AS department, "
+            "COALESCE(e.position, '') AS position, COALESCE(e.employeeId, '') AS employeeId, "
+            "a.date, a.time, COALESCE(a.tag, '') AS tag "
+            "FROM attendance_records a LEFT JOIN employees e ON a.employee_id = e.employee_id "
+            f"{where} ORDER BY a.date DESC, a.time DESC"
+        )
+        return [dict(row) for row in self.conn.execute(query, params)]
+
+    def get_attendance_page(self, filters=None, limit=100, before=None, include_total=False):
+        """
+        (날짜, 시간, record_id) 내림차순 키셋 페이지 조회
+        before: 이전 페이지 마지막 기록의 (날짜, 시간, record_id) - 이 키보다 이전 기록부터
+        반환값: (기록 목록 최대 limit + 1개, 전체 건수 또는 None)
+        """
+        conditions, params = self._attendance_conditions(filters)
+        join = "FROM attendance_records a LEFT JOIN employees e ON a.employee_id = e.employee_id "
+
+        total = None
+        if include_total:
+            where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+            total = self.conn.execute(f"SELECT COUNT(*) {join}{where}", params).fetchone()[0]
+
+        if before is not None:
+            conditions = conditions + ["(a.date, a.time, a.record_id) < (?, ?, ?)"]
+            params = params + [before[0], before[1], int(before[2])]
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        query = (
+            "SELECT a.record_id, a.employee_id, "
+            "COALESCE(e.name, '') AS name, COALESCE(e.department, '') AS department, "
+            "COALESCE(e.position, '') AS position, COALESCE(e.employeeId, '') AS employeeId, "
+            "a.date, a.time, COALESCE(a.tag, '') AS tag "
+            f"{join}{where} ORDER BY a.date DESC, a.time DESC, a.record_id DESC LIMIT ?"
+        )
+        records = [dict(row) for row in self.conn.execute(query, params + [int(limit) + 1])]
+        return records, total
+
+    def get_attendance_record(self, record_id):
+        row = self.conn.execute("SELECT * FROM attendance_records WHERE record_id = ?", (int(record_id),)).fetchone()
+        return dict(row) if row is not None else None
+
+    def get_attendance_columns(self, months=None):
+        """집계용 기록 (months(None이면 전체) 월의 employee_id, date, time, tag 열 DataFrame)"""
+        query = "SELECT employee_id, date, time, COALESCE(tag, '') AS tag FROM attendance_records"
+        if months is None:
+            return pd.read_sql_query(query, self.conn)
+        placeholders = ', '.join('?' for _ in months)
+        return pd.read_sql_query(f"{query} WHERE substr(date, 1, 7) IN ({placeholders})", self.conn, params=list(months))
+
+    def update_attendance_record(self, record_id, new_tag):
+        """태그 수정 후 이전 태그 반환 (대상이 없으면 None)"""
+        with self.write_lock, self.conn:
+            row = self.conn.execute(
+                "SELECT tag FROM attendance_records WHERE record_id = ?", (int(record_id),)).fetchone()
+            if row is None:
+                return None
+            self.conn.execute("UPDATE attendance_records SET tag = ? WHERE record_id = ?", (new_tag, int(record_id)))
+            return row['tag'] or ''
+
+
+if __name__ == "__main__":
+    # CSV -> SQLite 일회성 가져오기: python sqlite_storage.py
+    storage = SqliteStorage(SQLITE_DB_PATH)
+    storage.init_schema()
+    storage.import_csv_files()
@@ -0,0 +1,49 @@
+# stage_timings.py - 얼굴 감지/인식 단계별 소요 시간 측정
+import time
+import threading
+
+
+class StageTimings:
+    """단계별 소요 시간 누적 (횟수, 평균, 최대)"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.stages = {}  # 단계 이름 -> [횟수, 합계(ms), 최대(ms)]
+
+    def record(self, stages):
+        with self.lock:
+            for stage, elapsed_ms in stages.items():
+                stat = self.stages.setdefault(stage, [0, 0.0, 0.0])
+                stat[0] += 1
+                stat[1] += elapsed_ms
+                stat[2] = max(stat[2], elapsed_ms)
+
+    def metrics(self):
+        with self.lock:
+            return {
+                stage: {"count": count, "avg_ms": round(total / count, 2), "max_ms": round(maximum, 2)}
+                for stage, (count, total, maximum) in self.stages.items()
+            }
+
+
+class StageTimer:
+    """요청 한 건의 단계별 소요 시간 (lap()을 부를 때마다 직전 lap 이후 시간을 기록)"""
+
+    def __init__(self, timings):
+        self.timings = timings
+        self.last = time.perf_counter()
+        self.stages = {}
+
+    def lap(self, stage):
+        now = time.perf_counter()
+        self.stages[stage] = round((now - self.last) * 1000, 2)
+        self.last = now
+
+    def finish(self):
+        """누적 지표에 반영하고 이번 요청의 단계별 시간(ms) 반환"""
+        self.timings.record(self.stages)
+        return dict(self.stages)
+
+
+# 프로세스 전역 얼굴 감지/인식 단계별 시간
+detection_timings = StageTimings()
@@ -13,6 +13,7 @@ $(document).ready(function() {
     const $recordsCount = $('#recordsCount');
     const $attendanceTableBody = $('#attendanceTableBody');
     const $emptyMessage = $('#emptyMessage');
+    const $loadMoreBtn = $('#loadMoreBtn');
     const $statusMessage = $('#statusMessage');
     
     // API URL
@@ -24,6 +25,11 @@ $(document).ready(function() {
     // 데이터 캐싱
     let cachedData = [];
     
+    // 페이지네이션 (서버가 준 다음 페이지 커서, 없으면 마지막 페이지)
+    const PAGE_SIZE = 100;
+    let nextCursor = null;
+    let totalCount = 0;
+    
     // 태그 옵션
     const tagOptions = ["출근", "퇴근", "외근", "지각", "반차", ""];
     
@@ -74,6 +80,11 @@ $(document).ready(function() {
             exportToCSV();
         });
         
+        // 더 보기 버튼 클릭 이벤트
+        $loadMoreBtn.on('click', function() {
+            loadMoreAttendanceData();
+        });
+        
         // 엔터 키 검색 실행
         $nameFilter.on('keyup', function(event) {
             if (event.key === 'Enter') {
@@ -157,15 +168,9 @@ $(document).ready(function() {
         loadAttendanceData(defaultFilters);
     }
     
-    // 출퇴근 데이터 로드 함수
-    function loadAttendanceData(filters) {
-        updateStatus('데이터 로드 중...', 'info');
-        
-        // 현재 필터 저장
-        currentFilters = filters;
-        
-        // API URL 생성
-        let apiUrl = `${API_URL}/api/attendance?`;
+    // 필터 조건으로 조회 API URL 생성
+    function buildAttendanceUrl(filters, path = '/api/attendance') {
+        let apiUrl = `${API_URL}${path}?`;
         
         // 필터 파라미터 추가
         if (filters.name) apiUrl += `name=${encodeURIComponent(filters.name)}&`;
@@ -174,22 +179,35 @@ $(document).ready(function() {
         if (filters.employeeId) apiUrl += `employeeId=${encodeURIComponent(filters.employeeId)}&`;
         if (filters.start_date) apiUrl += `start_date=${encodeURIComponent(filters.start_date)}&`;
         if (filters.end_date) apiUrl += `end_date=${encodeURIComponent(filters.end_date)}&`;
-        if (filters.tag) apiUrl += `tag=${encodeURIComponent(filters.tag)}`;
+        if (filters.tag) apiUrl += `tag=${encodeURIComponent(filters.tag)}&`;
+        
+        return apiUrl;
+    }
+    
+    // 출퇴근 데이터 로드 함수 (첫 페이지, 전체 건수 포함)
+    function loadAttendanceData(filters) {
+        updateStatus('데이터 로드 중...', 'info');
+        
+        // 현재 필터 저장
+        currentFilters = filters;
         
         // API 호출
         $.ajax({
-            url: apiUrl,
+            url: `${buildAttendanceUrl(filters)}limit=${PAGE_SIZE}&include_total=true`,
             type: 'GET',
             success: function(response) {
                 if (response.success) {
                     // 데이터 캐싱 (record_id 기반)
                     cachedData = response.records;
+                    nextCursor = response.next_cursor;
+                    totalCount = response.total;
                     
                     displayAttendanceData(response.records);
-                    updateStatus(`${response.total}개의 기록이 로드되었습니다.`, 'success');
+                    updateStatus(`${response.total}개 중 ${cachedData.length}개의 기록이 로드되었습니다.`, 'success');
                 } else {
                     $attendanceTableBody.empty();
                     $emptyMessage.show();
+                    $loadMoreBtn.hide();
                     updateStatus('데이터 로드 실패', 'error');
                 }
             },
@@ -197,18 +215,53 @@ $(document).ready(function() {
                 console.error('Error loading data:', error);
                 $attendanceTableBody.empty();
                 $emptyMessage.show();
+                $loadMoreBtn.hide();
                 updateStatus('데이터 로드 중 오류가 발생했습니다.', 'error');
             }
         });
     }
     
-    // 데이터 표시 함수
-    function displayAttendanceData(records) {
-        $attendanceTableBody.empty();
+    // 다음 페이지 로드 함수 (현재 필터 + 커서)
+    function loadMoreAttendanceData() {
+        if (!nextCursor) return;
+        
+        updateStatus('다음 기록 로드 중...', 'info');
+        $loadMoreBtn.prop('disabled', true);
+        
+        $.ajax({
+            url: `${buildAttendanceUrl(currentFilters)}limit=${PAGE_SIZE}&cursor=${encodeURIComponent(nextCursor)}`,
+            type: 'GET',
+            success: function(response) {
+                if (response.success) {
+                    cachedData = cachedData.concat(response.records);
+                    nextCursor = response.next_cursor;
+                    
+                    displayAttendanceData(response.records, true);
+                    updateStatus(`${totalCount}개 중 ${cachedData.length}개의 기록이 로드되었습니다.`, 'success');
+                } else {
+                    updateStatus('데이터 로드 실패', 'error');
+                }
+            },
+            error: function(xhr, status, error) {
+                console.error('Error loading more data:', error);
+                updateStatus('데이터 로드 중 오류가 발생했습니다.', 'error');
+            },
+            complete: function() {
+                $loadMoreBtn.prop('disabled', false);
+            }
+        });
+    }
+    
+    // 데이터 표시 함수 (append가 true면 기존 목록 뒤에 추가)
+    function displayAttendanceData(records, append = false) {
+        if (!append) {
+            $attendanceTableBody.empty();
+        }
+        $loadMoreBtn.toggle(Boolean(nextCursor));
         
         if (records && records.length > 0) {
             $emptyMessage.hide();
-            $recordsCount.text(records.length);
+            $recordsCount.text(totalCount);
             
             // 각 기록을 테이블에 추가
             records.forEach(function(record) {
@@ -241,7 +294,7 @@ $(document).ready(function() {
                 
                 $attendanceTableBody.append(row);
             });
-        } else {
+        } else if (!append) {
             $emptyMessage.show();
             $recordsCount.text(0);
         }
@@ -333,61 +386,31 @@ $(document).ready(function() {
     function exportToCSV() {
         updateStatus('CSV 파일 생성 중...', 'info');
         
-        // API URL 생성
-        let apiUrl = `${API_URL}/api/attendance?`;
-        
-        // 현재 필터 파라미터 추가
-        if (currentFilters.name) apiUrl += `name=${encodeURIComponent(currentFilters.name)}&`;
-        if (currentFilters.department) apiUrl += `department=${encodeURIComponent(currentFilters.department)}&`;
-        if (currentFilters.position) apiUrl += `position=${encodeURIComponent(currentFilters.position)}&`;
-        if (currentFilters.employeeId) apiUrl += `employeeId=${encodeURIComponent(currentFilters.employeeId)}&`;
-        if (currentFilters.start_date) apiUrl += `start_date=${encodeURIComponent(currentFilters.start_date)}&`;
-        if (currentFilters.end_date) apiUrl += `end_date=${encodeURIComponent(currentFilters.end_date)}&`;
-        if (currentFilters.tag) apiUrl += `tag=${encodeURIComponent(currentFilters.tag)}`;
-        
-        // API 호출
+        // 내보낼 기록이 있는지 한 건만 먼저 조회
         $.ajax({
-            url: apiUrl,
+            url: `${buildAttendanceUrl(currentFilters)}limit=1`,
             type: 'GET',
             success: function(response) {
-                if (response.success && response.records.length > 0) {
-                    // CSV 헤더 (부서, 직책, 사번 추가)
-                    let csvContent = "이름,부서,직급,사번,날짜,시간,태그\n";
-                    
-                    // CSV 데이터 추가
-                    response.records.forEach(function(record) {
-                        // 안전하게 값 처리
-                        const name = record.name || '';
-                        const department = record.department || '';
-                        const position = record.position || '';
-                        const employeeId = record.employeeId || '';
-                        const date = record.date || '';
-                        const time = record.time || '';
-                        const tag = record.tag || '미지정';
-                        
-                        // CSV에 안전하게 값 추가 (쉼표, 줄바꿈 등 이스케이프)
-                        csvContent += `"${name.replace(/"/g, '""')}","${department.replace(/"/g, '""')}","${position.replace(/"/g, '""')}","${employeeId.replace(/"/g, '""')}","${date.replace(/"/g, '""')}","${time.replace(/"/g, '""')}","${tag.replace(/"/g, '""')}"\n`;
-                    });
-                    
-                    // CSV 파일 다운로드
-                    const blob = new Blob([csvContent], { type: 'text/csv;charset=utf-8;' });
-                    const link = document.createElement("a");
-                    const url = URL.createObjectURL(blob);
-                    
-                    const now = new Date();
-                    const fileName = `출퇴근기록_${formatDateForFileName(now)}.csv`;
-                    
-                    link.setAttribute("href", url);
-                    link.setAttribute("download", fileName);
-                    link.style.visibility = 'hidden';
-                    document.body.appendChild(link);
-                    link.click();
-                    document.body.removeChild(link);
-                    
-                    updateStatus('CSV 파일 다운로드 완료', 'success');
-                } else {
+                if (!response.success || response.records.length === 0) {
                     updateStatus('내보낼 데이터가 없습니다.', 'warning');
+                    return;
                 }
+                
+                // 서버가 현재 필터의 전체 기록을 CSV로 스트리밍 (브라우저가 바로 파일로 저장)
+                const exportUrl = `${buildAttendanceUrl(currentFilters, '/api/attendance/export')}format=csv`;
+                
+                const link = document.createElement("a");
+                const now = new Date();
+                const fileName = `출퇴근기록_${formatDateForFileName(now)}.csv`;
+                
+                link.setAttribute("href", exportUrl);
+                link.setAttribute("download", fileName);
+                link.style.visibility = 'hidden';
+                document.body.appendChild(link);
+                link.click();
+                document.body.removeChild(link);
+                
+                updateStatus('CSV 파일 다운로드 완료', 'success');
             },
             error: function(xhr, status, error) {
                 console.error('Error exporting data:', error);
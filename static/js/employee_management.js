@@ -484,7 +484,8 @@ $(document).ready(function() {
     function showFaceModal(face) {
         currentFaceId = face.id;
         $('#faceModalTitle').text(`얼굴 이미지 - ${currentEmployee ? currentEmployee.name : '직원'}`);
-        $('#faceModalImage').attr('src', `data:image/jpeg;base64,${face.image_base64}`);
+        // 확대보기는 썸네일 대신 원본 이미지 사용
+        $('#faceModalImage').attr('src', `${API_URL}/api/faces/${face.id}/image`);
         $faceModal.removeClass('hidden');
         
         // 배경 스크롤 방지
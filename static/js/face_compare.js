@@ -38,18 +38,140 @@ var isComparingFace = false;
 var selectedCandidate = null;
 // 캡처된 원본 이미지 데이터 (후보자 선택 시 얼굴 등록에 사용)
 var capturedOriginalImage = null;
+// 비교 응답의 probe_token (출근 확정 시 서버가 비교 때 계산한 임베딩으로 얼굴 등록)
+var capturedProbeToken = null;
 
 // --- 설정 값 ---
 // 얼굴 영역이 전체 프레임의 최소 몇 %를 차지해야 충분히 크다고 판단할지
 const MIN_FACE_RATIO = 0.1;
 // API 전송 시 이미지 크기 축소 비율
 const IMAGE_SCALE_FACTOR = 0.5;
+// 감지와 비교를 한 번의 요청으로 처리하는 /api/identify-face 사용 여부
+// (false면 /api/detect-face로 감지 후 잘라낸 얼굴을 /api/compare-face로 다시 전송)
+const USE_IDENTIFY_ENDPOINT = true;
+// 프레임을 canvas.toBlob() JPEG 바이너리로 전송할지 여부 (false면 Base64 문자열을 JSON으로 전송)
+const USE_BINARY_UPLOAD = true;
+// 프레임마다 HTTP 요청 대신 WebSocket(/ws/kiosk)으로 프레임을 계속 보내고 결과를 받을지 여부
+// (서버는 처리 중에 들어온 프레임 중 가장 최근 것만 처리)
+const USE_WEBSOCKET_STREAM = true;
+// WebSocket 스트리밍 시 프레임 전송 최소 간격(ms)
+const STREAM_FRAME_INTERVAL_MS = 100;
+
+// 서버의 얼굴 추적기를 구분하는 키오스크 세션 ID (HTTP 요청 시 사용, WebSocket은 연결별로 추적)
+const KIOSK_SESSION_ID = `${Date.now().toString(36)}-${Math.random().toString(36).slice(2, 10)}`;
+
+// 키오스크 WebSocket 연결 및 마지막 프레임 전송 시각
+var kioskSocket = null;
+var lastStreamFrameAt = 0;
 
 function getAttendanceTypeFromURL() {
     const urlParams = new URLSearchParams(window.location.search);
     return urlParams.get('type') || 'checkin'; // 기본값은 출근
 }
 
+// 캔버스를 JPEG Blob으로 변환
+function canvasToBlob(canvas, quality) {
+    return new Promise((resolve, reject) => {
+        canvas.toBlob(blob => {
+            if (blob) {
+                resolve(blob);
+            } else {
+                reject(new Error("캔버스 이미지를 변환할 수 없습니다."));
+            }
+        }, 'image/jpeg', quality);
+    });
+}
+
+// 캔버스에 그린 프레임을 얼굴 감지(또는 감지+비교) API로 전송
+function sendFrame() {
+    const endpoint = USE_IDENTIFY_ENDPOINT ? '/api/identify-face' : '/api/detect-face';
+
+    if (USE_BINARY_UPLOAD) {
+        // JPEG 바이트를 그대로 전송 (Base64 인코딩/JSON 파싱 없음)
+        return canvasToBlob(hiddenCanvas, 0.8).then(blob => fetch(`${endpoint}/raw?min_face_ratio=${MIN_FACE_RATIO}&session_id=${KIOSK_SESSION_ID}`, {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'image/jpeg'
+            },
+            body: blob
+        }));
+    }
+
+    // 캔버스 이미지 데이터를 JPEG Base64 문자열로 가져옵니다.
+    const imageData = hiddenCanvas.toDataURL('image/jpeg', 0.8).split(',')[1];
+    return fetch(endpoint, {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json'
+        },
+        body: JSON.stringify({ image: imageData, min_face_ratio: MIN_FACE_RATIO, session_id: KIOSK_SESSION_ID })
+    });
+}
+
+// 키오스크 WebSocket 연결 (끊어지면 다음 프레임에서 다시 연결)
+function connectKioskSocket() {
+    const protocol = window.location.protocol === 'https:' ? 'wss' : 'ws';
+    const socket = new WebSocket(`${protocol}://${window.location.host}/ws/kiosk?min_face_ratio=${MIN_FACE_RATIO}`);
+
+    socket.onmessage = event => handleStreamMessage(JSON.parse(event.data));
+    socket.onerror = error => console.error("Kiosk stream error:", error);
+    socket.onclose = () => {
+        console.log("Kiosk stream closed.");
+        if (kioskSocket === socket) {
+            kioskSocket = null;
+        }
+    };
+
+    kioskSocket = socket;
+}
+
+// 지금 프레임을 스트리밍으로 보낼 수 있는지 (연결됨, 전송 버퍼 비어 있음, 최소 간격 경과)
+function canStreamFrame() {
+    if (!kioskSocket) {
+        connectKioskSocket();
+        return false;
+    }
+    return kioskSocket.readyState === WebSocket.OPEN &&
+        kioskSocket.bufferedAmount === 0 &&
+        performance.now() - lastStreamFrameAt >= STREAM_FRAME_INTERVAL_MS;
+}
+
+// 캔버스에 그린 프레임을 WebSocket으로 전송 (결과는 handleStreamMessage에서 처리)
+function streamFrame() {
+    lastStreamFrameAt = performance.now();
+
+    canvasToBlob(hiddenCanvas, 0.8)
+        .then(blob => {
+            if (kioskSocket && kioskSocket.readyState === WebSocket.OPEN && !isComparingFace) {
+                kioskSocket.send(blob);
+            }
+        })
+        .catch(error => console.error("Frame encoding failed:", error))
+        .finally(() => {
+            isProcessing = false;
+            if (!isComparingFace && streamVideo) {
+                requestAnimationFrame(captureFrameAndSend);
+            }
+        });
+}
+
+// WebSocket으로 받은 감지/인식 결과 처리
+function handleStreamMessage(message) {
+    // 비교 결과를 표시 중이거나 카메라가 꺼진 뒤 도착한 결과는 무시
+    if (isComparingFace || !streamVideo) {
+        return;
+    }
+
+    if (message.type === 'result') {
+        handleDetectionResponse(message, hiddenCanvas.width, hiddenCanvas.height);
+    } else if (message.type === 'busy') {
+        console.log("Server busy, frame skipped:", message.message);
+    } else if (message.type === 'error' && errorStatusElement) {
+        errorStatusElement.textContent = `스트리밍 오류: ${message.message}`;
+        errorStatusElement.className = 'status-error';
+    }
+}
+
 // 비디오의 현재 프레임을 캡처하여 얼굴 감지 API로 전송
 function captureFrameAndSend() {
     // 비디오가 준비되지 않았거나, 이미 처리 중이거나, 비교 작업 중이면 함수 종료
@@ -90,6 +212,13 @@ function captureFrameAndSend() {
         return;
     }
 
+    // 스트리밍 모드에서는 보낼 수 있을 때만 프레임을 캡처
+    if (USE_WEBSOCKET_STREAM && !canStreamFrame()) {
+        isProcessing = false;
+        requestAnimationFrame(captureFrameAndSend);
+        return;
+    }
+
     // 캔버스 크기를 비디오의 실제 크기에 맞춰 그릴 크기로 조절
     const drawWidth = cameraView.videoWidth * IMAGE_SCALE_FACTOR;
     const drawHeight = cameraView.videoHeight * IMAGE_SCALE_FACTOR;
@@ -100,17 +229,13 @@ function captureFrameAndSend() {
     // 현재 비디오 프레임을 캔버스에 그립니다.
     ctx.drawImage(cameraView, 0, 0, drawWidth, drawHeight);
 
-    // 캔버스 이미지 데이터를 JPEG Base64 문자열로 가져옵니다.
-    const imageData = hiddenCanvas.toDataURL('image/jpeg', 0.8).split(',')[1];
+    if (USE_WEBSOCKET_STREAM) {
+        streamFrame();
+        return;
+    }
 
-    // 얼굴 감지 API로 데이터 전송
-    fetch('/api/detect-face', {
-        method: 'POST',
-        headers: {
-            'Content-Type': 'application/json'
-        },
-        body: JSON.stringify({ image: imageData })
-    })
+    // 얼굴 감지(또는 감지+비교) API로 데이터 전송
+    sendFrame()
     .then(response => {
         // HTTP 오류 처리
         if (!response.ok) {
@@ -125,164 +250,192 @@ function captureFrameAndSend() {
         }
         return response.json();
     })
-    .then(data => {
-        // 얼굴 감지 API 응답 처리
+    .then(data => handleDetectionResponse(data, drawWidth, drawHeight))
+    .catch(error => {
+        // 얼굴 감지 API 요청 실패
+        console.error("Detect API request failed:", error);
         if(errorStatusElement) {
-            errorStatusElement.textContent = '';
-            errorStatusElement.className = '';
+            errorStatusElement.textContent = `감지 API 통신 오류: ${error.message}`;
+            errorStatusElement.className = 'status-error';
         }
+        if (faceDetectionStatusElement) {
+            faceDetectionStatusElement.textContent = '얼굴 크기: -';
+            faceDetectionStatusElement.className = 'status-normal';
+        }
+        if (recognitionStatusElement) {
+            recognitionStatusElement.textContent = '얼굴을 카메라에 비춰주세요...';
+            recognitionStatusElement.className = 'status-waiting';
+        }
+    })
+    .finally(() => {
+        isProcessing = false; // 프레임 처리 완료 플래그 해제
 
-        if (data && data.success === true) {
-            if (data.face_detected === true && data.face_area) {
-                // 얼굴 감지 성공 및 얼굴 영역 데이터 존재
+        // 비교 작업 중이 아니고 카메라가 켜져 있으면 다음 프레임 예약
+        if (!isComparingFace && streamVideo) {
+            requestAnimationFrame(captureFrameAndSend);
+        }
+    });
+}
+
+// 얼굴 감지(또는 identify-face) 응답 처리 - 얼굴 크기 확인 후 비교 시작
+function handleDetectionResponse(data, drawWidth, drawHeight) {
+    // 얼굴 감지 API 응답 처리
+    if(errorStatusElement) {
+        errorStatusElement.textContent = '';
+        errorStatusElement.className = '';
+    }
 
-                // 얼굴 크기 계산 (프레임 대비 얼굴 영역 비율)
-                const frameArea = drawWidth * drawHeight;
-                const faceArea = data.face_area.width * data.face_area.height;
-                let currentFaceRatio = frameArea > 0 ? faceArea / frameArea : 0;
+    if (data && data.success === true) {
+        if (data.face_detected === true && data.face_area) {
+            // 얼굴 감지 성공 및 얼굴 영역 데이터 존재
 
-                // 비율을 퍼센트로 변환
-                const ratioPercent = Math.round(currentFaceRatio * 100);
+            // 얼굴 크기 계산 (프레임 대비 얼굴 영역 비율)
+            const frameArea = drawWidth * drawHeight;
+            const faceArea = data.face_area.width * data.face_area.height;
+            let currentFaceRatio = frameArea > 0 ? faceArea / frameArea : 0;
 
-                // 얼굴 크기에 따라 상태 메시지 클래스 결정
-                let ratioClass = 'face-ratio-low';
-                let ratioMessage = `얼굴 크기: <span class="${ratioClass}">${ratioPercent}%</span> (작음)`;
+            // 비율을 퍼센트로 변환
+            const ratioPercent = Math.round(currentFaceRatio * 100);
+
+            // 얼굴 크기에 따라 상태 메시지 클래스 결정
+            let ratioClass = 'face-ratio-low';
+            let ratioMessage = `얼굴 크기: <span class="${ratioClass}">${ratioPercent}%</span> (작음)`;
+            if (recognitionStatusElement) {
+                recognitionStatusElement.textContent = '얼굴을 더 가까이 비춰주세요.';
+                recognitionStatusElement.className = 'status-waiting';
+            }
+
+            if (currentFaceRatio >= MIN_FACE_RATIO) {
+                ratioClass = 'face-ratio-high';
+                ratioMessage = `얼굴 크기: <span class="${ratioClass}">${ratioPercent}%</span> (충분함)`;
+            
                 if (recognitionStatusElement) {
-                    recognitionStatusElement.textContent = '얼굴을 더 가까이 비춰주세요.';
-                    recognitionStatusElement.className = 'status-waiting';
+                    recognitionStatusElement.textContent = '얼굴 크기 확인 완료. 인식 시작...';
+                    recognitionStatusElement.className = 'status-success';
                 }
-
-                if (currentFaceRatio >= MIN_FACE_RATIO) {
-                    ratioClass = 'face-ratio-high';
-                    ratioMessage = `얼굴 크기: <span class="${ratioClass}">${ratioPercent}%</span> (충분함)`;
+            
+                // 얼굴 영역 데이터 추출
+                const faceArea = data.face_area;
+                // 얼굴 영역 여백을 약간 추가하기 위해 20% 더 크게 추출
+                const margin = 0.2;
                 
-                    if (recognitionStatusElement) {
-                        recognitionStatusElement.textContent = '얼굴 크기 확인 완료. 인식 시작...';
-                        recognitionStatusElement.className = 'status-success';
-                    }
+                // 여백을 추가한 얼굴 영역 계산
+                let faceX = Math.max(0, faceArea.x - faceArea.width * margin);
+                let faceY = Math.max(0, faceArea.y - faceArea.height * margin);
+                let faceWidth = Math.min(drawWidth - faceX, faceArea.width * (1 + margin * 2));
+                let faceHeight = Math.min(drawHeight - faceY, faceArea.height * (1 + margin * 2));
                 
-                    // 얼굴 영역 데이터 추출
-                    const faceArea = data.face_area;
-                    // 얼굴 영역 여백을 약간 추가하기 위해 20% 더 크게 추출
-                    const margin = 0.2;
-                    
-                    // 여백을 추가한 얼굴 영역 계산
-                    let faceX = Math.max(0, faceArea.x - faceArea.width * margin);
-                    let faceY = Math.max(0, faceArea.y - faceArea.height * margin);
-                    let faceWidth = Math.min(drawWidth - faceX, faceArea.width * (1 + margin * 2));
-                    let faceHeight = Math.min(drawHeight - faceY, faceArea.height * (1 + margin * 2));
-                    
-                    // 얼굴 영역 추출을 위한 새 캔버스 생성
-                    const faceCanvas = document.createElement('canvas');
-                    const faceCtx = faceCanvas.getContext('2d');
-                    
-                    // 얼굴 영역 캔버스 크기 설정
-                    faceCanvas.width = faceWidth;
-                    faceCanvas.height = faceHeight;
-                    
-                    // 원본 이미지에서 얼굴 영역만 새 캔버스에 그림
-                    faceCtx.drawImage(
-                        hiddenCanvas, 
-                        faceX, faceY, faceWidth, faceHeight,
-                        0, 0, faceWidth, faceHeight
-                    );
-                    
-                    // 압축 비율 적용
-                    const compressCanvas = document.createElement('canvas');
-                    const compressCtx = compressCanvas.getContext('2d');
-                    compressCanvas.width = faceWidth * IMAGE_SCALE_FACTOR;
-                    compressCanvas.height = faceHeight * IMAGE_SCALE_FACTOR;
-                    
-                    // 얼굴 이미지를 압축 캔버스에 그림
-                    compressCtx.drawImage(
-                        faceCanvas,
-                        0, 0, faceWidth, faceHeight,
-                        0, 0, compressCanvas.width, compressCanvas.height
-                    );
-
-                    // 압축된 얼굴 이미지 데이터를 Base64 문자열로 변환
-                    const faceImageData = compressCanvas.toDataURL('image/jpeg', 0.8).split(',')[1];
-                    
-                    // 원본 이미지 저장 (후보자 선택 시 얼굴 등록에 사용)
-                    capturedOriginalImage = faceImageData;
-                    
-                    // 비교 시작
-                    isComparingFace = true;
-                    performFaceComparison(faceImageData, ratioPercent);
-                } else if (currentFaceRatio >= MIN_FACE_RATIO * 0.7) {
-                    ratioClass = 'face-ratio-medium';
-                    ratioMessage = `얼굴 크기: <span class="${ratioClass}">${ratioPercent}%</span> (중간)`;
-                    if (recognitionStatusElement) {
-                        recognitionStatusElement.textContent = '조금 더 가까이 다가와주세요.';
-                        recognitionStatusElement.className = 'status-waiting';
+                // 얼굴 영역 추출을 위한 새 캔버스 생성
+                const faceCanvas = document.createElement('canvas');
+                const faceCtx = faceCanvas.getContext('2d');
+                
+                // 얼굴 영역 캔버스 크기 설정
+                faceCanvas.width = faceWidth;
+                faceCanvas.height = faceHeight;
+                
+                // 원본 이미지에서 얼굴 영역만 새 캔버스에 그림
+                faceCtx.drawImage(
+                    hiddenCanvas, 
+                    faceX, faceY, faceWidth, faceHeight,
+                    0, 0, faceWidth, faceHeight
+                );
+                
+                // 압축 비율 적용
+                const compressCanvas = document.createElement('canvas');
+                const compressCtx = compressCanvas.getContext('2d');
+                compressCanvas.width = faceWidth * IMAGE_SCALE_FACTOR;
+                compressCanvas.height = faceHeight * IMAGE_SCALE_FACTOR;
+                
+                // 얼굴 이미지를 압축 캔버스에 그림
+                compressCtx.drawImage(
+                    faceCanvas,
+                    0, 0, faceWidth, faceHeight,
+                    0, 0, compressCanvas.width, compressCanvas.height
+                );
+
+                // 압축된 얼굴 이미지 데이터를 Base64 문자열로 변환
+                const faceImageData = compressCanvas.toDataURL('image/jpeg', 0.8).split(',')[1];
+
+                // 감지 결과(얼굴 영역, 눈 위치)를 잘라낸 이미지 좌표로 변환 (서버가 재감지 없이 정렬)
+                const scaleX = compressCanvas.width / faceWidth;
+                const scaleY = compressCanvas.height / faceHeight;
+                const faceHint = {
+                    face_area: {
+                        x: (faceArea.x - faceX) * scaleX,
+                        y: (faceArea.y - faceY) * scaleY,
+                        width: faceArea.width * scaleX,
+                        height: faceArea.height * scaleY
+                    },
+                    landmarks: null
+                };
+                if (data.landmarks) {
+                    faceHint.landmarks = {};
+                    for (const [eye, point] of Object.entries(data.landmarks)) {
+                        faceHint.landmarks[eye] = [(point[0] - faceX) * scaleX, (point[1] - faceY) * scaleY];
                     }
+                }
+                
+                // 원본 이미지 저장 (후보자 선택 시 얼굴 등록에 사용)
+                // 스트리밍 모드에서는 캔버스가 이미 다음 프레임이므로 서버가 처리한 프레임에서 잘라낸 얼굴 사용
+                capturedOriginalImage = data.face_image || faceImageData;
+                
+                // 비교 시작
+                isComparingFace = true;
+                if (USE_IDENTIFY_ENDPOINT && data.identified === true) {
+                    // identify-face 응답에 비교 결과가 이미 포함되어 있음
+                    completeFaceComparison(data);
                 } else {
-                    ratioClass = 'face-ratio-low';
-                    ratioMessage = `얼굴 크기: <span class="${ratioClass}">${ratioPercent}%</span> (매우 작음)`;
-                    if (recognitionStatusElement) {
-                        recognitionStatusElement.textContent = '얼굴을 카메라 중앙에 크게 비춰주세요.';
-                        recognitionStatusElement.className = 'status-waiting';
-                    }
+                    performFaceComparison(faceImageData, ratioPercent, faceHint);
                 }
-
-                // 얼굴 감지 상태 메시지 업데이트
-                if (faceDetectionStatusElement) {
-                    faceDetectionStatusElement.innerHTML = ratioMessage;
-                    faceDetectionStatusElement.className = 'status-normal';
+            } else if (currentFaceRatio >= MIN_FACE_RATIO * 0.7) {
+                ratioClass = 'face-ratio-medium';
+                ratioMessage = `얼굴 크기: <span class="${ratioClass}">${ratioPercent}%</span> (중간)`;
+                if (recognitionStatusElement) {
+                    recognitionStatusElement.textContent = '조금 더 가까이 다가와주세요.';
+                    recognitionStatusElement.className = 'status-waiting';
                 }
-
             } else {
-                // 얼굴 미감지 시
-                if (faceDetectionStatusElement) {
-                    faceDetectionStatusElement.textContent = '얼굴 크기: -';
-                    faceDetectionStatusElement.className = 'status-normal';
-                }
+                ratioClass = 'face-ratio-low';
+                ratioMessage = `얼굴 크기: <span class="${ratioClass}">${ratioPercent}%</span> (매우 작음)`;
                 if (recognitionStatusElement) {
-                    recognitionStatusElement.textContent = '얼굴을 카메라에 비춰주세요...';
+                    recognitionStatusElement.textContent = '얼굴을 카메라 중앙에 크게 비춰주세요.';
                     recognitionStatusElement.className = 'status-waiting';
                 }
             }
+
+            // 얼굴 감지 상태 메시지 업데이트
+            if (faceDetectionStatusElement) {
+                faceDetectionStatusElement.innerHTML = ratioMessage;
+                faceDetectionStatusElement.className = 'status-normal';
+            }
+
         } else {
-            // API 응답 실패 시
-            console.error("Detect API returned success: false", data);
+            // 얼굴 미감지 시
             if (faceDetectionStatusElement) {
                 faceDetectionStatusElement.textContent = '얼굴 크기: -';
                 faceDetectionStatusElement.className = 'status-normal';
             }
             if (recognitionStatusElement) {
-                recognitionStatusElement.innerHTML = `감지 요청 실패: ${data?.message || '알 수 없는 오류'}`;
-                recognitionStatusElement.className = 'status-error';
+                recognitionStatusElement.textContent = '얼굴을 카메라에 비춰주세요...';
+                recognitionStatusElement.className = 'status-waiting';
             }
         }
-    })
-    .catch(error => {
-        // 얼굴 감지 API 요청 실패
-        console.error("Detect API request failed:", error);
-        if(errorStatusElement) {
-            errorStatusElement.textContent = `감지 API 통신 오류: ${error.message}`;
-            errorStatusElement.className = 'status-error';
-        }
+    } else {
+        // API 응답 실패 시
+        console.error("Detect API returned success: false", data);
         if (faceDetectionStatusElement) {
             faceDetectionStatusElement.textContent = '얼굴 크기: -';
             faceDetectionStatusElement.className = 'status-normal';
         }
         if (recognitionStatusElement) {
-            recognitionStatusElement.textContent = '얼굴을 카메라에 비춰주세요...';
-            recognitionStatusElement.className = 'status-waiting';
+            recognitionStatusElement.innerHTML = `감지 요청 실패: ${data?.message || '알 수 없는 오류'}`;
+            recognitionStatusElement.className = 'status-error';
         }
-    })
-    .finally(() => {
-        isProcessing = false; // 프레임 처리 완료 플래그 해제
-
-        // 비교 작업 중이 아니면 다음 프레임 예약
-        if (!isComparingFace) {
-            requestAnimationFrame(captureFrameAndSend);
-        }
-    });
+    }
 }
 
 // 얼굴 비교 API로 이미지 데이터를 전송하고 결과를 처리하는 함수
-async function performFaceComparison(faceImageData, finalFaceRatioPercent) {
+async function performFaceComparison(faceImageData, finalFaceRatioPercent, faceHint = null) {
     if (recognitionStatusElement) {
         recognitionStatusElement.textContent = '얼굴 인식 중...';
         recognitionStatusElement.className = 'status-waiting';
@@ -301,7 +454,9 @@ async function performFaceComparison(faceImageData, finalFaceRatioPercent) {
                'Content-Type': 'application/json'
            },
            body: JSON.stringify({ 
-               image: faceImageData
+               image: faceImageData,
+               face_area: faceHint ? faceHint.face_area : null,
+               landmarks: faceHint ? faceHint.landmarks : null
            })
        });
 
@@ -315,27 +470,7 @@ async function performFaceComparison(faceImageData, finalFaceRatioPercent) {
        const data = await response.json();
        console.log("Compare API Response:", data);
 
-       // 얼굴 비교 API 응답 처리
-       if (data && data.success === true) {
-           if (data.match_type === "high" && data.best_match) {
-               // 높은 유사도 (0.75 이상) - 단일 사용자 표시
-               handleHighConfidenceMatch(data.best_match);
-           } else if (data.match_type === "medium" && Array.isArray(data.candidates) && data.candidates.length > 0) {
-               // 중간 유사도 (0.6-0.75) - 후보자 목록 표시
-               handleMediumConfidenceMatches(data.candidates);
-           } else {
-               // 낮은 유사도 (0.6 미만) - 인식 실패
-               handleNoMatch("등록된 얼굴 중에 일치하는 얼굴을 찾지 못했습니다.");
-           }
-       } else {
-           // API 응답 실패 시
-           console.error("Compare API returned success: false", data);
-           if (recognitionStatusElement) {
-               recognitionStatusElement.innerHTML = `인식 요청 실패: ${data?.message || '알 수 없는 오류'}`;
-               recognitionStatusElement.className = 'status-error';
-           }
-           handleNoMatch(`인식 요청 처리 중 오류가 발생했습니다: ${data?.message || '알 수 없는 오류'}`);
-       }
+       handleComparisonResult(data);
     } catch (error) {
        console.error("Compare API request failed:", error);
        if(errorStatusElement) {
@@ -355,6 +490,44 @@ async function performFaceComparison(faceImageData, finalFaceRatioPercent) {
     }
 }
 
+// 얼굴 비교 결과 처리 (compare-face / identify-face 응답 공통)
+function handleComparisonResult(data) {
+    capturedProbeToken = (data && data.probe_token) || null;
+    if (data && data.success === true) {
+        if (data.match_type === "high" && data.best_match) {
+            // 높은 유사도 (0.75 이상) - 단일 사용자 표시
+            handleHighConfidenceMatch(data.best_match);
+        } else if (data.match_type === "medium" && Array.isArray(data.candidates) && data.candidates.length > 0) {
+            // 중간 유사도 (0.6-0.75) - 후보자 목록 표시
+            handleMediumConfidenceMatches(data.candidates);
+        } else {
+            // 낮은 유사도 (0.6 미만) - 인식 실패
+            handleNoMatch("등록된 얼굴 중에 일치하는 얼굴을 찾지 못했습니다.");
+        }
+    } else {
+        // API 응답 실패 시
+        console.error("Compare API returned success: false", data);
+        if (recognitionStatusElement) {
+            recognitionStatusElement.innerHTML = `인식 요청 실패: ${data?.message || '알 수 없는 오류'}`;
+            recognitionStatusElement.className = 'status-error';
+        }
+        handleNoMatch(`인식 요청 처리 중 오류가 발생했습니다: ${data?.message || '알 수 없는 오류'}`);
+    }
+}
+
+// identify-face 응답으로 바로 비교 결과를 처리하고 카메라 종료
+function completeFaceComparison(data) {
+    console.log("Identify API Response:", data);
+    try {
+        handleComparisonResult(data);
+    } finally {
+        isComparingFace = false;
+        isProcessing = false;
+        // 카메라 스트림 종료
+        closeCamera();
+    }
+}
+
 // 높은 유사도(0.75 이상) 매치 처리
 function handleHighConfidenceMatch(matchData) {
     if (recognitionStatusElement) { 
@@ -594,6 +767,8 @@ async function handleAttendanceRegistration(personName, registerNewFace) {
         // 새 얼굴 등록이 필요한 경우 - 선택된 사용자의 정보와 함께 전송
         if (registerNewFace && capturedOriginalImage && selectedCandidate) {
             attendanceData.image = capturedOriginalImage;
+            // 토큰이 유효하면 서버는 이미지를 다시 처리하지 않음 (만료 시 이미지로 대체)
+            attendanceData.probe_token = capturedProbeToken;
             attendanceData.userInfo = {
                 department: selectedCandidate.department || '',
                 position: selectedCandidate.position || '',
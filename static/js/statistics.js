@@ -171,7 +171,7 @@ $(document).ready(function() {
         updateStatus('통계 생성 중...', 'info');
         
         try {
-            // API 호출하여 데이터 가져오기
+            // 서버에서 집계한 통계만 가져옴 (원본 기록은 내려받지 않음)
             const filters = {
                 start_date: startDate,
                 end_date: endDate
@@ -183,15 +183,13 @@ $(document).ready(function() {
                 filters.department = department;
             }
             
-            const response = await fetchAttendanceData(filters);
+            const response = await fetchStatistics(statsType, filters);
             
             if (response.success) {
-                const records = response.records;
+                // 통계 표시
+                generateStatsForType(statsType, response);
                 
-                // 통계 생성
-                await generateStatsForType(statsType, records);
-                
-                updateStatus(`통계가 성공적으로 생성되었습니다. (${records.length}개 기록 분석)`, 'success');
+                updateStatus(`통계가 성공적으로 생성되었습니다. (${response.summary.records}개 기록 분석)`, 'success');
             } else {
                 updateStatus('통계 데이터를 가져오는데 실패했습니다.', 'error');
             }
@@ -201,8 +199,8 @@ $(document).ready(function() {
         }
     }
     
-    async function fetchAttendanceData(filters) {
-        let apiUrl = `${API_URL}/api/attendance?`;
+    async function fetchStatistics(statsType, filters) {
+        let apiUrl = `${API_URL}/api/statistics/${statsType}?`;
         
         // 필터 파라미터 추가
         if (filters.name) apiUrl += `name=${encodeURIComponent(filters.name)}&`;
@@ -218,174 +216,85 @@ $(document).ready(function() {
         return response;
     }
     
-    async function generateStatsForType(statsType, records) {
+    function generateStatsForType(statsType, stats) {
         $statsEmptyMessage.hide();
         
         switch (statsType) {
             case 'daily':
-                await generateDailyStats(records);
+                generateDailyStats(stats);
                 break;
             case 'personal':
-                await generatePersonalStats(records);
+                generatePersonalStats(stats);
                 break;
             case 'department':
-                await generateDepartmentStats(records);
+                generateDepartmentStats(stats);
                 break;
         }
     }
     
-    async function generateDailyStats(records) {
-        // 일자별 데이터 집계
+    // 태그별 수와 인원 수를 차트/테이블에서 쓰는 형태로 ({출근: 3, ..., employees: 2})
+    function toTagData(item) {
+        return Object.assign({}, item.tags, { employees: item.employees });
+    }
+    
+    function generateDailyStats(stats) {
+        // 일자별 데이터
         const dailyData = {};
-        const tagCounts = {};
-        const uniqueEmployees = new Set();
-        const timeDistribution = Array(24).fill(0); // 시간대별 분포 (0-23시)
-        
-        records.forEach(record => {
-            const date = record.date;
-            
-            if (!dailyData[date]) {
-                dailyData[date] = {
-                    출근: 0,
-                    지각: 0,
-                    퇴근: 0,
-                    외근: 0,
-                    반차: 0,
-                    미지정: 0,
-                    employees: new Set()
-                };
-            }
-            
-            dailyData[date].employees.add(record.name);
-            uniqueEmployees.add(record.name);
-            
-            const tag = record.tag || '미지정';
-            dailyData[date][tag]++;
-            tagCounts[tag] = (tagCounts[tag] || 0) + 1;
-            
-            // 시간대별 분포 계산 (출근 관련 태그만)
-            if (tag === '출근' || tag === '지각') {
-                const hour = parseInt(record.time.split(':')[0]);
-                if (hour >= 0 && hour < 24) {
-                    timeDistribution[hour]++;
-                }
-            }
+        stats.days.forEach(day => {
+            dailyData[day.date] = toTagData(day);
         });
         
         // 요약 카드 업데이트
-        updateSummaryCards(tagCounts, uniqueEmployees.size);
+        updateSummaryCards(stats.summary.tag_counts, stats.summary.employees);
         
         // 차트 생성
         createDailyChart(dailyData);
-        createTimeDistributionChart(timeDistribution);
+        createTimeDistributionChart(stats.time_distribution);
         
         // 테이블 생성
         createDailyTable(dailyData);
     }
     
-    async function generatePersonalStats(records) {
-        if (records.length === 0) {
+    function generatePersonalStats(stats) {
+        if (stats.summary.records === 0) {
             updateStatus('해당 직원의 출퇴근 기록이 없습니다.', 'warning');
             return;
         }
         
-        const tagCounts = {};
-        const dailyData = {};
-        let personalInfo = null;
-        const timeDistribution = Array(24).fill(0);
-        const workTimes = []; // 출근 시간 계산용
-        
-        records.forEach(record => {
-            const tag = record.tag || '미지정';
-            tagCounts[tag] = (tagCounts[tag] || 0) + 1;
-            
-            const date = record.date;
-            if (!dailyData[date]) {
-                dailyData[date] = [];
-            }
-            dailyData[date].push(record);
-            
-            if (!personalInfo) {
-                personalInfo = {
-                    name: record.name,
-                    department: record.department || '-',
-                    position: record.position || '-',
-                    employeeId: record.employeeId || '-'
-                };
-            }
-            
-            // 출근 시간 분포 및 평균 계산
-            if (tag === '출근' || tag === '지각') {
-                const hour = parseInt(record.time.split(':')[0]);
-                if (hour >= 0 && hour < 24) {
-                    timeDistribution[hour]++;
-                }
-                
-                // 시간을 분으로 변환하여 평균 계산
-                const [h, m, s] = record.time.split(':').map(Number);
-                const totalMinutes = h * 60 + m;
-                workTimes.push(totalMinutes);
-            }
-        });
+        const personalInfo = {
+            name: stats.employee.name,
+            department: stats.employee.department || '-',
+            position: stats.employee.position || '-',
+            employeeId: stats.employee.employeeId || '-'
+        };
         
         // 요약 카드 업데이트
-        updateSummaryCards(tagCounts, 1);
+        updateSummaryCards(stats.summary.tag_counts, 1);
         
         // 개인 상세 정보 업데이트
-        updatePersonalDetails(personalInfo, records, tagCounts, workTimes);
+        updatePersonalDetails(personalInfo, stats);
         
         // 차트 생성
-        createPersonalChart(dailyData);
-        createTimeDistributionChart(timeDistribution);
+        createPersonalChart(stats.days);
+        createTimeDistributionChart(stats.time_distribution);
         
         // 테이블 생성
-        createPersonalTable(dailyData);
+        createPersonalTable(stats.days);
     }
     
-    async function generateDepartmentStats(records) {
-        // 부서별 데이터 집계
+    function generateDepartmentStats(stats) {
+        // 부서별 데이터
         const departmentData = {};
-        const tagCounts = {};
-        const uniqueEmployees = new Set();
-        const timeDistribution = Array(24).fill(0);
-        
-        records.forEach(record => {
-            const dept = record.department || '미지정';
-            
-            if (!departmentData[dept]) {
-                departmentData[dept] = {
-                    출근: 0,
-                    지각: 0,
-                    퇴근: 0,
-                    외근: 0,
-                    반차: 0,
-                    미지정: 0,
-                    employees: new Set()
-                };
-            }
-            
-            departmentData[dept].employees.add(record.name);
-            uniqueEmployees.add(record.name);
-            
-            const tag = record.tag || '미지정';
-            departmentData[dept][tag]++;
-            tagCounts[tag] = (tagCounts[tag] || 0) + 1;
-            
-            // 시간대별 분포 계산
-            if (tag === '출근' || tag === '지각') {
-                const hour = parseInt(record.time.split(':')[0]);
-                if (hour >= 0 && hour < 24) {
-                    timeDistribution[hour]++;
-                }
-            }
+        stats.departments.forEach(dept => {
+            departmentData[dept.department] = toTagData(dept);
         });
         
         // 요약 카드 업데이트
-        updateSummaryCards(tagCounts, uniqueEmployees.size);
+        updateSummaryCards(stats.summary.tag_counts, stats.summary.employees);
         
         // 차트 생성
         createDepartmentChart(departmentData);
-        createTimeDistributionChart(timeDistribution);
+        createTimeDistributionChart(stats.time_distribution);
         
         // 테이블 생성
         createDepartmentTable(departmentData);
@@ -398,29 +307,18 @@ $(document).ready(function() {
         $clockOutCount.text(tagCounts['퇴근'] || 0);
     }
     
-    function updatePersonalDetails(personalInfo, records, tagCounts, workTimes) {
+    function updatePersonalDetails(personalInfo, stats) {
         $('#personalName').text(personalInfo.name);
         $('#personalDepartment').text(personalInfo.department);
         $('#personalPosition').text(personalInfo.position);
         $('#personalEmployeeId').text(personalInfo.employeeId);
         
-        const totalDays = Object.keys(groupByDate(records)).length;
-        const onTimeCount = tagCounts['출근'] || 0;
-        const lateCount = tagCounts['지각'] || 0;
-        
-        // 평균 출근 시간 계산
-        let avgTime = '-';
-        if (workTimes.length > 0) {
-            const avgMinutes = workTimes.reduce((sum, time) => sum + time, 0) / workTimes.length;
-            const hours = Math.floor(avgMinutes / 60);
-            const minutes = Math.round(avgMinutes % 60);
-            avgTime = `${hours.toString().padStart(2, '0')}:${minutes.toString().padStart(2, '0')}`;
-        }
+        const tagCounts = stats.summary.tag_counts;
         
-        $('#personalTotalDays').text(totalDays);
-        $('#personalOnTime').text(onTimeCount);
-        $('#personalLate').text(lateCount);
-        $('#personalAvgTime').text(avgTime);
+        $('#personalTotalDays').text(stats.total_days);
+        $('#personalOnTime').text(tagCounts['출근'] || 0);
+        $('#personalLate').text(tagCounts['지각'] || 0);
+        $('#personalAvgTime').text(stats.avg_checkin_time || '-');
         
         $personalDetailSection.show();
     }
@@ -484,15 +382,15 @@ $(document).ready(function() {
         });
     }
     
-    function createPersonalChart(dailyData) {
+    function createPersonalChart(days) {
         const ctx = document.getElementById('attendanceChart').getContext('2d');
         
         if (attendanceChart) {
             attendanceChart.destroy();
         }
         
-        const labels = Object.keys(dailyData).sort();
-        const recordCounts = labels.map(date => dailyData[date].length);
+        const labels = days.map(day => day.date);
+        const recordCounts = days.map(day => day.records);
         
         attendanceChart = new Chart(ctx, {
             type: 'line',
@@ -656,7 +554,7 @@ $(document).ready(function() {
         
         const rows = Object.keys(dailyData).sort().map(date => {
             const data = dailyData[date];
-            const total = data.employees.size;
+            const total = data.employees;
             
             return `
                 <tr>
@@ -675,7 +573,7 @@ $(document).ready(function() {
         $statsTableBody.html(rows.join(''));
     }
     
-    function createPersonalTable(dailyData) {
+    function createPersonalTable(days) {
         const headers = ['날짜', '기록 수', '첫 번째 기록', '마지막 기록', '태그'];
         
         $statsTableHead.html(`
@@ -684,19 +582,14 @@ $(document).ready(function() {
             </tr>
         `);
         
-        const rows = Object.keys(dailyData).sort().map(date => {
-            const records = dailyData[date].sort((a, b) => a.time.localeCompare(b.time));
-            const firstRecord = records[0];
-            const lastRecord = records[records.length - 1];
-            const tags = [...new Set(records.map(r => r.tag || '미지정'))];
-            
+        const rows = days.map(day => {
             return `
                 <tr>
-                    <td>${date}</td>
-                    <td>${records.length}</td>
-                    <td>${firstRecord.time}</td>
-                    <td>${lastRecord.time}</td>
-                    <td>${tags.map(tag => `<span class="tag-${tag}">${tag}</span>`).join(', ')}</td>
+                    <td>${day.date}</td>
+                    <td>${day.records}</td>
+                    <td>${day.first_time}</td>
+                    <td>${day.last_time}</td>
+                    <td>${day.tags.map(tag => `<span class="tag-${tag}">${tag}</span>`).join(', ')}</td>
                 </tr>
             `;
         });
@@ -719,7 +612,7 @@ $(document).ready(function() {
             return `
                 <tr>
                     <td>${dept}</td>
-                    <td class="stat-highlight">${data.employees.size}</td>
+                    <td class="stat-highlight">${data.employees}</td>
                     <td class="tag-출근">${data.출근}</td>
                     <td class="tag-지각">${data.지각}</td>
                     <td class="tag-퇴근">${data.퇴근}</td>
@@ -738,18 +631,6 @@ $(document).ready(function() {
         return date.toISOString().split('T')[0];
     }
     
-    function groupByDate(records) {
-        const grouped = {};
-        records.forEach(record => {
-            const date = record.date;
-            if (!grouped[date]) {
-                grouped[date] = [];
-            }
-            grouped[date].push(record);
-        });
-        return grouped;
-    }
-    
     function updateStatus(message, type = 'info') {
         $statusMessage.text(message);
         
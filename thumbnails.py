@@ -0,0 +1,104 @@
+# thumbnails.py - 등록 얼굴 썸네일 생성 및 캐시
+import os
+import base64
+import threading
+from collections import OrderedDict
+import cv2
+
+from config import THUMBNAIL_DIR, THUMBNAIL_MAX_SIZE, THUMBNAIL_JPEG_QUALITY, THUMBNAIL_CACHE_SIZE, create_path
+
+
+class ThumbnailCache:
+    """
+    encoding_id별 작은 JPEG 썸네일을 디스크에 한 번 만들어 두고 Base64 문자열을 LRU로 캐시
+
+    얼굴 저장 시 create()로 만들고, 조회 시에는 메모리 -> 디스크 -> 원본 이미지 순으로 찾는다.
+    """
+
+    def __init__(self, directory, max_size=200, quality=85, cache_size=512):
+        self.directory = directory
+        self.max_size = max_size
+        self.quality = quality
+        self.cache_size = cache_size
+        self.cache = OrderedDict()  # encoding_id -> Base64 문자열
+        self.lock = threading.Lock()
+
+        # 지표
+        self.hits = 0
+        self.disk_reads = 0
+        self.generated = 0
+
+    def path(self, encoding_id):
+        return create_path(self.directory, f"{int(encoding_id)}.jpg")
+
+    def _remember(self, encoding_id, img_base64):
+        with self.lock:
+            self.cache[int(encoding_id)] = img_base64
+            self.cache.move_to_end(int(encoding_id))
+            while len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+
+    def create(self, encoding_id, img):
+        """원본 이미지(BGR)로 썸네일을 만들어 저장하고 Base64 문자열 반환"""
+        h, w = img.shape[:2]
+        scale = min(1.0, self.max_size / max(h, w))
+        if scale < 1.0:
+            img = cv2.resize(img, (max(1, int(w * scale)), max(1, int(h * scale))), interpolation=cv2.INTER_AREA)
+
+        ok, buffer = cv2.imencode('.jpg', img, [cv2.IMWRITE_JPEG_QUALITY, self.quality])
+        if not ok:
+            return None
+
+        os.makedirs(self.directory, exist_ok=True)
+        with open(self.path(encoding_id), 'wb') as f:
+            f.write(buffer.tobytes())
+
+        img_base64 = base64.b64encode(buffer).decode('utf-8')
+        self._remember(encoding_id, img_base64)
+        self.generated += 1
+        return img_base64
+
+    def get_base64(self, encoding_id, image_path=None):
+        """썸네일 Base64 문자열 (없으면 원본 이미지로 생성, 원본도 없으면 None)"""
+        with self.lock:
+            img_base64 = self.cache.get(int(encoding_id))
+            if img_base64 is not None:
+                self.cache.move_to_end(int(encoding_id))
+                self.hits += 1
+                return img_base64
+
+        thumbnail_path = self.path(encoding_id)
+        if os.path.exists(thumbnail_path):
+            # 저장된 JPEG는 디코딩 없이 그대로 Base64로 변환
+            with open(thumbnail_path, 'rb') as f:
+                img_base64 = base64.b64encode(f.read()).decode('utf-8')
+            self._remember(encoding_id, img_base64)
+            self.disk_reads += 1
+            return img_base64
+
+        if image_path and os.path.exists(image_path):
+            img = cv2.imread(image_path)
+            if img is not None:
+                return self.create(encoding_id, img)
+        return None
+
+    def delete(self, encoding_id):
+        """썸네일 파일과 캐시 항목 삭제"""
+        with self.lock:
+            self.cache.pop(int(encoding_id), None)
+        thumbnail_path = self.path(encoding_id)
+        if os.path.exists(thumbnail_path):
+            os.remove(thumbnail_path)
+
+    def metrics(self):
+        with self.lock:
+            return {
+                "cached": len(self.cache),
+                "hits": self.hits,
+                "disk_reads": self.disk_reads,
+                "generated": self.generated
+            }
+
+
+# 프로세스 전역 썸네일 캐시
+thumbnail_cache = ThumbnailCache(THUMBNAIL_DIR, THUMBNAIL_MAX_SIZE, THUMBNAIL_JPEG_QUALITY, THUMBNAIL_CACHE_SIZE)
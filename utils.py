@@ -1,11 +1,23 @@
 import os
 import re
+import math
 import hashlib
 import pandas as pd
 import numpy as np
 import json
 import datetime
-from config import EMPLOYEES_CSV_PATH, FACE_ENCODINGS_CSV_PATH, ATTENDANCE_CSV_PATH, ATTENDANCE_TIMES
+from config import EMPLOYEES_CSV_PATH, FACE_ENCODINGS_CSV_PATH, ATTENDANCE_TIMES, STORAGE_BACKEND, SQLITE_DB_PATH
+from face_gallery import gallery_cache
+from embedding_store import embedding_store
+from attendance_log import attendance_log
+from attendance_index import attendance_index
+from attendance_partitions import attendance_partitions, month_range
+from attendance_rollups import attendance_rollups, daily_statistics, personal_statistics, department_statistics
+from sqlite_storage import SqliteStorage
+from thumbnails import thumbnail_cache
+
+# 저장소 백엔드 (STORAGE_BACKEND가 "sqlite"이면 SQLite, 아니면 CSV 파일 사용)
+sqlite_storage = SqliteStorage(SQLITE_DB_PATH) if STORAGE_BACKEND == "sqlite" else None
 
 def convert_to_python_types(obj):
     """numpy 타입을 Python 기본 타입으로 변환"""
@@ -24,11 +36,50 @@ def convert_to_python_types(obj):
     else:
         return obj
 
+def sanitize_json_values(data):
+    """JSON 직렬화 전에 안전한 값으로 변환 (NaN은 None, 무한대는 문자열)"""
+    if isinstance(data, dict):
+        return {k: sanitize_json_values(v) for k, v in data.items()}
+    elif isinstance(data, list):
+        return [sanitize_json_values(item) for item in data]
+    elif isinstance(data, np.integer):
+        return int(data)
+    elif isinstance(data, np.floating):
+        if np.isnan(data):
+            return None
+        elif np.isinf(data):
+            return str(data)
+        return float(data)
+    elif isinstance(data, np.ndarray):
+        return data.tolist()
+    elif isinstance(data, float):
+        if math.isnan(data):
+            return None
+        elif math.isinf(data):
+            return str(data)
+        return data
+    elif pd.isna(data):
+        return None
+    elif isinstance(data, (int, bool, str, type(None))):
+        return data
+    else:
+        # 기타 타입은 문자열로 변환
+        try:
+            return str(data)
+        except:
+            return None
+
 def init_csv_files():
     """모든 CSV 파일 초기화 함수"""
     init_employees_csv()
     init_face_encodings_csv()
     init_attendance_csv()
+    
+    # SQLite 백엔드 사용 시 스키마 생성 후 비어 있으면 기존 CSV 데이터를 한 번 가져옴
+    if sqlite_storage is not None:
+        sqlite_storage.init_schema()
+        if sqlite_storage.is_empty():
+            sqlite_storage.import_csv_files()
 
 def init_employees_csv():
     """직원 정보 CSV 파일 초기화"""
@@ -40,16 +91,38 @@ def init_employees_csv():
 def init_face_encodings_csv():
     """얼굴 벡터 CSV 파일 초기화"""
     if not os.path.exists(FACE_ENCODINGS_CSV_PATH):
-        df = pd.DataFrame(columns=['encoding_id', 'employee_id', 'image_path', 'encoding'])
+        df = pd.DataFrame(columns=['encoding_id', 'employee_id', 'image_path'])
         df.to_csv(FACE_ENCODINGS_CSV_PATH, index=False)
         print(f"얼굴 벡터 CSV 파일 '{FACE_ENCODINGS_CSV_PATH}'이 생성되었습니다.")
+    
+    migrate_face_encodings_to_store()
+
+def migrate_face_encodings_to_store():
+    """CSV의 JSON 문자열 벡터(encoding 컬럼)를 바이너리 임베딩 저장소로 이전"""
+    df = pd.read_csv(FACE_ENCODINGS_CSV_PATH)
+    if 'encoding' not in df.columns:
+        return
+    
+    migrated = 0
+    for _, row in df.iterrows():
+        if pd.isna(row['encoding']) or int(row['encoding_id']) in embedding_store:
+            continue
+        embedding_store.append(int(row['encoding_id']), string_to_vector(row['encoding']))
+        migrated += 1
+    
+    # 저장소에 모두 기록된 뒤에만 CSV에서 벡터 컬럼 제거
+    df = df.drop('encoding', axis=1)
+    df.to_csv(FACE_ENCODINGS_CSV_PATH, index=False)
+    print(f"얼굴 벡터 {migrated}개를 CSV에서 바이너리 저장소로 이전했습니다.")
 
 def init_attendance_csv():
-    """출퇴근 기록 CSV 파일 초기화"""
-    if not os.path.exists(ATTENDANCE_CSV_PATH):
-        df = pd.DataFrame(columns=['record_id', 'employee_id', 'date', 'time', 'tag'])
-        df.to_csv(ATTENDANCE_CSV_PATH, index=False)
-        print(f"출퇴근 기록 CSV 파일 '{ATTENDANCE_CSV_PATH}'이 생성되었습니다.")
+    """
+    출퇴근 기록 월별 파티션 디렉터리 초기화 (이전 단일 CSV 파일이 있으면 파티션으로 옮김)
+    CSV 저장소이면 기록기를 열어 지난 실행에서 manifest에 반영되지 않은 기록을 복구
+    """
+    attendance_partitions.init()
+    if sqlite_storage is None:
+        attendance_log.open()
 
 def sanitize_filename(name):
     """한글 등 non-English 문자를 영문자로 변환 또는 제거"""
@@ -76,6 +149,13 @@ def string_to_vector(string):
 def get_or_create_employee(name, department="", position="", employeeId=""):
     """직원 정보를 가져오거나 새로 생성"""
     try:
+        if sqlite_storage is not None:
+            employee_id, changed = sqlite_storage.get_or_create_employee(name, department, position, employeeId)
+            if changed:
+                employee = sqlite_storage.get_employee_info(employee_id=employee_id)
+                gallery_cache.set_employee(employee_id, name, employee['department'], employee['position'], employee['employeeId'])
+            return employee_id
+        
         df = pd.read_csv(EMPLOYEES_CSV_PATH)
         
         # 기존 직원 찾기 (이름으로 검색)
@@ -101,6 +181,9 @@ def get_or_create_employee(name, department="", position="", employeeId=""):
                 df.loc[idx, 'updated_at'] = datetime.datetime.now().isoformat()
                 df.to_csv(EMPLOYEES_CSV_PATH, index=False)
                 print(f"직원 정보 업데이트: {name} (ID: {employee_id})")
+                
+                row = df.loc[idx]
+                gallery_cache.set_employee(int(employee_id), name, row['department'], row['position'], row['employeeId'])
             
             return int(employee_id)
         else:
@@ -119,6 +202,8 @@ def get_or_create_employee(name, department="", position="", employeeId=""):
             df.to_csv(EMPLOYEES_CSV_PATH, index=False)
             print(f"새 직원 생성: {name} (ID: {new_employee_id})")
             
+            gallery_cache.set_employee(new_employee_id, name, department, position, employeeId)
+            
             return new_employee_id
             
     except Exception as e:
@@ -128,6 +213,9 @@ def get_or_create_employee(name, department="", position="", employeeId=""):
 def get_employee_info(employee_id=None, name=None):
     """직원 정보 조회"""
     try:
+        if sqlite_storage is not None:
+            return sqlite_storage.get_employee_info(employee_id, name)
+        
         df = pd.read_csv(EMPLOYEES_CSV_PATH)
         
         if employee_id is not None:
@@ -150,6 +238,9 @@ def get_employee_info(employee_id=None, name=None):
 def get_all_employees():
     """모든 직원 정보 조회"""
     try:
+        if sqlite_storage is not None:
+            return sqlite_storage.get_all_employees()
+        
         df = pd.read_csv(EMPLOYEES_CSV_PATH)
         records = df.to_dict('records')
         # numpy 타입을 Python 기본 타입으로 변환
@@ -161,28 +252,18 @@ def get_all_employees():
 def update_employee_info(employee_id, name, department="", position="", employeeId=""):
     """직원 정보 업데이트"""
     try:
-        df = pd.read_csv(EMPLOYEES_CSV_PATH)
-        
-        # 해당 직원 찾기
-        target_rows = df[df['employee_id'] == employee_id]
+        if sqlite_storage is not None:
+            updated = sqlite_storage.update_employee_info(employee_id, name, department, position, employeeId)
+        else:
+            updated = _update_employee_info_csv(employee_id, name, department, position, employeeId)
         
-        if target_rows.empty:
+        if not updated:
             return {
                 'success': False,
                 'message': f'직원 ID {employee_id}를 찾을 수 없습니다.'
             }
         
-        # 첫 번째 일치하는 행의 인덱스 가져오기
-        target_index = target_rows.index[0]
-        
-        # 정보 업데이트
-        df.loc[target_index, 'name'] = name
-        df.loc[target_index, 'department'] = department
-        df.loc[target_index, 'position'] = position
-        df.loc[target_index, 'employeeId'] = employeeId
-        
-        # CSV 파일에 저장
-        df.to_csv(EMPLOYEES_CSV_PATH, index=False)
+        gallery_cache.set_employee(int(employee_id), name, department, position, employeeId)
         
         return {
             'success': True,
@@ -197,11 +278,44 @@ def update_employee_info(employee_id, name, department="", position="", employee
             'message': f'직원 정보 업데이트 중 오류: {str(e)}'
         }
 
+def _update_employee_info_csv(employee_id, name, department, position, employeeId):
+    """CSV에서 직원 정보 업데이트 (대상이 없으면 False)"""
+    df = pd.read_csv(EMPLOYEES_CSV_PATH)
+    
+    # 해당 직원 찾기
+    target_rows = df[df['employee_id'] == employee_id]
+    
+    if target_rows.empty:
+        return False
+    
+    # 첫 번째 일치하는 행의 인덱스 가져오기
+    target_index = target_rows.index[0]
+    
+    # 정보 업데이트
+    df.loc[target_index, 'name'] = name
+    df.loc[target_index, 'department'] = department
+    df.loc[target_index, 'position'] = position
+    df.loc[target_index, 'employeeId'] = employeeId
+    
+    # CSV 파일에 저장
+    df.to_csv(EMPLOYEES_CSV_PATH, index=False)
+    return True
+
 # === 얼굴 벡터 관리 함수들 ===
 
 def save_face_encoding(employee_id, image_path, encoding_vector):
     """얼굴 벡터 저장"""
     try:
+        if sqlite_storage is not None:
+            new_encoding_id = sqlite_storage.save_face_encoding(employee_id, image_path)
+            try:
+                embedding_store.append(new_encoding_id, encoding_vector)
+            except Exception:
+                sqlite_storage.delete_face_encoding(new_encoding_id)
+                raise
+            gallery_cache.add(new_encoding_id, employee_id, image_path, encoding_vector)
+            return new_encoding_id
+        
         df = pd.read_csv(FACE_ENCODINGS_CSV_PATH)
         
         new_encoding_id = int(df['encoding_id'].max() + 1) if not df.empty else 1
@@ -209,12 +323,15 @@ def save_face_encoding(employee_id, image_path, encoding_vector):
         new_row = {
             'encoding_id': new_encoding_id,
             'employee_id': int(employee_id),  # numpy 타입 방지
-            'image_path': image_path,
-            'encoding': vector_to_string(encoding_vector)
+            'image_path': image_path
         }
         
+        # 벡터는 바이너리 저장소에 먼저 기록
+        embedding_store.append(new_encoding_id, encoding_vector)
+        
         df = pd.concat([df, pd.DataFrame([new_row])], ignore_index=True)
         df.to_csv(FACE_ENCODINGS_CSV_PATH, index=False)
+        gallery_cache.add(new_encoding_id, employee_id, image_path, encoding_vector)
         
         return new_encoding_id
         
@@ -225,16 +342,19 @@ def save_face_encoding(employee_id, image_path, encoding_vector):
 def get_face_encodings_by_employee(employee_id):
     """특정 직원의 모든 얼굴 벡터 조회"""
     try:
-        df = pd.read_csv(FACE_ENCODINGS_CSV_PATH)
-        encodings = df[df['employee_id'] == employee_id]
+        if sqlite_storage is not None:
+            encodings = sqlite_storage.get_face_encodings_by_employee(employee_id)
+        else:
+            df = pd.read_csv(FACE_ENCODINGS_CSV_PATH)
+            encodings = df[df['employee_id'] == employee_id].to_dict('records')
         
         results = []
-        for _, row in encodings.iterrows():
+        for row in encodings:
             results.append({
                 'encoding_id': int(row['encoding_id']),
                 'employee_id': int(row['employee_id']),
                 'image_path': row['image_path'],
-                'encoding': string_to_vector(row['encoding'])
+                'encoding': embedding_store.get(row['encoding_id'])
             })
         
         return results
@@ -246,6 +366,12 @@ def get_face_encodings_by_employee(employee_id):
 def get_all_face_encodings_with_employee_info():
     """모든 얼굴 벡터와 직원 정보를 함께 조회"""
     try:
+        if sqlite_storage is not None:
+            results = sqlite_storage.get_all_face_encodings_with_employee_info()
+            for result in results:
+                result['encoding'] = embedding_store.get(result['encoding_id'])
+            return results
+        
         # 얼굴 벡터 데이터 로드
         face_df = pd.read_csv(FACE_ENCODINGS_CSV_PATH)
         # 직원 정보 데이터 로드
@@ -264,7 +390,7 @@ def get_all_face_encodings_with_employee_info():
                 'position': row.get('position', ''),
                 'employeeId': row.get('employeeId', ''),
                 'image_path': row['image_path'],
-                'encoding': string_to_vector(row['encoding'])
+                'encoding': embedding_store.get(row['encoding_id'])
             })
         
         return results
@@ -273,25 +399,61 @@ def get_all_face_encodings_with_employee_info():
         print(f"얼굴 벡터 및 직원 정보 조회 중 오류: {str(e)}")
         return []
 
+def get_face_gallery():
+    """얼굴 벡터 갤러리 캐시 반환 (처음 호출 시 한 번만 적재)"""
+    if not gallery_cache.loaded:
+        with gallery_cache.lock:
+            if not gallery_cache.loaded:
+                if sqlite_storage is not None:
+                    face_rows = sqlite_storage.get_all_face_encodings_with_employee_info()
+                else:
+                    face_rows = pd.read_csv(FACE_ENCODINGS_CSV_PATH).to_dict('records')
+                face_map = {int(row['encoding_id']): row for row in face_rows}
+                employees = get_all_employees()
+                
+                # 저장소에 벡터가 있는 얼굴만 한 번에 읽어옴 (mmap 페이지 적재)
+                encoding_ids, vectors = embedding_store.get_many(list(face_map))
+                records = [{
+                    'encoding_id': encoding_id,
+                    'employee_id': int(face_map[encoding_id]['employee_id']),
+                    'image_path': face_map[encoding_id]['image_path']
+                } for encoding_id in encoding_ids]
+                
+                gallery_cache.build(records, employees, vectors)
+                print(f"얼굴 갤러리 캐시 적재 완료: {len(gallery_cache)}개 (버전 {gallery_cache.version})")
+    return gallery_cache
+
 def delete_face_encoding(encoding_id):
     """얼굴 벡터 삭제"""
     try:
-        df = pd.read_csv(FACE_ENCODINGS_CSV_PATH)
-        
-        # 해당 얼굴 벡터 찾기
-        target_row = df[df['encoding_id'] == encoding_id]
-        if target_row.empty:
-            return False
+        if sqlite_storage is not None:
+            target = sqlite_storage.get_face_encoding(encoding_id)
+            if target is None:
+                return False
+            image_path = target['image_path']
+        else:
+            df = pd.read_csv(FACE_ENCODINGS_CSV_PATH)
+            
+            # 해당 얼굴 벡터 찾기
+            target_row = df[df['encoding_id'] == encoding_id]
+            if target_row.empty:
+                return False
+            image_path = target_row.iloc[0]['image_path']
         
         # 이미지 파일 삭제
-        image_path = target_row.iloc[0]['image_path']
         if os.path.exists(image_path):
             os.remove(image_path)
             print(f"이미지 파일 삭제됨: {image_path}")
         
-        # CSV에서 해당 행 삭제
-        df = df[df['encoding_id'] != encoding_id]
-        df.to_csv(FACE_ENCODINGS_CSV_PATH, index=False)
+        # 메타데이터에서 해당 행 삭제
+        if sqlite_storage is not None:
+            sqlite_storage.delete_face_encoding(encoding_id)
+        else:
+            df = df[df['encoding_id'] != encoding_id]
+            df.to_csv(FACE_ENCODINGS_CSV_PATH, index=False)
+        embedding_store.delete(encoding_id)
+        gallery_cache.remove(encoding_id)
+        thumbnail_cache.delete(encoding_id)
         
         return True
         
@@ -300,10 +462,7 @@ def delete_face_encoding(encoding_id):
         return False
     
 def get_employee_faces_with_base64(employee_id):
-    """특정 직원의 얼굴 이미지들을 Base64와 함께 조회"""
-    import cv2
-    import base64
-    
+    """특정 직원의 얼굴 썸네일들을 Base64와 함께 조회"""
     try:
         face_encodings = get_face_encodings_by_employee(employee_id)
         faces = []
@@ -312,11 +471,8 @@ def get_employee_faces_with_base64(employee_id):
             image_path = encoding_data['image_path']
             if os.path.exists(image_path):
                 try:
-                    img = cv2.imread(image_path)
-                    if img is not None:
-                        _, buffer = cv2.imencode('.jpg', img)
-                        img_base64 = base64.b64encode(buffer).decode('utf-8')
-                        
+                    img_base64 = thumbnail_cache.get_base64(encoding_data['encoding_id'], image_path)
+                    if img_base64 is not None:
                         faces.append({
                             "id": int(encoding_data['encoding_id']),
                             "image_path": image_path,
@@ -342,23 +498,24 @@ def record_attendance(employee_id, attendance_type='checkin'):
         time_str = now.strftime("%H:%M:%S")
         tag = '출근' if attendance_type == 'checkin' else '퇴근'
         
-        # 출퇴근 기록 CSV 읽기
-        df = pd.read_csv(ATTENDANCE_CSV_PATH)
-        
-        # record_id 생성
-        new_record_id = int(df['record_id'].max() + 1) if not df.empty else 1
-        
-        # 새 기록 추가
-        new_row = {
-            'record_id': new_record_id,
-            'employee_id': int(employee_id),
-            'date': date_str,
-            'time': time_str,
-            'tag': tag
-        }
-        
-        df = pd.concat([df, pd.DataFrame([new_row])], ignore_index=True)
-        df.to_csv(ATTENDANCE_CSV_PATH, index=False)
+        # 기록 저장부터 집계 반영까지 집계 생성과 같은 lock 안에서 처리
+        # (그 사이 집계가 만들어지면 새 기록이 집계에 이미 들어 있어 두 번 더해짐)
+        with attendance_rollups.lock:
+            if sqlite_storage is not None:
+                new_record_id = sqlite_storage.record_attendance(employee_id, date_str, time_str, tag)
+            else:
+                # 새 기록을 CSV 끝에 추가 (record_id는 기록기가 발급)
+                new_row = {
+                    'employee_id': int(employee_id),
+                    'date': date_str,
+                    'time': time_str,
+                    'tag': tag
+                }
+                
+                new_record_id = attendance_log.append(new_row)
+                attendance_index.append(dict(new_row, record_id=new_record_id))
+            
+            attendance_rollups.add(employee_id, date_str, time_str, tag)
         
         return {
             'success': True,
@@ -379,106 +536,125 @@ def record_attendance(employee_id, attendance_type='checkin'):
 def get_attendance_records_with_employee_info(filters=None):
     """출퇴근 기록과 직원 정보를 함께 조회"""
     try:
-        # 출퇴근 기록 데이터 로드
-        attendance_df = pd.read_csv(ATTENDANCE_CSV_PATH)
-        # 직원 정보 데이터 로드
-        employee_df = pd.read_csv(EMPLOYEES_CSV_PATH)
-        
-        # 조인하여 합치기
-        merged_df = pd.merge(attendance_df, employee_df, on='employee_id', how='left')
+        if sqlite_storage is not None:
+            return sqlite_storage.get_attendance_records_with_employee_info(filters)
         
-        # 누락된 값 처리
-        merged_df = merged_df.fillna('')
-        
-        # 필터링 적용
-        if filters:
-            # 이름 필터
-            if 'name' in filters and filters['name']:
-                merged_df = merged_df[merged_df['name'].str.contains(filters['name'], case=False, na=False)]
-            
-            # 부서 필터
-            if 'department' in filters and filters['department']:
-                merged_df = merged_df[merged_df['department'].str.contains(filters['department'], case=False, na=False)]
-            
-            # 직급 필터
-            if 'position' in filters and filters['position']:
-                merged_df = merged_df[merged_df['position'].str.contains(filters['position'], case=False, na=False)]
-            
-            # 사번 필터
-            if 'employeeId' in filters and filters['employeeId']:
-                merged_df = merged_df[merged_df['employeeId'].str.contains(filters['employeeId'], case=False, na=False)]
-            
-            # 날짜 필터
-            if 'start_date' in filters and filters['start_date']:
-                try:
-                    start_date = pd.to_datetime(filters['start_date']).date()
-                    merged_df['date_parsed'] = pd.to_datetime(merged_df['date'], errors='coerce').dt.date
-                    merged_df = merged_df[merged_df['date_parsed'] >= start_date]
-                except Exception as e:
-                    print(f"시작일 파싱 오류: {e}")
-            
-            if 'end_date' in filters and filters['end_date']:
-                try:
-                    end_date = pd.to_datetime(filters['end_date']).date()
-                    if 'date_parsed' not in merged_df.columns:
-                        merged_df['date_parsed'] = pd.to_datetime(merged_df['date'], errors='coerce').dt.date
-                    merged_df = merged_df[merged_df['date_parsed'] <= end_date]
-                except Exception as e:
-                    print(f"종료일 파싱 오류: {e}")
-            
-            # 임시 컬럼 제거
-            if 'date_parsed' in merged_df.columns:
-                merged_df = merged_df.drop('date_parsed', axis=1)
-            
-            # 태그 필터
-            if 'tag' in filters and filters['tag']:
-                if filters['tag'] == 'empty':
-                    merged_df = merged_df[merged_df['tag'] == '']
-                else:
-                    merged_df = merged_df[merged_df['tag'] == filters['tag']]
-        
-        # 날짜와 시간 기준으로 정렬 (최신순)
-        merged_df = merged_df.sort_values(by=['date', 'time'], ascending=[False, False])
-        
-        # 필요한 컬럼만 선택
-        result_columns = ['record_id', 'employee_id', 'name', 'department', 'position', 'employeeId', 'date', 'time', 'tag']
-        available_columns = [col for col in result_columns if col in merged_df.columns]
-        
-        records = merged_df[available_columns].to_dict('records')
-        
-        return [convert_to_python_types(record) for record in records]
+        # 메모리 인덱스에서 기간 범위/직원 집합으로 먼저 좁힌 뒤 남은 기록만 직원 정보와 합침
+        employees = get_all_employees()
+        positions = attendance_index.select(filters, employees)
+        return attendance_index.rows(positions, employees)
         
     except Exception as e:
         print(f"출퇴근 기록 조회 중 오류: {str(e)}")
         return []
 
+def get_attendance_page(filters=None, limit=100, before=None, include_total=False):
+    """
+    출퇴근 기록 한 페이지 조회 ((날짜, 시간, record_id) 내림차순 키셋 페이지네이션)
+    before: 이전 페이지 마지막 기록의 (날짜, 시간, record_id) 키 (첫 페이지는 None)
+    반환값: {"records", "next_key": 다음 페이지 키 또는 None, "total": include_total일 때만 전체 건수}
+    """
+    if sqlite_storage is not None:
+        records, total = sqlite_storage.get_attendance_page(filters, limit, before, include_total)
+    else:
+        employees = get_all_employees()
+        positions = attendance_index.select(filters, employees, before=before)
+        total = len(positions) if include_total else None
+        # 다음 페이지 여부를 알기 위해 한 건 더 가져옴 (직원 정보는 이 페이지 기록에만 합침)
+        records = attendance_index.rows(positions[:limit + 1], employees)
+    
+    has_more = len(records) > limit
+    records = records[:limit]
+    next_key = None
+    if has_more and records:
+        last = records[-1]
+        next_key = (last['date'], last['time'], int(last['record_id']))
+    
+    return {
+        "records": [convert_to_python_types(record) for record in records],
+        "next_key": next_key,
+        "total": total
+    }
+
+def iter_attendance_records(filters=None, chunk_size=5000):
+    """
+    get_attendance_records_with_employee_info()와 같은 필터/순서의 기록을 chunk_size개씩 나눠
+    내보내는 제너레이터 (전체 목록을 한 번에 만들지 않으므로 메모리 사용이 기록 수와 무관)
+    """
+    if sqlite_storage is not None:
+        # 키셋 페이지를 이어 조회 (청크마다 새 쿼리이므로 스레드가 바뀌어도 안전)
+        before = None
+        while True:
+            records, _ = sqlite_storage.get_attendance_page(filters, chunk_size, before)
+            if len(records) > chunk_size:
+                records = records[:chunk_size]
+                last = records[-1]
+                before = (last['date'], last['time'], int(last['record_id']))
+            else:
+                before = None
+            if records:
+                yield records
+            if before is None:
+                return
+    else:
+        yield from attendance_index.iter_rows(filters, get_all_employees(), chunk_size)
+
 def update_attendance_record(record_id, new_tag):
     """출퇴근 기록의 태그 업데이트"""
     try:
-        df = pd.read_csv(ATTENDANCE_CSV_PATH)
+        if sqlite_storage is not None:
+            with attendance_rollups.lock:
+                old_tag = sqlite_storage.update_attendance_record(record_id, new_tag)
+                if old_tag is None:
+                    return {
+                        'success': False,
+                        'message': f'record_id {record_id}에 해당하는 출퇴근 기록을 찾을 수 없습니다.'
+                    }
+                record = sqlite_storage.get_attendance_record(record_id)
+                attendance_rollups.retag(record['employee_id'], record['date'], record['time'], old_tag, new_tag)
+            return {
+                'success': True,
+                'message': '출퇴근 기록이 성공적으로 업데이트되었습니다.',
+                'record_id': int(record_id),
+                'old_tag': old_tag,
+                'new_tag': new_tag
+            }
         
-        # record_id로 해당 기록 찾기
-        target_rows = df[df['record_id'] == record_id]
+        # 추가 전용 기록기와 동시에 파일을 쓰지 않도록 잠금 (집계 lock을 먼저 잡는 기록 저장과 같은 순서로)
+        with attendance_rollups.lock, attendance_log.lock:
+            return _update_attendance_record_csv(record_id, new_tag)
+        
+    except Exception as e:
+        print(f"출퇴근 기록 업데이트 중 오류: {str(e)}")
+        return {
+            'success': False,
+            'message': f'출퇴근 기록 업데이트 중 오류: {str(e)}'
+        }
+
+def _update_attendance_record_csv(record_id, new_tag):
+    """record_id가 들어 있는 월 파티션 하나만 다시 써서 태그 수정 (attendance_log.lock을 잡은 상태에서 호출)"""
+    attendance_log.open()  # manifest의 record_id 범위를 파일과 맞춘 뒤 찾음
+    for month in attendance_partitions.find_record_months(record_id):
+        df = attendance_partitions.read([month])
         
+        # record_id로 해당 기록 찾기
+        target_rows = df[pd.to_numeric(df['record_id']) == record_id]
         if target_rows.empty:
-            return {
-                'success': False,
-                'message': f'record_id {record_id}에 해당하는 출퇴근 기록을 찾을 수 없습니다.'
-            }
+            continue
         
         # 첫 번째 일치하는 행의 인덱스 가져오기
         target_index = target_rows.index[0]
         
-        # 이전 값 저장
+        # 이전 값 저장 (파티션은 빈 태그를 빈 문자열로 읽음)
         old_tag = df.loc[target_index, 'tag']
-        if pd.isna(old_tag) or (isinstance(old_tag, float) and np.isnan(old_tag)):
-            old_tag = ''
         
-        # 태그 업데이트
+        # 태그 업데이트 후 파티션 저장 (파일이 교체되므로 기록기가 열어 둔 같은 월 파일은 먼저 닫음)
         df.loc[target_index, 'tag'] = new_tag
-        
-        # CSV 파일에 저장
-        df.to_csv(ATTENDANCE_CSV_PATH, index=False)
+        attendance_log.release(month)
+        attendance_partitions.rewrite(month, df)
+        attendance_index.update_tag(record_id, new_tag)
+        attendance_rollups.retag(df.loc[target_index, 'employee_id'], str(df.loc[target_index, 'date']),
+                                 str(df.loc[target_index, 'time']), old_tag, new_tag)
         
         return {
             'success': True,
@@ -487,10 +663,41 @@ def update_attendance_record(record_id, new_tag):
             'old_tag': old_tag,
             'new_tag': new_tag
         }
-        
-    except Exception as e:
-        print(f"출퇴근 기록 업데이트 중 오류: {str(e)}")
-        return {
-            'success': False,
-            'message': f'출퇴근 기록 업데이트 중 오류: {str(e)}'
-        }
\ No newline at end of file
+    
+    return {
+        'success': False,
+        'message': f'record_id {record_id}에 해당하는 출퇴근 기록을 찾을 수 없습니다.'
+    }
+
+def _load_attendance_columns(months=None):
+    if sqlite_storage is not None:
+        return sqlite_storage.get_attendance_columns(months)
+    return attendance_index.columns(months)
+
+def get_attendance_statistics(kind, filters=None):
+    """
+    출퇴근 통계 (일일 집계 테이블에서 계산)
+    kind: 'daily' | 'personal' | 'department'
+    filters: start_date, end_date, name (personal 필수), department (department에서 부분 일치)
+    """
+    filters = filters or {}
+    
+    # 기간은 집계 테이블의 날짜 문자열과 비교할 수 있게 YYYY-MM-DD로 맞춤 (파싱 실패 시 무시)
+    dates = {}
+    for key, label in (('start_date', "시작일"), ('end_date', "종료일")):
+        if filters.get(key):
+            try:
+                dates[key] = pd.to_datetime(filters[key]).strftime('%Y-%m-%d')
+            except Exception as e:
+                print(f"{label} 파싱 오류: {e}")
+    
+    # 기간과 겹치는 월의 집계만 만듦 (기간이 한쪽이라도 없으면 전체)
+    attendance_rollups.ensure_loaded(_load_attendance_columns, month_range(dates.get('start_date'), dates.get('end_date')))
+    
+    if kind == 'daily':
+        return daily_statistics(attendance_rollups, **dates)
+    if kind == 'personal':
+        return personal_statistics(attendance_rollups, get_all_employees(), filters['name'], **dates)
+    if kind == 'department':
+        return department_statistics(attendance_rollups, get_all_employees(), department=filters.get('department'), **dates)
+    raise ValueError(f"알 수 없는 통계 종류: {kind}")